@@ -0,0 +1,302 @@
+#  Adaptive tuning of batched inserts for the SAP/HANA DB database class.
+#
+#  The best batch size, number of concurrent sessions and commit interval
+#  depend on the host, the table and the replication setup, and finding
+#  them by hand means many full loads.  The tuner finds them during the
+#  load instead: it runs short calibration phases (phaseSeconds each) of
+#  real inserts, measuring rows/s and the p99 latency of a commit unit
+#  (commitEvery rows sent & committed), and hill-climbs over one setting
+#  at a time, doubling or halving it while that makes the load faster.
+#  The rest of the load then runs with the best settings found.
+#
+#  With maxP99 a setting only wins if its p99 stays under maxP99 seconds,
+#  which bounds how long a transaction (and its locks) stays open.
+#
+#  commitEvery is only tuned with the database's 'auto' commit mode, the
+#  other modes commit by their own policy and ignore it.
+#
+#  The chosen profile is kept per host ("address:port") in a JSON file so
+#  the next run starts its calibration from it and usually confirms it in
+#  a few phases.
+#
+#       t = tuner(db, lambda n: [row] * n, profileFile='hanaTuning.json')
+#       report = t.run(1000000)
+#       print(report['profile'])
+#
+import json
+import os
+import threading
+import time
+import traceback
+import hanaMetrics
+
+SETTINGS = ('batchSize', 'sessions', 'commitEvery')
+
+def loadProfile(fileName, key):
+    """
+    Return the profile saved for key in fileName or None.
+    """
+    try:
+        with open(fileName) as f:
+            return json.load(f).get(key)
+    except (IOError, OSError, ValueError):
+        return None
+
+def saveProfile(fileName, key, profile):
+    """
+    Save the profile for key in fileName, keeping the other hosts'
+    profiles.  Written through a temp file so readers never see a
+    partial file.
+    """
+    try:
+        with open(fileName) as f:
+            profiles = json.load(f)
+    except (IOError, OSError, ValueError):
+        profiles = {}
+    profiles[key] = profile
+    tmp = '{0}.{1}.tmp'.format(fileName, os.getpid())
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(profiles, f, indent=1, sort_keys=True)
+        os.rename(tmp, fileName)
+    except (IOError, OSError) as e:
+        print("WARNING: could not write tuning profile \"{0}\": {1}".format(fileName, e))
+
+class tuner:
+    def __init__(self, db, rows, batchSize=1000, sessions=1, commitEvery=10000, maxSessions=None,
+                 phaseSeconds=5.0, maxPhases=12, minGain=0.05, maxP99=None, profileFile=None,
+                 minBatch=10, maxBatch=100000, maxCommit=1000000):
+        """
+        Parameter:
+                  db - database instance.  Its pool size limits the
+                       sessions tried.
+                rows - rows(n) returns n rows to insert (any iterable).  It
+                       is called from several threads at once.
+           batchSize - Rows per executemany() to start from.
+            sessions - Concurrent sessions to start from.
+         commitEvery - Rows per commit to start from.
+         maxSessions - Most sessions to try.  Defaults to the pool size.
+        phaseSeconds - Duration of a calibration phase.
+           maxPhases - Most calibration phases to run.
+             minGain - Fraction rows/s must improve by for a setting to win
+                       (keeps measurement noise from deciding).
+              maxP99 - Seconds the p99 commit unit latency may take, None
+                       for no limit.
+         profileFile - JSON file of the chosen profile per host.  A saved
+                       profile replaces the start settings above.
+        """
+        if phaseSeconds <= 0 or maxPhases < 1:
+            raise ValueError("phaseSeconds & maxPhases must be greater than 0.")
+
+        self.db = db
+        self.rows = rows
+        self.maxSessions = max(1, maxSessions or (db.pool.size if db.pool is not None else 1))
+        self.phaseSeconds = phaseSeconds
+        self.maxPhases = maxPhases
+        self.minGain = minGain
+        self.maxP99 = maxP99
+        self.profileFile = profileFile
+        self.limits = {'batchSize': (minBatch, maxBatch), 'sessions': (1, self.maxSessions),
+                       'commitEvery': (minBatch, maxCommit)}
+        # Settings hill-climbed over.
+        self.tuned = SETTINGS if db.commits.mode == 'auto' else ('batchSize', 'sessions')
+        self.host = '{0}:{1}'.format(db.address, db.port)
+        self.saved = loadProfile(profileFile, self.host) if profileFile else None
+        start = self.saved or {'batchSize': batchSize, 'sessions': sessions, 'commitEvery': commitEvery}
+        self.start = self.__clamp(dict([(s, int(start[s])) for s in SETTINGS]))
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        # [rows still to load, rows added]
+        self.counts = [0, 0]
+        # One result dictionary per phase, see phase().
+        self.phases = []
+
+    def __clamp(self, settings):
+        for s in SETTINGS:
+            low, high = self.limits[s]
+            settings[s] = max(low, min(high, settings[s]))
+        settings['commitEvery'] = max(settings['commitEvery'], settings['batchSize'])
+        return settings
+
+    def __neighbor(self, settings, name, factor):
+        """
+        settings with name doubled (factor 2) or halved (0.5), or None if
+        that is out of range or changes nothing.
+        """
+        low, high = self.limits[name]
+        value = max(low, min(high, int(round(settings[name] * factor))))
+        if value == settings[name]:
+            return None
+        candidate = dict([(s, settings[s]) for s in SETTINGS])
+        candidate[name] = value
+        if name == 'batchSize':
+            candidate['commitEvery'] = max(candidate['commitEvery'], value)
+        elif name == 'commitEvery' and value < candidate['batchSize']:
+            return None
+        return candidate
+
+    def __claim(self, n):
+        with self.lock:
+            n = min(n, self.counts[0])
+            self.counts[0] = self.counts[0] - n
+            return n
+
+    def __worker(self, settings, deadline, hist, result):
+        try:
+            while not self.stopped.is_set() and (deadline is None or time.time() < deadline):
+                n = self.__claim(settings['commitEvery'])
+                if n == 0:
+                    break
+                t0 = time.time()
+                try:
+                    added = self.db.addMany(self.rows(n), batch_size=settings['batchSize'],
+                                            commit_every=settings['commitEvery'])
+                except Exception as e:
+                    print("ERROR: tuned insert failed: {0}\n{1}".format(e, traceback.format_exc()))
+                    added = 0
+                t1 = time.time()
+                with self.lock:
+                    self.counts[0] = self.counts[0] + n - added
+                    self.counts[1] = self.counts[1] + added
+                    result[0] = result[0] + added
+                    if added == n:
+                        hist.record(t1 - t0)
+                    else:
+                        result[1] = result[1] + 1
+                if added == 0:
+                    break
+        finally:
+            self.db.releaseConn()
+
+    def phase(self, settings, seconds=None, onTick=None):
+        """
+        Insert with settings on settings['sessions'] threads for seconds
+        (None: until all rows are loaded).  Returns a dictionary of the
+        settings, rows, failed calls, elapsed seconds, rowsPerSec and the
+        p50/p99 commit unit latency.
+        """
+        hist = hanaMetrics.histogram()
+        # [rows added, failed calls]
+        result = [0, 0]
+        deadline = None if seconds is None else time.time() + seconds
+        t0 = time.time()
+        threads = [threading.Thread(target=self.__worker, args=(settings, deadline, hist, result))
+                   for i in range(settings['sessions'])]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            while any([t.is_alive() for t in threads]):
+                time.sleep(0.1 if seconds is not None else 1.0)
+                if onTick is not None:
+                    onTick(self.counts[1])
+        except KeyboardInterrupt:
+            print("\nStopping the tuned load...")
+            self.stopped.set()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - t0
+        with self.lock:
+            snap = hist.snapshot()
+            stats = dict(settings)
+            stats.update({'rows': result[0], 'failed': result[1], 'elapsed': round(elapsed, 3),
+                          'rowsPerSec': round(result[0] / elapsed, 1) if elapsed > 0 else 0.0,
+                          'p50': snap['p50'], 'p99': snap['p99']})
+        return stats
+
+    def __better(self, a, b):
+        """
+        True if phase result a beats b.
+        """
+        if a['rows'] == 0:
+            return False
+        if self.maxP99 is not None:
+            aOk = a['p99'] <= self.maxP99
+            bOk = b['p99'] <= self.maxP99
+            if aOk != bOk:
+                return aOk
+            if not aOk:
+                return a['p99'] < b['p99']
+        return a['rowsPerSec'] > b['rowsPerSec'] * (1.0 + self.minGain)
+
+    def calibrate(self, onPhase=None):
+        """
+        Hill-climb from the start settings: try doubling & halving each
+        setting in turn, keep going in a direction while it wins, and stop
+        after a round without a winner, maxPhases phases, or once the rows
+        run out.  onPhase(result) is called after every phase.
+
+        Returns the best phase result.
+        """
+        measured = {}
+        def measure(settings):
+            key = tuple([settings[s] for s in SETTINGS])
+            if key not in measured:
+                if len(self.phases) >= self.maxPhases or self.counts[0] == 0 or self.stopped.is_set():
+                    return None
+                result = self.phase(settings, self.phaseSeconds)
+                self.phases.append(result)
+                measured[key] = result
+                if onPhase is not None:
+                    onPhase(result)
+            # A phase that added nothing (the server is gone) ends the climb.
+            if measured[key]['rows'] == 0:
+                return None
+            return measured[key]
+
+        best = measure(self.start)
+        if best is None:
+            return None
+        improved = True
+        while improved:
+            improved = False
+            for name in self.tuned:
+                for factor in (2.0, 0.5):
+                    moved = False
+                    candidate = self.__neighbor(best, name, factor)
+                    while candidate is not None:
+                        result = measure(candidate)
+                        if result is None or not self.__better(result, best):
+                            break
+                        best = result
+                        moved = improved = True
+                        candidate = self.__neighbor(best, name, factor)
+                    if moved:
+                        break
+        return best
+
+    def profile(self, best):
+        return {'batchSize': best['batchSize'], 'sessions': best['sessions'],
+                'commitEvery': best['commitEvery'], 'rowsPerSec': best['rowsPerSec'],
+                'p99': best['p99'], 'phases': len(self.phases),
+                'tunedAt': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+    def run(self, totalRows, onPhase=None, onTick=None):
+        """
+        Load totalRows rows: calibrate, save the chosen profile, then load
+        the remaining rows with it.  onTick(rows added) is called every
+        second of the main load.
+
+        Returns the profile, start settings (and whether they came from a
+        saved profile), every calibration phase, the main load's result,
+        the rows added and the elapsed seconds as a dictionary.
+        """
+        self.stopped.clear()
+        self.counts = [int(totalRows), 0]
+        self.phases = []
+        t0 = time.time()
+        best = self.calibrate(onPhase)
+        profile = None
+        main = None
+        if best is not None:
+            profile = self.profile(best)
+            if self.profileFile:
+                saveProfile(self.profileFile, self.host, profile)
+            if self.counts[0] > 0 and not self.stopped.is_set():
+                main = self.phase(best, None, onTick)
+        return {'host': self.host, 'start': self.start, 'fromProfile': self.saved is not None,
+                'profile': profile, 'phases': self.phases, 'main': main,
+                'rows': self.counts[1], 'elapsed': round(time.time() - t0, 3)}
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,359 @@
+#  Offline throughput benchmark for hanaDatabase & the populateHanaDB loaders.
+#
+#  Runs every scenario below against fakeDbapi (SQLite with injected round
+#  trip & commit latency) instead of a HANA system, and writes a JSON
+#  report with rows/s, MB/s and p50/p99 latency per scenario, so loader
+#  modes can be compared and throughput regressions caught without a
+#  cluster.  The numbers only mean something relative to each other (and
+#  to earlier reports made with the same settings).
+#
+#  To Run
+#
+#       python benchmark.py [report.json]
+#
+import fakeDbapi
+import json
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Latency (seconds) the fake dbapi adds to every statement round trip and
+# every commit.  0.0005/0.002 is roughly a LAN client & a HANA log write.
+statementLatency=0.0005
+commitLatency=0.002
+# Rows loaded by the bulk scenarios and by the row at a time ones (which
+# pay a round trip & commit per row).
+benchRows=20000
+oneRows=1000
+# Record shape: numCols VARCHAR columns of columnBytes random letters.
+numCols=8
+columnBytes=64
+batchSize=1000
+workers=4
+loadProcesses=2
+# CSV scenarios: records per file and number of imports.
+csvRecs=20000
+csvImports=2
+# Scenarios to run, in order.  See SCENARIOS at the bottom.
+scenarios=['add', 'threaded', 'addMany', 'process', 'async', 'csvGenerate', 'csvImport', 'csvStaged', 'csvFifo',
+           'getAllRows', 'iterRows']
+reportFile='benchmark.json'
+tableName='BENCH'
+
+# Set up in main once the fake dbapi is installed.
+loader = None
+record = []
+recBytes = 0
+
+def newDatabase(poolSize=0):
+    """
+    A fresh (dropped & recreated) benchmark table.
+    """
+    return loader.database(loader.address, loader.port, tableName, loader.createStmt, loader.user,
+                           loader.passwd, drop=True, poolSize=poolSize)
+
+def result(rows, secs, latencies, unit, statements0):
+    """
+    A scenario's report entry.  latencies are per unit (row, batch, ...)
+    in seconds.
+    """
+    stats = fakeDbapi.stats()
+    mb = rows * recBytes / 1048576.0
+    return {'rows': rows, 'seconds': round(secs, 4),
+            'rowsPerSec': round(rows / secs, 1) if secs > 0 else 0.0,
+            'mbPerSec': round(mb / secs, 3) if secs > 0 else 0.0,
+            'latencyUnit': unit, 'samples': len(latencies),
+            'latencyP50': round(loader.percentile(latencies, 50), 6) if latencies else None,
+            'latencyP99': round(loader.percentile(latencies, 99), 6) if latencies else None,
+            'statements': stats['statements'] - statements0['statements'],
+            'commits': stats['commits'] - statements0['commits']}
+
+def timed(func, latencies):
+    """
+    Wrap func so each call's duration is appended to latencies.
+    """
+    def call(*args, **kw):
+        t0 = time.time()
+        try:
+            return func(*args, **kw)
+        finally:
+            latencies.append(time.time() - t0)
+    return call
+
+def benchAdd():
+    """
+    database.add(), one row per round trip & commit.
+    """
+    db = newDatabase()
+    latencies = []
+    add = timed(db.add, latencies)
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    for i in range(oneRows):
+        add(record)
+    secs = time.time() - t0
+    db.close()
+    return result(oneRows, secs, latencies, 'row', s0)
+
+def benchThreaded():
+    """
+    populateHanaDB's 'one' mode: workers threads, one pooled session each.
+    """
+    import concurrent.futures
+
+    db = newDatabase(poolSize=workers)
+    latencies = []
+    add = timed(db.add, latencies)
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(add, itertools.repeat(record, oneRows)))
+    secs = time.time() - t0
+    db.close()
+    return result(oneRows, secs, latencies, 'row', s0)
+
+def benchAddMany():
+    """
+    populateHanaDB's 'many' mode: batched executemany() inserts.
+    """
+    db = newDatabase()
+    latencies = []
+    addMany = timed(db.addMany, latencies)
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    added = 0
+    while added < benchRows:
+        n = min(batchSize, benchRows - added)
+        added = added + addMany([record] * n, batch_size=batchSize)
+    secs = time.time() - t0
+    db.close()
+    return result(added, secs, latencies, 'batch', s0)
+
+def benchProcess():
+    """
+    populateHanaDB's 'process' mode: loadProcesses processes loading their
+    own slice with loadSlice().  Latency is per commitEvery batch.
+    """
+    import concurrent.futures
+
+    db = newDatabase()
+    db.close()
+    conf = loader.processConf()
+    perProcess = benchRows // loadProcesses
+    manager = multiprocessing.Manager()
+    results = manager.Queue()
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=loadProcesses) as executor:
+        futures = [executor.submit(loader.loadSlice, i, perProcess, conf, results) for i in range(loadProcesses)]
+        rows = sum([f.result() for f in futures])
+    secs = time.time() - t0
+    latencies = []
+    while not results.empty():
+        latencies.append(results.get()[2])
+    manager.shutdown()
+    # The workers' round trips are counted in their own processes.
+    return result(rows, secs, latencies, 'batch', s0)
+
+def benchAsync():
+    """
+    populateHanaDB's 'async' mode (python 3 only).
+    """
+    try:
+        import hanaAsync
+    except (ImportError, SyntaxError):
+        return None
+
+    db = newDatabase(poolSize=workers)
+    latencies = []
+    db.addMany = timed(db.addMany, latencies)
+    batches = [[record] * batchSize for i in range(benchRows // batchSize)]
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    completed, failed = hanaAsync.insertRows(db, batches, maxInFlight=2 * workers, workers=workers)
+    secs = time.time() - t0
+    db.close()
+    return result(completed * batchSize, secs, latencies, 'batch', s0)
+
+def benchCSVGenerate():
+    """
+    CSV file generation with csvWriter (no database).
+    """
+    fd, fileName = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    s0 = fakeDbapi.stats()
+    size, secs = loader.csvWriter.writeCSV(fileName, record, csvRecs)
+    os.remove(fileName)
+    return result(csvRecs, secs, [secs], 'file', s0)
+
+def benchCSVImport():
+    """
+    database.importFromCSV() of a csvRecs record file, csvImports times.
+    """
+    db = newDatabase()
+    fd, fileName = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    loader.csvWriter.writeCSV(fileName, record, csvRecs)
+    latencies = []
+    importFromCSV = timed(db.importFromCSV, latencies)
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    rows = 0
+    for i in range(csvImports):
+        if importFromCSV(fileName):
+            rows = rows + csvRecs
+    secs = time.time() - t0
+    os.remove(fileName)
+    db.close()
+    return result(rows, secs, latencies, 'import', s0)
+
+def benchCSVStaged():
+    """
+    CSV loading end to end staged on disk: csvImports times write a
+    csvRecs record file and import it.  Compare with csvFifo.
+    """
+    db = newDatabase()
+    fd, fileName = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    latencies = []
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    rows = 0
+    for i in range(csvImports):
+        t1 = time.time()
+        loader.csvWriter.writeCSV(fileName, record, csvRecs)
+        if db.importFromCSV(fileName):
+            rows = rows + csvRecs
+        latencies.append(time.time() - t1)
+    secs = time.time() - t0
+    os.remove(fileName)
+    db.close()
+    return result(rows, secs, latencies, 'import', s0)
+
+def benchCSVFifo():
+    """
+    CSV loading end to end through a FIFO (populateHanaDB's csvStaging
+    'fifo'): csvImports times stream csvRecs records into a named pipe the
+    import reads from.  Skipped where there are no FIFOs.
+    """
+    fileName = os.path.join(tempfile.mkdtemp(), 'bench.csv')
+    if not loader.csvWriter.makeFifo(fileName):
+        os.rmdir(os.path.dirname(fileName))
+        return None
+
+    db = newDatabase()
+    loader.db = db
+    loader.synthData = False
+    loader.csvStaging = 'fifo'
+    latencies = []
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    rows = 0
+    for i in range(csvImports):
+        t1 = time.time()
+        if loader.stagedImport([fileName], csvRecs, lambda files: [f for f in files if db.importFromCSV(f)]):
+            rows = rows + csvRecs
+        latencies.append(time.time() - t1)
+    secs = time.time() - t0
+    if os.path.exists(fileName):
+        # Fell back to a regular file.
+        os.remove(fileName)
+    os.rmdir(os.path.dirname(fileName))
+    db.close()
+    return result(rows, secs, latencies, 'import', s0)
+
+def loadedDatabase():
+    db = newDatabase()
+    db.addMany(itertools.repeat(record, benchRows), batch_size=batchSize)
+    return db
+
+def benchGetAllRows():
+    """
+    database.getAllRows() of a benchRows row table.
+    """
+    db = loadedDatabase()
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    rows = len(db.getAllRows())
+    secs = time.time() - t0
+    db.close()
+    return result(rows, secs, [secs], 'scan', s0)
+
+def benchIterRows():
+    """
+    database.iterRows() of a benchRows row table, batchSize rows per
+    fetchmany().  Latency is per fetched batch.
+    """
+    db = loadedDatabase()
+    latencies = []
+    s0 = fakeDbapi.stats()
+    t0 = time.time()
+    rows = 0
+    t1 = t0
+    for batch in db.iterRows(arraysize=batchSize, columnar=True):
+        now = time.time()
+        latencies.append(now - t1)
+        t1 = now
+        rows = rows + len(batch[next(iter(batch))])
+    secs = time.time() - t0
+    db.close()
+    return result(rows, secs, latencies, 'batch', s0)
+
+SCENARIOS = {'add': benchAdd, 'threaded': benchThreaded, 'addMany': benchAddMany,
+             'process': benchProcess, 'async': benchAsync, 'csvGenerate': benchCSVGenerate,
+             'csvImport': benchCSVImport, 'csvStaged': benchCSVStaged, 'csvFifo': benchCSVFifo,
+             'getAllRows': benchGetAllRows, 'iterRows': benchIterRows}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reportFile = sys.argv[1]
+
+    dbFile = fakeDbapi.install(statementLatency=statementLatency, commitLatency=commitLatency)
+    import populateHanaDB as loader
+
+    # Same random record every run so reports are comparable.
+    random.seed(0)
+    loader.numCols = numCols
+    loader.columnBytes = columnBytes
+    loader.tableName = tableName
+    loader.createStmt = "CREATE TABLE {0} ({1})".format(
+                        tableName, ', '.join(['C{0} VARCHAR({1})'.format(i, columnBytes) for i in range(numCols)]))
+    loader.address = 'fakehana'
+    loader.user = 'bench'
+    loader.passwd = 'bench'
+    loader.batchSize = batchSize
+    loader.commitEvery = batchSize
+    record = loader.makeRecord()
+    recBytes = sum([len(c) for c in record])
+    loader.add1 = record
+    loader.recBytes = recBytes
+
+    report = {'python': sys.version.split()[0],
+              'config': {'statementLatency': statementLatency, 'commitLatency': commitLatency,
+                         'benchRows': benchRows, 'oneRows': oneRows, 'numCols': numCols,
+                         'columnBytes': columnBytes, 'recBytes': recBytes, 'batchSize': batchSize,
+                         'workers': workers, 'loadProcesses': loadProcesses, 'csvRecs': csvRecs,
+                         'csvImports': csvImports},
+              'scenarios': {}}
+
+    try:
+        for name in scenarios:
+            r = SCENARIOS[name]()
+            if r is None:
+                print("{0:>12}: skipped".format(name))
+                continue
+            report['scenarios'][name] = r
+            print("{0:>12}: {1:>10.1f} rows/s {2:>8.2f} MB/s  p50 {3} p99 {4} sec/{5}".format(
+                  name, r['rowsPerSec'], r['mbPerSec'], r['latencyP50'], r['latencyP99'], r['latencyUnit']))
+    finally:
+        for f in (dbFile, dbFile + '-wal', dbFile + '-shm'):
+            if os.path.exists(f):
+                os.remove(f)
+
+    with open(reportFile, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print("Report written to {0}".format(reportFile))
@@ -0,0 +1,215 @@
+#  Fast CSV file writer for bulk loading SAP/HANA DB tables.
+#
+#  Every record written by populateHanaDB is the same line, so instead of
+#  joining & writing line by line the line is turned into bytes once and
+#  the file is written as a repeating byte stream in large aligned blocks.
+#  Because every line has the same length the byte offset of any record is
+#  known up front, which also lets several processes write their own byte
+#  range of the same file.
+#
+#  The CSV can also be streamed through a named pipe (FIFO) that IMPORT FROM
+#  CSV FILE reads from, so the data goes from the generator to the table
+#  without being staged on disk (see streamCSV()).
+#
+import errno
+import io
+import mmap
+import multiprocessing
+import os
+import time
+try:
+        import fcntl
+except ImportError:
+        fcntl = None
+
+# Size of each write.  Writes start on multiples of BLOCKSIZE.
+BLOCKSIZE = 4 * 1048576
+
+def csvLine(record, fieldDelimiter=',', recordDelimiter='\n'):
+    """
+    Return the CSV line for record as bytes.
+    """
+    return (fieldDelimiter.join([str(c) for c in record]) + recordDelimiter).encode('utf-8')
+
+def _stream(line):
+    """
+    Precompute the line repeated enough times that any BLOCKSIZE window
+    of the file can be sliced out of it starting at (offset % len(line)).
+    """
+    return line * (BLOCKSIZE // len(line) + 2)
+
+def _blocks(stream, lineLen, start, end):
+    """
+    Yield (offset, data) for the byte range [start, end).  The first block
+    is shortened so every later block starts on a BLOCKSIZE boundary.
+    """
+    view = memoryview(stream)
+    offset = start
+    while offset < end:
+        n = min(BLOCKSIZE - (offset % BLOCKSIZE), end - offset)
+        phase = offset % lineLen
+        yield offset, view[phase:phase + n]
+        offset = offset + n
+
+def _writeRange(fileName, line, start, end, useMmap):
+    """
+    Write the byte range [start, end) of an already sized file.
+    """
+    stream = _stream(line)
+    if useMmap:
+        with open(fileName, 'r+b') as f:
+            # mmap offsets have to be a multiple of the allocation granularity.
+            base = start - (start % mmap.ALLOCATIONGRANULARITY)
+            mm = mmap.mmap(f.fileno(), end - base, offset=base)
+            try:
+                for offset, data in _blocks(stream, len(line), start, end):
+                    mm[offset - base:offset - base + len(data)] = data.tobytes()
+                mm.flush()
+            finally:
+                mm.close()
+    else:
+        with io.open(fileName, 'r+b', buffering=0) as f:
+            f.seek(start)
+            for offset, data in _blocks(stream, len(line), start, end):
+                f.write(data)
+
+def writeCSV(fileName, record, numRec, processes=1, useMmap=False, preallocate=False,
+             fieldDelimiter=',', recordDelimiter='\n'):
+    """
+    Write numRec copies of record to fileName in CSV format.
+
+    Parameter:
+       fileName - CSV file to create (truncated if it exists).
+         record - List of column values.
+         numRec - Number of records (lines).
+      processes - Number of processes, each writing its own byte range.
+        useMmap - Write through a memory map of the file instead of write().
+    preallocate - Allocate the disk blocks up front with posix_fallocate()
+                  (where the OS/python supports it).
+
+    Returns (bytes written, seconds).
+    """
+    line = csvLine(record, fieldDelimiter, recordDelimiter)
+    size = len(line) * numRec
+    t0 = time.time()
+
+    with open(fileName, 'wb') as f:
+        if preallocate and size > 0 and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, size)
+        f.truncate(size)
+
+    if size > 0:
+        if processes > 1:
+            # Split on block boundaries so every process does aligned writes.
+            chunk = -(-size // processes)
+            chunk = -(-chunk // BLOCKSIZE) * BLOCKSIZE
+            procs = []
+            for start in range(0, size, chunk):
+                p = multiprocessing.Process(target=_writeRange,
+                                            args=(fileName, line, start, min(start + chunk, size), useMmap))
+                p.start()
+                procs.append(p)
+            for p in procs:
+                p.join()
+                if p.exitcode != 0:
+                    raise IOError("CSV writer process for \"{0}\" exited with {1}".format(fileName, p.exitcode))
+        else:
+            _writeRange(fileName, line, 0, size, useMmap)
+
+    return size, time.time() - t0
+
+def writeCSVChunks(fileName, chunks):
+    """
+    Write an iterable of CSV chunks (bytes, e.g. from dataGenerator.iterCSV())
+    to fileName in BLOCKSIZE sized buffered writes.  Used for generated data
+    whose lines do not all have the same length.
+
+    Returns (bytes written, seconds).
+    """
+    size = 0
+    t0 = time.time()
+    with io.open(fileName, 'wb', buffering=BLOCKSIZE) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size = size + len(chunk)
+    return size, time.time() - t0
+
+def csvChunks(record, numRec, fieldDelimiter=',', recordDelimiter='\n'):
+    """
+    Yield the CSV of numRec copies of record in blocks of up to BLOCKSIZE
+    bytes (the blocks writeCSV() writes), e.g. for streamCSV().
+    """
+    line = csvLine(record, fieldDelimiter, recordDelimiter)
+    for offset, data in _blocks(_stream(line), len(line), 0, len(line) * numRec):
+        yield data
+
+def numberedCSVChunks(record, numRec, first=0, fieldDelimiter=',', recordDelimiter='\n'):
+    """
+    Yield the CSV of numRec records in blocks of about BLOCKSIZE bytes:
+    record with the start of its first field overwritten by the record's
+    number (first, first + 1, ...), so every line is unique but keeps the
+    record's length (as long as the number fits into the first field).
+    """
+    line = csvLine(record, fieldDelimiter, recordDelimiter)
+    width = len(str(record[0]).encode('utf-8'))
+    perBlock = max(1, BLOCKSIZE // len(line))
+    n = first
+    end = first + int(numRec)
+    while n < end:
+        lines = []
+        for i in range(n, min(end, n + perBlock)):
+            number = str(i).encode('ascii')[-width:]
+            lines.append(number + line[len(number):])
+        n = n + len(lines)
+        yield b''.join(lines)
+
+def makeFifo(fileName):
+    """
+    Create a named pipe (FIFO) at fileName, replacing whatever is there.
+    Returns False if the OS or the file system does not support FIFOs.
+    """
+    if not hasattr(os, 'mkfifo') or fcntl is None:
+        return False
+    try:
+        if os.path.lexists(fileName):
+            os.remove(fileName)
+        os.mkfifo(fileName, 0o644)
+    except OSError as e:
+        print("WARNING: cannot create FIFO \"{0}\": {1}".format(fileName, e))
+        return False
+    return True
+
+def streamCSV(fileName, chunks, cancel=None, timeout=None):
+    """
+    Write an iterable of CSV chunks into the FIFO fileName while its
+    reader (the IMPORT FROM CSV FILE statement) consumes them.  Nothing
+    touches the disk; the writer blocks whenever the pipe is full.
+
+    Opening waits until the reader opens the FIFO.  If cancel (a
+    threading.Event) is set or timeout seconds pass first, e.g. because the
+    IMPORT failed before it got to the file, IOError is raised instead of
+    waiting forever.  IOError is also raised if the reader goes away
+    before everything was written.
+
+    Returns (bytes written, seconds).
+    """
+    t0 = time.time()
+    fd = None
+    while fd is None:
+        try:
+            # Non blocking so the wait for the reader can be given up.
+            fd = os.open(fileName, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+            if (cancel is not None and cancel.is_set()) or (timeout is not None and time.time() - t0 > timeout):
+                raise IOError(errno.ENXIO, "No reader opened the FIFO", fileName)
+            time.sleep(0.01)
+
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+    size = 0
+    with io.open(fd, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size = size + len(chunk)
+    return size, time.time() - t0
@@ -0,0 +1,242 @@
+#  Schema driven synthetic data for SAP/HANA DB tables.
+#
+#  Repeating one record makes HANA's column store dictionary compress the
+#  table down to almost nothing.  This generator looks at the table's column
+#  types (database.getColumnInfo()) and produces batches of rows with a
+#  configurable number of distinct values, value length and NULL rate per
+#  column, so the loaded data behaves more like real data.
+#
+#  Values are built a whole batch (column) at a time with NumPy when it is
+#  available.  SAP's bundled python usually does not have NumPy, in which
+#  case the (slower) random module is used instead.
+#
+import binascii
+import datetime
+import random
+import sys
+from hanaDatabase import INTTYPES, DECTYPES, FLOATTYPES, BINTYPES, DATEFORMATS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LETTERS = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+# Maps every random byte to a letter.
+TOLETTERS = bytes(bytearray([bytearray(LETTERS)[i % len(LETTERS)] for i in range(256)]))
+
+# Column types are grouped like hanaDatabase's value converters group them.
+# Anything not numeric, date/time, boolean or binary is treated as text.
+DATETYPES = tuple(DATEFORMATS)
+# Largest value generated per integer type.
+INTRANGES = {'TINYINT': 255, 'SMALLINT': 32767, 'INTEGER': 2147483647, 'INT': 2147483647, 'BIGINT': 9223372036854775807}
+
+# Per column defaults.  See dataGenerator.__init__().
+DEFAULTSPEC = {'cardinality': 1000, 'minLen': 1, 'maxLen': None, 'lenDist': 'uniform', 'nullRate': 0.0}
+
+def _text(b):
+    """
+    ASCII bytes to the native str type.
+    """
+    if sys.version_info[0] < 3:
+        return b
+    return b.decode('ascii')
+
+class dataGenerator:
+    def __init__(self, columnInfo, spec=None, seed=None):
+        """
+        Parameter:
+         columnInfo - List of (name, type, length, scale) as returned by
+                      database.getColumnInfo().
+               spec - Optional dictionary of column name -> options.  The
+                      '*' entry applies to every column.  Options:
+                        cardinality - Number of distinct values.  0 means
+                                      every value is generated fresh.
+                      minLen/maxLen - Text/binary value length range.  maxLen
+                                      defaults to the column length.
+                            lenDist - 'uniform', 'normal' or 'fixed' (maxLen).
+                           nullRate - Fraction of values that are NULL.
+               seed - Random seed, so runs (or processes) can be repeated
+                      or made to differ.
+        """
+        if not columnInfo:
+            raise ValueError("Column info must be provided.")
+
+        spec = spec or {}
+        if numpy is not None:
+            self.rng = numpy.random.RandomState(seed)
+        else:
+            self.rng = random.Random(seed)
+
+        self.columns = []
+        for name, colType, length, scale in columnInfo:
+            opts = dict(DEFAULTSPEC)
+            opts.update(spec.get('*', {}))
+            opts.update(spec.get(name, {}))
+            col = {'name': name, 'type': colType.upper(), 'length': length, 'scale': scale or 0}
+            col.update(opts)
+            if col['maxLen'] is None:
+                col['maxLen'] = length or 32
+            if length:
+                col['maxLen'] = min(col['maxLen'], length)
+            col['minLen'] = max(0, min(col['minLen'], col['maxLen']))
+            col['dictionary'] = None
+            if col['cardinality'] > 0:
+                col['dictionary'] = self.__values(col, col['cardinality'])
+            self.columns.append(col)
+
+    def __ints(self, high, n):
+        if numpy is not None:
+            return self.rng.randint(0, high, size=n)
+        return [self.rng.randrange(high) for i in range(n)]
+
+    def __lengths(self, col, n):
+        lo, hi = col['minLen'], col['maxLen']
+        if col['lenDist'] == 'fixed' or lo == hi:
+            return [hi] * n
+        if col['lenDist'] == 'normal':
+            mean, sd = (lo + hi) / 2.0, (hi - lo) / 6.0
+            if numpy is not None:
+                lens = numpy.clip(numpy.rint(self.rng.normal(mean, sd, size=n)), lo, hi).astype(int)
+            else:
+                lens = [int(min(hi, max(lo, round(self.rng.gauss(mean, sd))))) for i in range(n)]
+            return list(lens)
+        if numpy is not None:
+            return list(self.rng.randint(lo, hi + 1, size=n))
+        return [self.rng.randint(lo, hi) for i in range(n)]
+
+    def __strings(self, lengths, binary=False):
+        """
+        Random letter strings (or random bytes) of the given lengths.
+        """
+        size = sum(lengths)
+        if size == 0:
+            raw = b''
+        elif numpy is not None:
+            raw = self.rng.bytes(size)
+        else:
+            raw = binascii.unhexlify('%0*x' % (2 * size, self.rng.getrandbits(8 * size)))
+        if not binary:
+            raw = raw.translate(TOLETTERS)
+
+        vals = []
+        offset = 0
+        for l in lengths:
+            vals.append(raw[offset:offset + l])
+            offset = offset + l
+        if binary:
+            return vals
+        return [_text(v) for v in vals]
+
+    def __values(self, col, n):
+        """
+        n fresh values for col.
+        """
+        t = col['type']
+        if t in INTTYPES:
+            return [int(v) for v in self.__ints(INTRANGES[t], n)]
+        if t in DECTYPES:
+            digits = min(col['length'] or 15, 15)
+            fmt = '{0:.%df}' % col['scale']
+            scale = 10.0 ** col['scale']
+            return [fmt.format(v / scale) for v in self.__ints(10 ** digits, n)]
+        if t in FLOATTYPES:
+            return ['{0:.6f}'.format(v / 1000000.0) for v in self.__ints(10 ** 12, n)]
+        if t in DATETYPES:
+            base = datetime.datetime(2000, 1, 1)
+            secs = self.__ints(30 * 365 * 86400, n)
+            stamps = [base + datetime.timedelta(seconds=int(s)) for s in secs]
+            if t == 'DATE':
+                return [s.strftime('%Y-%m-%d') for s in stamps]
+            if t == 'TIME':
+                return [s.strftime('%H:%M:%S') for s in stamps]
+            return [s.strftime('%Y-%m-%d %H:%M:%S') for s in stamps]
+        if t == 'BOOLEAN':
+            return [('TRUE', 'FALSE')[v] for v in self.__ints(2, n)]
+        return self.__strings(self.__lengths(col, n), binary=t in BINTYPES)
+
+    def __column(self, col, n):
+        """
+        n values for col drawn from its dictionary (or fresh) with NULLs.
+        """
+        if col['dictionary'] is not None:
+            d = col['dictionary']
+            vals = [d[i] for i in self.__ints(len(d), n)]
+        else:
+            vals = self.__values(col, n)
+
+        if col['nullRate'] > 0:
+            if numpy is not None:
+                for i in numpy.nonzero(self.rng.random_sample(n) < col['nullRate'])[0]:
+                    vals[i] = None
+            else:
+                for i in range(n):
+                    if self.rng.random() < col['nullRate']:
+                        vals[i] = None
+        return vals
+
+    def batch(self, n):
+        """
+        Generate n rows as a list of columns (one list of values per column).
+        """
+        return [self.__column(col, n) for col in self.columns]
+
+    def rows(self, n):
+        """
+        Generate n rows as a list of row tuples, e.g. for database.addMany().
+        """
+        return list(zip(*self.batch(n)))
+
+    def iterRows(self, numRec, batchSize=1000):
+        """
+        Generator of numRec rows, built batchSize rows at a time.
+        """
+        numRec = int(numRec)
+        while numRec > 0:
+            n = min(batchSize, numRec)
+            for row in self.rows(n):
+                yield row
+            numRec = numRec - n
+
+    def csv(self, n, fieldDelimiter=',', recordDelimiter='\n'):
+        """
+        Generate n rows as CSV lines (bytes).  NULL is an empty field and
+        binary values are written as hex.
+        """
+        cols = []
+        for col, vals in zip(self.columns, self.batch(n)):
+            if col['type'] in BINTYPES:
+                cols.append(['' if v is None else _text(binascii.hexlify(v)) for v in vals])
+            else:
+                cols.append(['' if v is None else str(v) for v in vals])
+        lines = recordDelimiter.join([fieldDelimiter.join(r) for r in zip(*cols)])
+        if n > 0:
+            lines = lines + recordDelimiter
+        return lines.encode('utf-8')
+
+    def iterCSV(self, numRec, batchSize=1000, fieldDelimiter=',', recordDelimiter='\n'):
+        """
+        Generator of CSV chunks (bytes) adding up to numRec rows.
+        """
+        numRec = int(numRec)
+        while numRec > 0:
+            n = min(batchSize, numRec)
+            yield self.csv(n, fieldDelimiter, recordDelimiter)
+            numRec = numRec - n
+
+    def rowBytes(self):
+        """
+        Estimated average size of a row in bytes (the CSV line size).
+        """
+        size = len(self.columns)
+        for col in self.columns:
+            t = col['type']
+            if t in INTTYPES or t in DECTYPES or t in FLOATTYPES:
+                size = size + 10
+            elif t in DATETYPES:
+                size = size + 19
+            elif t == 'BOOLEAN':
+                size = size + 5
+            else:
+                size = size + (col['minLen'] + col['maxLen']) / 2.0 * (2 if t in BINTYPES else 1)
+        return int(size)
@@ -0,0 +1,408 @@
+#  Stand-in for hdbcli's dbapi module, backed by SQLite.
+#
+#  Lets hanaDatabase.py, populateHanaDB.py & benchmark.py run without a HANA
+#  system so loaders can be measured and compared offline.  The HANA
+#  specific SQL this package sends (catalog queries, IMPORT FROM CSV, local
+#  temporary tables, ...) is translated to SQLite, and every round trip can
+#  be given an artificial latency to stand in for the network & server:
+#
+#       import fakeDbapi
+#       fakeDbapi.install(statementLatency=0.0005, commitLatency=0.002)
+#       from hanaDatabase import *
+#
+#  install() has to run before hanaDatabase is imported.  Forked worker
+#  processes inherit it; spawned ones have to call it again.
+#
+#  NOTE: SQLite serializes writers, so concurrent sessions do not scale
+#        like HANA sessions do.  Compare loader modes with each other, not
+#        with a real system.
+#
+import csv
+import datetime
+import decimal
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Seconds added to every statement (execute, executemany, prepare, fetch
+# round trip) and to every commit/rollback.
+statementLatency = 0.0
+commitLatency = 0.0
+# SQLite database file shared by every connection (and forked process).
+dbFile = None
+
+# Statement, commit & delta merge counts since install(), see stats().
+counts = {'statements': 0, 'commits': 0, 'merges': 0}
+countsLock = threading.Lock()
+# Table settings changed with ALTER TABLE (upper case table name ->
+# {'AUTO_MERGE_ON': 'TRUE'|'FALSE', 'IS_LOGGED': ...}).  SQLite has no delta
+# storage, they are only kept so they can be read back.
+tableOptions = {}
+# SYS.TABLE_PARTITIONS rows of the tables created with PARTITION BY (upper
+# case table name -> rows).  SQLite tables are not partitioned.
+tablePartitions = {}
+
+apilevel = '2.0'
+threadsafety = 1
+paramstyle = 'qmark'
+
+class Error(Exception):
+    def __init__(self, *args):
+        Exception.__init__(self, *args)
+        self.errorcode = args[0] if args and isinstance(args[0], int) else -1
+        self.errortext = args[-1] if args else ''
+
+class ProgrammingError(Error):
+    pass
+
+# hdbcli binds these types natively, SQLite needs to be told how.
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_adapter(datetime.datetime, lambda v: v.isoformat(' '))
+sqlite3.register_adapter(datetime.date, lambda v: v.isoformat())
+sqlite3.register_adapter(datetime.time, lambda v: v.isoformat())
+
+def _count(name):
+    with countsLock:
+        counts[name] = counts[name] + 1
+
+def _wait(seconds, name):
+    _count(name)
+    if seconds > 0:
+        time.sleep(seconds)
+
+def _typeInfo(declared):
+    """
+    SQLite's declared column type, e.g. 'DECIMAL(10,2)', as HANA's
+    (DATA_TYPE_NAME, LENGTH, SCALE).
+    """
+    m = re.match(r'\s*([A-Za-z_ ]+?)\s*(?:\((\d+)\s*(?:,\s*(\d+))?\))?\s*$', declared or '')
+    if m is None:
+        return (declared.upper(), None, None)
+    name = m.group(1).upper()
+    length = int(m.group(2)) if m.group(2) else None
+    scale = int(m.group(3)) if m.group(3) else None
+    if length is None and name in ('INTEGER', 'INT'):
+        length = 10
+    return (name, length, scale)
+
+def _partitions(clause):
+    """
+    SYS.TABLE_PARTITIONS rows (PART_ID, LEVEL_1_TYPE, LEVEL_1_COUNT,
+    LEVEL_1_EXPRESSION, LEVEL_1_RANGE_MIN_VALUE, LEVEL_1_RANGE_MAX_VALUE)
+    for a HASH or RANGE PARTITION BY clause.  GET_NUM_SERVERS() is 1.
+    """
+    m = re.match(r'(HASH|RANGE)\s*\(([^)]*)\)\s*(.*)$', clause.strip(), re.I | re.S)
+    kind, expression, rest = m.group(1).upper(), m.group(2).replace(' ', ''), m.group(3)
+    if kind == 'HASH':
+        n = re.match(r'PARTITIONS\s+(\d+)', rest, re.I)
+        count = int(n.group(1)) if n else 1
+        return [(i + 1, kind, count, expression, '', '') for i in range(count)]
+    parts = re.findall(r"PARTITION\s+(?:'?([^'\s]*)'?\s*<=\s*VALUES\s*<\s*'?([^'\s,)]*)'?|(OTHERS))", rest, re.I)
+    return [(i + 1, kind, len(parts), expression, low, high) for i, (low, high, others) in enumerate(parts)]
+
+class Cursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.cursor = conn.db.cursor()
+        self.rows = None
+        self.rowcount = -1
+        self.description = None
+        self.arraysize = 1
+        self.sql = None
+
+    def __translate(self, sql, params):
+        """
+        Return (sqlite sql, params) for a HANA statement, or (None, rows)
+        for statements answered here.
+        """
+        s = sql.strip().rstrip(';').strip()
+        u = s.upper()
+
+        if u.startswith('SELECT COUNT(*) FROM SYS.TABLES'):
+            return "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND upper(name) = ?", params
+        if u.startswith('SELECT COLUMN_NAME, DATA_TYPE_NAME, LENGTH, SCALE FROM SYS.COLUMNS'):
+            return None, [(r[1].upper(),) + _typeInfo(r[2]) for r in self.__tableInfo(params[0])]
+        if u.startswith('SELECT COLUMN_NAME FROM SYS.M_CS_COLUMNS'):
+            return None, [(r[1].upper(),) for r in self.__tableInfo(params[0])]
+        if u.startswith('SELECT COLUMN_NAME FROM SYS.CONSTRAINTS'):
+            pk = sorted([r for r in self.__tableInfo(params[0]) if r[5]], key=lambda r: r[5])
+            return None, [(r[1].upper(),) for r in pk]
+        if u.startswith('SELECT TABLE_TYPE, AUTO_MERGE_ON, IS_LOGGED FROM SYS.TABLES'):
+            if not self.__tableInfo(params[0]):
+                return None, []
+            options = tableOptions.get(params[0].upper(), {})
+            return None, [('COLUMN', options.get('AUTO_MERGE_ON', 'TRUE'), options.get('IS_LOGGED', 'TRUE'))]
+        if u.startswith('SELECT PART_ID, LEVEL_1_TYPE') and 'SYS.TABLE_PARTITIONS' in u:
+            return None, list(tablePartitions.get(params[0].upper(), []))
+        if u.startswith('SELECT PART_ID, HOST, RECORD_COUNT FROM SYS.M_CS_TABLES'):
+            return None, []
+        if u.startswith('SELECT 1 FROM DUMMY'):
+            return 'SELECT 1', params
+        if u.startswith('ALTER SYSTEM'):
+            return None, []
+
+        m = re.match(r"IMPORT FROM CSV FILE '([^']+)' INTO (\S+)", s, re.I)
+        if m:
+            return None, self.__import(m.group(1), m.group(2))
+
+        m = re.match(r'ALTER TABLE (\S+) (ENABLE|DISABLE) (AUTOMERGE|DELTA LOG)$', s, re.I)
+        if m:
+            option = 'AUTO_MERGE_ON' if m.group(3).upper() == 'AUTOMERGE' else 'IS_LOGGED'
+            tableOptions.setdefault(m.group(1).upper(), {})[option] = 'TRUE' if m.group(2).upper() == 'ENABLE' else 'FALSE'
+            return None, []
+        if u.startswith('MERGE DELTA OF'):
+            _count('merges')
+            return None, []
+
+        m = re.match(r'CREATE LOCAL TEMPORARY (?:COLUMN |ROW )?TABLE (#\w+) AS \((.*)\) WITH NO DATA$', s, re.I | re.S)
+        if m:
+            return 'CREATE TEMP TABLE "{0}" AS {1} LIMIT 0'.format(m.group(1), m.group(2)), params
+
+        # HANA: UPDATE T SET ... FROM T, S WHERE ...  SQLite: UPDATE T SET ... FROM S WHERE ...
+        m = re.match(r'UPDATE (\S+) SET (.*) FROM \1, (#?\w+) (\w+) WHERE (.*)$', s, re.S)
+        if m:
+            s = 'UPDATE {0} SET {1} FROM {2} {3} WHERE {4}'.format(*m.groups())
+
+        m = re.match(r'UPSERT (\S+) (.*) WITH PRIMARY KEY$', s, re.I | re.S)
+        if m:
+            s = 'INSERT OR REPLACE INTO {0} {1}'.format(m.group(1), m.group(2))
+
+        m = re.match(r'(CREATE .*\))\s*PARTITION BY (.*)$', s, re.I | re.S)
+        if m:
+            s = m.group(1)
+            name = re.match(r'CREATE (?:COLUMN |ROW )?TABLE (\S+)', s, re.I).group(1)
+            tablePartitions[name.upper()] = _partitions(m.group(2))
+        m = re.match(r'DROP TABLE (\S+)$', s, re.I)
+        if m:
+            tablePartitions.pop(m.group(1).upper(), None)
+            tableOptions.pop(m.group(1).upper(), None)
+
+        s = re.sub(r'^CREATE (?:COLUMN|ROW) TABLE', 'CREATE TABLE', s, flags=re.I)
+        # Local temporary table names start with '#'.
+        s = re.sub(r'(?<!["\w])(#\w+)', r'"\1"', s)
+        return s, params
+
+    def __tableInfo(self, tableName):
+        self.cursor.execute('PRAGMA table_info("{0}")'.format(tableName))
+        info = self.cursor.fetchall()
+        if not info:
+            # Unquoted HANA names are upper case, SQLite keeps them as written.
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND upper(name) = ?", [tableName.upper()])
+            row = self.cursor.fetchone()
+            if row is not None:
+                self.cursor.execute('PRAGMA table_info("{0}")'.format(row[0]))
+                info = self.cursor.fetchall()
+        return info
+
+    def __import(self, fileName, tableName):
+        """
+        Emulate IMPORT FROM CSV FILE: the whole file in one statement.
+        NULL is an empty field.
+        """
+        if not os.path.exists(fileName):
+            raise Error(2, "Cannot open file {0}".format(fileName))
+        with open(fileName) as f:
+            rows = [[None if v == '' else v for v in row] for row in csv.reader(f)]
+        if rows:
+            insert = 'INSERT INTO {0} VALUES ({1})'.format(tableName, ','.join(['?'] * len(rows[0])))
+            self.__run(self.cursor.executemany, insert, rows)
+        self.rowcount = len(rows)
+        return []
+
+    def __run(self, func, sql, params):
+        try:
+            if params is None:
+                return func(sql)
+            return func(sql, params)
+        except sqlite3.Error as e:
+            # A failed statement does not keep an autocommit session's
+            # (SQLite write) transaction open, like on HANA.
+            self.connection.statementFailed()
+            raise Error(-1, "{0}: {1}".format(e, sql))
+
+    def execute(self, sql, params=None):
+        self.connection.check()
+        _wait(statementLatency, 'statements')
+        self.rows = None
+        self.rowcount = -1
+        translated, params = self.__translate(sql, params)
+        if translated is None:
+            self.rows = list(params)
+            self.description = None
+            return True
+        # Queries outside a transaction run in SQLite's own autocommit.
+        write = not translated.lstrip().upper().startswith(('SELECT', 'PRAGMA', 'WITH'))
+        if write:
+            self.connection.begin()
+        self.__run(self.cursor.execute, translated, params)
+        self.rowcount = self.cursor.rowcount
+        self.description = self.cursor.description
+        if write:
+            self.connection.statementDone()
+        return True
+
+    def executemany(self, sql, seq):
+        """
+        One round trip (and, with autocommit, one transaction) for all rows
+        like hdbcli's array execute.
+        """
+        self.connection.check()
+        _wait(statementLatency, 'statements')
+        translated, params = self.__translate(sql, None)
+        seq = list(seq)
+        self.connection.begin()
+        self.__run(self.cursor.executemany, translated, seq)
+        self.rowcount = len(seq)
+        self.connection.statementDone()
+        return [1] * len(seq)
+
+    def prepare(self, sql):
+        self.connection.check()
+        _wait(statementLatency, 'statements')
+        self.sql = sql
+        return True
+
+    def executeprepared(self, params=None):
+        if self.sql is None:
+            raise ProgrammingError(-1, "No statement prepared")
+        return self.execute(self.sql, params)
+
+    def executemanyprepared(self, seq):
+        if self.sql is None:
+            raise ProgrammingError(-1, "No statement prepared")
+        return self.executemany(self.sql, seq)
+
+    def fetchone(self):
+        if self.rows is not None:
+            return self.rows.pop(0) if self.rows else None
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        _wait(statementLatency, 'statements')
+        if self.rows is not None:
+            rows, self.rows = self.rows[:size], self.rows[size:]
+            return rows
+        return self.cursor.fetchmany(size)
+
+    def fetchall(self):
+        if self.rows is not None:
+            rows, self.rows = self.rows, []
+            return rows
+        return self.cursor.fetchall()
+
+    def close(self):
+        if self.connection.open:
+            self.cursor.close()
+
+class Connection:
+    def __init__(self):
+        self.db = sqlite3.connect(dbFile, timeout=600, check_same_thread=False, isolation_level=None)
+        if sys.version_info[0] < 3:
+            self.db.text_factory = str
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.autocommit = True
+        self.inTransaction = False
+        self.open = True
+
+    def begin(self):
+        if not self.inTransaction:
+            self.db.execute('BEGIN')
+            self.inTransaction = True
+
+    def statementDone(self):
+        if self.autocommit:
+            self.__end('COMMIT')
+
+    def statementFailed(self):
+        if self.autocommit:
+            self.__end('ROLLBACK')
+
+    def __end(self, stmt):
+        if self.inTransaction:
+            self.inTransaction = False
+            self.db.execute(stmt)
+
+    def check(self):
+        # Like a session lost in a takeover: every later call fails.
+        if not self.open:
+            raise Error(-10807, "Connection down")
+
+    def cursor(self):
+        self.check()
+        return Cursor(self)
+
+    def commit(self):
+        self.check()
+        _wait(commitLatency, 'commits')
+        self.__end('COMMIT')
+
+    def rollback(self):
+        self.check()
+        _wait(commitLatency, 'commits')
+        self.__end('ROLLBACK')
+
+    def setautocommit(self, autocommit=True):
+        if autocommit:
+            self.__end('COMMIT')
+        self.autocommit = autocommit
+
+    def getautocommit(self):
+        return self.autocommit
+
+    def isconnected(self):
+        return self.open
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self.db.close()
+
+def connect(address='', port=0, user='', password='', **kw):
+    _wait(statementLatency, 'statements')
+    return Connection()
+
+def stats():
+    """
+    Return the statement & commit round trips and delta merges made so
+    far.
+    """
+    with countsLock:
+        return dict(counts)
+
+def install(statementLatency=0.0, commitLatency=0.0, fileName=None):
+    """
+    Register this module as hdbcli.dbapi so 'from hdbcli import dbapi'
+    finds it.
+
+    Parameter:
+    statementLatency - Seconds added to every statement round trip.
+       commitLatency - Seconds added to every commit/rollback.
+            fileName - SQLite database file.  Defaults to a new file in the
+                       temp directory.  WAL mode lets sessions read while
+                       another writes.
+    """
+    module = sys.modules[__name__]
+    module.statementLatency = statementLatency
+    module.commitLatency = commitLatency
+    if fileName is None:
+        fd, fileName = tempfile.mkstemp(prefix='fakehana.', suffix='.sqlite')
+        os.close(fd)
+    module.dbFile = fileName
+    with countsLock:
+        for name in counts:
+            counts[name] = 0
+
+    db = sqlite3.connect(fileName)
+    db.execute('PRAGMA journal_mode = WAL')
+    db.close()
+
+    package = type(sys)('hdbcli')
+    package.dbapi = module
+    sys.modules['hdbcli'] = package
+    sys.modules['hdbcli.dbapi'] = module
+    return fileName
@@ -0,0 +1,243 @@
+#  Takeover latency probe for SAP/HANA DB.
+#
+#  Runs a lightweight heartbeat next to (or instead of) a load: every
+#  interval seconds one probe writes (UPSERT, committed) and reads back a
+#  row of a small heartbeat table over its own session, and records its
+#  latency and outcome.  Failed probes drop the session and the next probe
+#  reconnects (to any of the candidate hosts), so the timeline shows what
+#  clients experience during a takeover: when the outage started, how long
+#  no probe succeeded, which host answered afterwards and how long after
+#  reconnecting the first probe succeeded.
+#
+#  Probes are scheduled at fixed times (start + n * interval), so a probe
+#  stuck waiting for the server does not hide the probes that should have
+#  run meanwhile; they run late and their latency counts from their
+#  scheduled time.
+#
+#       probe = haProbe(db, interval=0.2).start()
+#       ... load ...
+#       probe.stop()
+#       probe.writeCSV('timeline.csv')
+#       probe.writeJSON('probe.json')
+#
+import json
+import threading
+import time
+from hdbcli import dbapi
+import hanaDatabase
+import hanaMetrics
+
+class haProbe:
+    def __init__(self, db, interval=0.2, timeout=5.0, name=None, probeTable='HA_PROBE', metrics=None):
+        """
+        Parameter:
+                db - database instance to probe.  The probe opens its own
+                     session to the same hosts (see database's hosts).
+          interval - Seconds between probe starts.
+           timeout - Connect timeout (seconds) of reconnect attempts.
+              name - Key of this probe's heartbeat row.  Defaults to the
+                     database's table name.
+        probeTable - Heartbeat table, created if it does not exist.
+           metrics - hanaMetrics.metrics to record probes in ('probe' op).
+                     Defaults to the database's registry.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be greater than 0.")
+
+        self.db = db
+        self.interval = interval
+        self.name = name or db.tableName.upper()
+        self.probeTable = probeTable
+        self.metrics = metrics or db.metrics
+        self.connector = hanaDatabase.reconnector(db.connector.hosts, db.user, db.passwd, retries=0,
+                                                  metrics=self.metrics,
+                                                  properties={'connectTimeout': int(timeout * 1000)})
+        self.conn = None
+        self.tableReady = False
+        self.seq = 0
+        # (n, scheduled time, latency, ok, error, address:port, time the
+        #  probe's new session connected or None)
+        self.samples = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__loop)
+        self.thread.daemon = True
+
+    def __close(self):
+        try:
+            self.conn.close()
+        except dbapi.Error:
+            pass
+        self.conn = None
+
+    def __prepare(self, cursor):
+        cursor.execute("SELECT COUNT(*) FROM SYS.TABLES WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?", [self.probeTable])
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("""CREATE COLUMN TABLE {0} (NAME NVARCHAR(256) PRIMARY KEY,
+                              SEQ BIGINT, PROBED_AT TIMESTAMP)""".format(self.probeTable))
+        self.tableReady = True
+
+    def probe(self):
+        """
+        Run one probe: (re)connect if needed, write & read back the
+        heartbeat row.  Returns (exception or None, time a new session
+        connected or None).
+        """
+        connectedAt = None
+        try:
+            if self.conn is None:
+                self.conn = self.connector.connect()
+                connectedAt = time.time()
+            self.seq = self.seq + 1
+            cursor = self.conn.cursor()
+            try:
+                if not self.tableReady:
+                    self.__prepare(cursor)
+                cursor.execute("UPSERT {0} (NAME, SEQ, PROBED_AT) VALUES (?, ?, CURRENT_TIMESTAMP) WITH PRIMARY KEY".format(
+                               self.probeTable), [self.name, self.seq])
+                cursor.execute("SELECT SEQ FROM {0} WHERE NAME = ?".format(self.probeTable), [self.name])
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+            if row is None or int(row[0]) != self.seq:
+                return ValueError("stale heartbeat read"), connectedAt
+            return None, connectedAt
+        except dbapi.Error as e:
+            if self.conn is not None:
+                self.__close()
+            return e, connectedAt
+
+    def __loop(self):
+        start = time.time()
+        n = 0
+        while not self.stopped.is_set():
+            scheduled = start + n * self.interval
+            wait = scheduled - time.time()
+            if wait > 0 and self.stopped.wait(wait):
+                break
+            e, connectedAt = self.probe()
+            latency = time.time() - scheduled
+            host = '{0}:{1}'.format(*self.connector.current())
+            error = None
+            if e is None:
+                self.metrics.observe('probe', latency)
+            else:
+                self.metrics.error('probe', e)
+                error = str(getattr(e, 'errorcode', None) or e)
+            with self.lock:
+                self.samples.append((n, scheduled, latency, e is None, error, host, connectedAt))
+            n = n + 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.conn is not None:
+            self.__close()
+
+    def outages(self):
+        """
+        Return the outage windows (runs of failed probes) as dictionaries:
+
+                 start - Scheduled time of the first failed probe.
+           lastSuccess - End of the last successful probe before it.
+          firstSuccess - End of the first successful probe after it (None
+                         if the outage lasted until the probe stopped).
+              duration - firstSuccess - lastSuccess: how long clients saw
+                         no successful round trip.
+         reconnectedAt - When the last new session of the outage connected.
+    timeToFirstSuccess - firstSuccess - reconnectedAt.
+          failedProbes - Number of failed probes, errors by error code.
+  hostBefore/hostAfter - Host answering before & after (they differ after
+                         a takeover to the secondary).
+        """
+        with self.lock:
+            samples = list(self.samples)
+
+        outages = []
+        current = None
+        lastEnd = None
+        lastHost = None
+        for n, scheduled, latency, ok, error, host, connectedAt in samples:
+            end = scheduled + latency
+            if current is not None and connectedAt is not None:
+                current['reconnectedAt'] = connectedAt
+            if not ok:
+                if current is None:
+                    current = {'start': scheduled, 'lastSuccess': lastEnd, 'firstSuccess': None,
+                               'duration': None, 'reconnectedAt': None, 'timeToFirstSuccess': None,
+                               'failedProbes': 0, 'errors': {}, 'hostBefore': lastHost, 'hostAfter': None}
+                    outages.append(current)
+                current['failedProbes'] = current['failedProbes'] + 1
+                current['errors'][error] = current['errors'].get(error, 0) + 1
+            else:
+                if current is not None:
+                    current['firstSuccess'] = end
+                    current['duration'] = end - (current['lastSuccess'] or current['start'])
+                    if current['reconnectedAt'] is not None:
+                        current['timeToFirstSuccess'] = end - current['reconnectedAt']
+                    current['hostAfter'] = host
+                    current = None
+                lastEnd = end
+                lastHost = host
+        return outages
+
+    def summary(self):
+        """
+        Return probe counts, latency percentiles of the successful probes
+        (see hanaMetrics.histogram) and the outage windows.
+        """
+        hist = hanaMetrics.histogram()
+        with self.lock:
+            samples = list(self.samples)
+        for s in samples:
+            if s[3]:
+                hist.record(s[2])
+        outages = self.outages()
+        closed = [o['duration'] for o in outages if o['duration'] is not None]
+        return {'probes': len(samples), 'failed': len([s for s in samples if not s[3]]),
+                'interval': self.interval, 'latency': hist.snapshot(), 'outages': outages,
+                'longestOutage': max(closed) if closed else 0.0}
+
+    def writeCSV(self, fileName):
+        """
+        Write the timeline, one probe per line.
+        """
+        with self.lock:
+            samples = list(self.samples)
+        with open(fileName, 'w') as f:
+            f.write('seq,time,latency,ok,error,host,connected\n')
+            for n, scheduled, latency, ok, error, host, connectedAt in samples:
+                f.write('{0},{1:.6f},{2:.6f},{3},{4},{5},{6}\n'.format(
+                        n, scheduled, latency, int(ok), error or '', host,
+                        '' if connectedAt is None else '{0:.6f}'.format(connectedAt)))
+
+    def writeJSON(self, fileName):
+        """
+        Write the summary plus every probe.
+        """
+        report = self.summary()
+        with self.lock:
+            report['samples'] = [{'seq': s[0], 'time': round(s[1], 6), 'latency': round(s[2], 6), 'ok': s[3],
+                                  'error': s[4], 'host': s[5], 'connected': s[6]} for s in self.samples]
+        with open(fileName, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    def report(self):
+        """
+        Print the summary.
+        """
+        s = self.summary()
+        lat = s['latency']
+        print("Probe: {0} probes, {1} failed, latency p50 {2:.4f} p99 {3:.4f} max {4:.4f} sec".format(
+              s['probes'], s['failed'], lat['p50'], lat['p99'], lat['max'] or 0.0))
+        for o in s['outages']:
+            print("Outage at {0}: {1} failed probes, {2} sec without success, first success {3} sec after reconnect, {4} -> {5}".format(
+                  time.strftime('%H:%M:%S', time.localtime(o['start'])), o['failedProbes'],
+                  'n/a' if o['duration'] is None else '{0:.3f}'.format(o['duration']),
+                  'n/a' if o['timeToFirstSuccess'] is None else '{0:.3f}'.format(o['timeToFirstSuccess']),
+                  o['hostBefore'], o['hostAfter']))
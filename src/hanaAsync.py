@@ -0,0 +1,155 @@
+#  asyncio front end for the SAP/HANA DB database class.
+#
+#  hdbcli is blocking, so every operation runs on a long lived thread pool
+#  and the event loop only schedules them.  A semaphore bounds the number of
+#  operations in flight (running or waiting for a thread), which lets one
+#  process drive thousands of lightweight operations at a steady pace
+#  without building a new executor for every batch.
+#
+#  NOTE: Requires python 3.7+ (asyncio).  SAP's bundled python 2 can not
+#        import this module.
+#
+import asyncio
+import concurrent.futures
+import functools
+
+class asyncDatabase:
+    def __init__(self, db, maxInFlight=64, workers=None):
+        """
+        Parameter:
+                 db - database instance.  Give it a poolSize so each executor
+                      thread runs its operations in its own session.
+        maxInFlight - Maximum number of operations running or queued.
+            workers - Executor threads.  Defaults to the database's pool
+                      size (or 1 without a pool, as all share one session).
+        """
+        if maxInFlight < 1:
+            raise ValueError("maxInFlight must be greater than 0.")
+
+        if workers is None:
+            workers = db.pool.size if db.pool is not None else 1
+
+        self.db = db
+        self.maxInFlight = maxInFlight
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        # Created on first use so it belongs to the running event loop.
+        self.sem = None
+
+    async def __run(self, func, *args, **kw):
+        """
+        Run a blocking database call on the executor.  If the awaiting task
+        is cancelled before a thread picks the call up it never runs; a call
+        that is already running finishes but its result is dropped.
+        """
+        if self.sem is None:
+            self.sem = asyncio.Semaphore(self.maxInFlight)
+
+        async with self.sem:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kw))
+
+    async def add(self, rowData):
+        return await self.__run(self.db.add, rowData)
+
+    async def addMany(self, rows, batch_size=1000, commit_every=None):
+        return await self.__run(self.db.addMany, rows, batch_size=batch_size, commit_every=commit_every)
+
+    async def update(self, curRowData, newRowData):
+        return await self.__run(self.db.update, curRowData, newRowData)
+
+    async def delete(self, rowData):
+        return await self.__run(self.db.delete, rowData)
+
+    async def getAllRows(self):
+        return await self.__run(self.db.getAllRows)
+
+    async def importFromCSV(self, csvFile, fieldDelimiter=',', recordDelimiter='\n', threads=0, batch=0):
+        return await self.__run(self.db.importFromCSV, csvFile, fieldDelimiter, recordDelimiter, threads, batch)
+
+    async def drive(self, ops, interval=0.0, onDone=None):
+        """
+        Start one task per operation in ops, interval seconds apart, and
+        wait for all of them.  ops is an iterable of coroutines (e.g.
+        adb.addMany(batch) for each batch); it is consumed lazily so
+        it can be a generator of any length.  The semaphore keeps at most
+        maxInFlight of them running.
+
+        onDone(result) is called on the event loop for every finished
+        operation.  Cancelling drive() cancels every pending operation.
+
+        Returns (completed, failed) operation counts.
+        """
+        if self.sem is None:
+            self.sem = asyncio.Semaphore(self.maxInFlight)
+
+        counts = {'completed': 0, 'failed': 0}
+        tasks = set()
+
+        def finished(task):
+            tasks.discard(task)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                counts['failed'] += 1
+                print("ERROR: async operation failed: {0}".format(task.exception()))
+                return
+            counts['completed'] += 1
+            if onDone is not None:
+                onDone(task.result())
+
+        try:
+            for op in ops:
+                # Do not create tasks faster than they can be started.
+                while len(tasks) >= self.maxInFlight:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.ensure_future(op)
+                task.add_done_callback(finished)
+                tasks.add(task)
+                if interval > 0:
+                    await asyncio.sleep(interval)
+            if tasks:
+                await asyncio.wait(tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return counts['completed'], counts['failed']
+
+    def close(self):
+        """
+        Wait for running operations and stop the executor threads.  Their
+        pooled connections go back to the pool when the threads exit.
+        """
+        self.executor.shutdown(wait=True)
+
+def insertRows(db, batches, maxInFlight=64, workers=None, interval=0.0, onDone=None):
+    """
+    Blocking helper for callers that are not asyncio code (populateHanaDB.py
+    must still run on python 2).  Inserts every batch (list of rows) in
+    batches with database.addMany() through an asyncDatabase.
+
+    addMany() reports errors by adding fewer rows than it was given, so a
+    batch that comes up short counts as failed.  onDone(rows added) is
+    called for every batch that added rows, failed or not.
+
+    Returns (completed, failed) batch counts.
+    """
+    adb = asyncDatabase(db, maxInFlight=maxInFlight, workers=workers)
+
+    async def insert(batch):
+        added = await adb.addMany(batch, batch_size=len(batch))
+        if added and onDone is not None:
+            onDone(added)
+        if added < len(batch):
+            raise RuntimeError("only {0} of {1} rows added".format(added, len(batch)))
+        return added
+
+    async def run():
+        ops = (insert(batch) for batch in batches)
+        return await adb.drive(ops, interval=interval)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        adb.close()
@@ -2,18 +2,986 @@
 # 
 #  Author: tuttipazzo
 
+import binascii
+import contextlib
+import datetime
+import decimal
+import json
+import math
+import os
+import random
 import traceback
 from hdbcli import dbapi 
 import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import hanaMetrics
+try:
+        import numpy
+except ImportError:
+        numpy = None
 if sys.version_info[0] < 3:
-	from collections import OrderedDict
+        import Queue as queue
+        textTypes = (str, unicode)
+else:
+        import queue
+        textTypes = (str,)
+
+def transientError(e):
+    """
+    True if a dbapi.Error is worth retrying: the client's communication
+    errors (negative codes, e.g. -10709 connection failed, -10807
+    connection down) or an error without a code.  Server errors such as
+    authentication failed (10) or a deactivated user do not go away by
+    retrying.
+    """
+    code = getattr(e, 'errorcode', None)
+    try:
+        return code is None or int(code) < 0
+    except (TypeError, ValueError):
+        return True
+
+class reconnector:
+    def __init__(self, hosts, user, passwd, retries=5, backoff=1.0, maxBackoff=30.0, debug=False, metrics=None,
+                 properties=None):
+        """
+        Opens connections to the first reachable of several candidate
+        hosts (e.g. the primary and its system replication secondary), so
+        a load survives a takeover instead of failing every operation.
+
+        Parameter:
+             hosts - List of (address, port) to try, in order.  The host
+                     that answered last is tried first the next time.
+       user/passwd - Same as the database class.
+           retries - Rounds over all hosts after the first one fails
+                     before giving up.  Only transient errors (see
+                     transientError()) are retried, and only once a
+                     connection has succeeded: until then a failed round
+                     means the settings are wrong, not a takeover.
+           backoff - Seconds to wait after the first failed round.  Doubled
+                     (up to maxBackoff) after every further round, with
+                     jitter so many loaders do not reconnect in lock step.
+           metrics - hanaMetrics.metrics to record connects in.
+        properties - Further dbapi.connect() keyword arguments, e.g.
+                     {'connectTimeout': 5000} (milliseconds).
+        """
+        if not hosts:
+            raise ValueError("At least one host must be provided.")
+
+        self.hosts = list(hosts)
+        self.user = user
+        self.passwd = passwd
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.debug = debug
+        self.metrics = metrics or hanaMetrics.registry
+        self.properties = properties or {}
+        self.preferred = 0
+        self.connected = False
+        self.lock = threading.Lock()
+
+    def current(self):
+        """
+        Return the (address, port) that answered last.
+        """
+        with self.lock:
+            return self.hosts[self.preferred]
+
+    def connect(self):
+        """
+        Return a new connection, trying every host per round.  Raises the
+        last dbapi.Error if no host answered after all rounds, or at once
+        if the error is not transient.
+        """
+        delay = self.backoff
+        lastError = None
+        rounds = self.retries + 1 if self.connected else 1
+        for attempt in range(rounds):
+            with self.lock:
+                first = self.preferred
+            for i in range(len(self.hosts)):
+                index = (first + i) % len(self.hosts)
+                address, port = self.hosts[index]
+                if self.debug == True:
+                    print("Connecting to \"{0}:{1}\"".format(address,port))
+                try:
+                    with self.metrics.timed('connect'):
+                        conn = dbapi.connect(address=address, port=port, user=self.user, password=self.passwd,
+                                            **self.properties)
+                except dbapi.Error as e:
+                    if not transientError(e):
+                        raise
+                    lastError = e
+                    continue
+                with self.lock:
+                    self.preferred = index
+                    self.connected = True
+                if attempt > 0 or index != first:
+                    print("Reconnected to \"{0}:{1}\"".format(address,port))
+                return conn
+
+            if attempt < rounds - 1:
+                wait = delay * random.uniform(0.5, 1.0)
+                print("WARNING: no host reachable ({0}), retrying in {1:.1f} seconds".format(lastError,wait))
+                time.sleep(wait)
+                delay = min(self.maxBackoff, delay * 2)
+        raise lastError
+
+def connectionHealthy(conn):
+    """
+    Check that the connection is still usable.
+    """
+    try:
+        if not conn.isconnected():
+            return False
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM DUMMY")
+        cursor.fetchall()
+        cursor.close()
+    except dbapi.Error:
+        return False
+    return True
+
+class connectionPool:
+    def __init__(self, address, port, user, passwd, size, checkInterval=30, debug=False, metrics=None, connector=None):
+        """
+        Pool of HANA DB connections (sessions).  Each thread checks out
+        its own connection and keeps it until it checks it back in (or
+        the thread exits), so threads do not serialize on one session.
+
+        Parameter:
+           address/port/user/passwd - Same as the database class.
+                  size - Maximum number of connections.  Threads block in
+                         checkout() when all of them are in use.
+         checkInterval - Idle connections older than this (seconds) are
+                         health checked before being handed out again.
+               metrics - hanaMetrics.metrics to record connects in.
+             connector - reconnector to open connections with (failover
+                         hosts & backoff).  Defaults to address/port only.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be greater than 0.")
+
+        self.address = address
+        self.port = port
+        self.user = user
+        self.passwd = passwd
+        self.size = size
+        self.checkInterval = checkInterval
+        self.debug = debug
+        self.metrics = metrics or hanaMetrics.registry
+        self.connector = connector
+
+        # idle: list of [conn, last used time]
+        # owners: thread -> checked out conn (None while connecting)
+        self.idle = []
+        self.owners = {}
+        self.lock = threading.Condition()
+        self.local = threading.local()
+
+    def __connect(self):
+        if self.debug == True:
+            print("Pool: opening connection to \"{0}:{1}\"".format(self.address,self.port))
+        if self.connector is not None:
+            return self.connector.connect()
+        with self.metrics.timed('connect'):
+            return dbapi.connect(address=self.address, port=self.port, user=self.user, password=self.passwd)
+
+    def __close(self, conn):
+        try:
+            conn.close()
+        except dbapi.Error:
+            pass
+
+    def isHealthy(self, conn):
+        """
+        Check that the connection is still usable.
+        """
+        return connectionHealthy(conn)
+
+    def __reclaim(self):
+        """
+        Put connections of threads that exited without checking in
+        back into the idle list.  Must be called with the lock held.
+        """
+        for t in list(self.owners.keys()):
+            if not t.is_alive():
+                conn = self.owners.pop(t)
+                if conn is not None:
+                    self.idle.append([conn, 0])
+
+    def checkout(self):
+        """
+        Return the calling thread's connection, checking one out of the
+        pool (or opening a new one) if the thread does not have one yet.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        me = threading.current_thread()
+        with self.lock:
+            while True:
+                self.__reclaim()
+                if self.idle:
+                    conn, lastUsed = self.idle.pop()
+                    break
+                if len(self.owners) < self.size:
+                    lastUsed = None
+                    break
+                # Wake up periodically to reclaim connections from dead threads.
+                self.lock.wait(1.0)
+            self.owners[me] = None
+
+        try:
+            if conn is not None and (time.time() - lastUsed) >= self.checkInterval:
+                if not self.isHealthy(conn):
+                    if self.debug == True:
+                        print("Pool: dropping broken idle connection")
+                    self.__close(conn)
+                    conn = None
+            if conn is None:
+                conn = self.__connect()
+        except:
+            with self.lock:
+                del self.owners[me]
+                self.lock.notify()
+            raise
+
+        with self.lock:
+            self.owners[me] = conn
+        self.local.conn = conn
+        return conn
+
+    def checkin(self):
+        """
+        Give the calling thread's connection back to the pool.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        self.local.conn = None
+
+        with self.lock:
+            self.owners.pop(threading.current_thread(), None)
+            self.idle.append([conn, time.time()])
+            self.lock.notify()
+
+    def discard(self):
+        """
+        Close the calling thread's connection and free its pool slot.
+        The next checkout() opens a new connection.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        self.local.conn = None
+        self.__close(conn)
+
+        with self.lock:
+            self.owners.pop(threading.current_thread(), None)
+            self.lock.notify()
+
+    def current(self):
+        """
+        Return the calling thread's checked out connection (or None).
+        """
+        return getattr(self.local, 'conn', None)
+
+    def validate(self):
+        """
+        Health check the calling thread's connection and discard it if
+        it is broken (reconnect-on-broken).  Returns True if healthy.
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return True
+        if self.isHealthy(conn):
+            return True
+
+        print("WARNING: connection to \"{0}:{1}\" is broken, reconnecting on next use.".format(self.address,self.port))
+        self.discard()
+        return False
+
+    def closeAll(self):
+        """
+        Close every connection in the pool.
+        """
+        with self.lock:
+            conns = [c for c, t in self.idle] + [c for c in self.owners.values() if c is not None]
+            self.idle = []
+            self.owners = {}
+            self.lock.notify_all()
+        self.local = threading.local()
+        for conn in conns:
+            self.__close(conn)
+
+    def stats(self):
+        """
+        Return (size, in use, idle) connection counts.
+        """
+        with self.lock:
+            return (self.size, len(self.owners), len(self.idle))
+
+class statementCache:
+    def __init__(self, size=64):
+        """
+        LRU cache of prepared statements.  Every thread has its own cache,
+        keyed by its connection and the statement's key (operation & column
+        shape), so repeated operations skip both building the SQL text and
+        the server side SQL compilation.  A thread only ever closes its own
+        cursors, never one another thread is executing.
+
+        Parameter:
+           size - Maximum number of prepared statements kept per thread.
+        """
+        if size < 1:
+            raise ValueError("Statement cache size must be greater than 0.")
+
+        self.size = size
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.count = 0
+
+    def __close(self, cursor):
+        try:
+            cursor.close()
+        except dbapi.Error:
+            pass
+
+    def __entries(self):
+        entries = getattr(self.local, 'entries', None)
+        if entries is None:
+            entries = self.local.entries = OrderedDict()
+        return entries
+
+    def get(self, conn, key, buildSql):
+        """
+        Return (cursor, sql) for key on conn.  On a miss buildSql() is
+        called for the SQL text and a new cursor is prepared with it.
+        """
+        entries = self.__entries()
+        k = (id(conn), key)
+        entry = entries.pop(k, None)
+        if entry is not None and entry[0] is conn:
+            entries[k] = entry
+            with self.lock:
+                self.hits = self.hits + 1
+            return entry[1], entry[2]
+
+        evicted = []
+        if entry is not None:
+            # Same id() as a closed connection's: its cursor is stale.
+            evicted.append(entry[1])
+        sql = buildSql()
+        cursor = conn.cursor()
+        if hasattr(cursor, 'prepare'):
+            cursor.prepare(sql)
+
+        entries[k] = (conn, cursor, sql)
+        while len(entries) > self.size:
+            evicted.append(entries.popitem(last=False)[1][1])
+        with self.lock:
+            self.misses = self.misses + 1
+            self.count = self.count + 1 - len(evicted)
+        for c in evicted:
+            self.__close(c)
+        return cursor, sql
+
+    def forgetThread(self):
+        """
+        Drop the calling thread's statements, e.g. after a connection error.
+        """
+        entries = self.__entries()
+        cursors = [entry[1] for entry in entries.values()]
+        entries.clear()
+        with self.lock:
+            self.count = self.count - len(cursors)
+        for c in cursors:
+            self.__close(c)
+
+    def stats(self):
+        """
+        Return the cache's hits, misses and number of entries (over all
+        threads).
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': self.count, 'size': self.size}
+
+class commitPolicy:
+    MODES = ('auto', 'rows', 'time', 'explicit')
+
+    def __init__(self, mode='auto', rows=1000, interval=100, debug=False, metrics=None):
+        """
+        Decides when row level writes (add/addMany/update/delete) are
+        committed.  On a system replication cluster every commit waits for
+        the log to be shipped, so committing less often trades durability
+        (and lock hold time) for throughput.
+
+        Parameter:
+               mode - 'auto'     - Commit after every operation (default).
+                      'rows'     - Commit a connection once it has at least
+                                   rows uncommitted rows.
+                      'time'     - A background flusher commits every
+                                   connection with pending rows every
+                                   interval ms (group commit).
+                      'explicit' - Only commit on flush() or at the end of
+                                   a database.transaction() block.
+               rows - Row threshold for 'rows' mode.
+           interval - Flush interval in ms for 'time' mode.
+            metrics - hanaMetrics.metrics to record commits in.
+        """
+        if mode not in self.MODES:
+            raise ValueError("Commit mode must be one of {0}.".format(self.MODES))
+        if rows < 1 or interval <= 0:
+            raise ValueError("Commit rows & interval must be greater than 0.")
+
+        self.mode = mode
+        self.rows = rows
+        self.interval = interval
+        self.debug = debug
+        self.metrics = metrics or hanaMetrics.registry
+
+        # id(conn) -> [conn, lock, uncommitted rows, in a transaction()]
+        self.conns = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.commits = 0
+        self.groupCommits = 0
+        self.rowsCommitted = 0
+
+        self.running = True
+        self.flusher = None
+        if mode == 'time':
+            self.flusher = threading.Thread(target=self.__flushLoop)
+            self.flusher.daemon = True
+            self.flusher.start()
+
+    def __entry(self, conn):
+        with self.lock:
+            entry = self.conns.get(id(conn))
+            if entry is None or entry[0] is not conn:
+                entry = [conn, threading.RLock(), 0, False]
+                self.conns[id(conn)] = entry
+                if self.mode != 'auto':
+                    conn.setautocommit(False)
+            return entry
+
+    def hold(self, conn):
+        """
+        Lock to hold while writing on conn so the flusher does not commit
+        it in the middle of a statement.
+        """
+        return self.__entry(conn)[1]
+
+    def __commit(self, entry):
+        # Must be called with the entry's lock held.
+        if entry[2] == 0:
+            return False
+        with self.metrics.timed('commit', entry[2]):
+            entry[0].commit()
+        with self.lock:
+            self.commits = self.commits + 1
+            self.rowsCommitted = self.rowsCommitted + entry[2]
+        entry[2] = 0
+        return True
+
+    def inTransaction(self):
+        return getattr(self.local, 'transaction', False)
+
+    def written(self, conn, rows, every=None):
+        """
+        Account for rows written on conn (with the hold() lock held) and
+        commit if the policy says so.  every overrides the 'auto' mode
+        commit after every operation (used by addMany's commit_every).
+        """
+        entry = self.__entry(conn)
+        entry[2] = entry[2] + rows
+        if self.inTransaction():
+            return
+        if self.mode == 'auto':
+            if every is None or entry[2] >= every:
+                self.__commit(entry)
+        elif self.mode == 'rows' and entry[2] >= self.rows:
+            self.__commit(entry)
+
+    @contextlib.contextmanager
+    def deferred(self, conn, defer=True):
+        """
+        Turn conn's autocommit off for the block in 'auto' mode (if defer), so
+        written() with every commits every that many rows instead of the
+        session committing each statement (hdbcli sessions autocommit).
+        At the end pending rows are committed, or rolled back if the block
+        fails, and autocommit is turned back on.  Yields a dictionary whose
+        'rolledBack' is set to the number of rows rolled back.
+        """
+        state = {'rolledBack': 0}
+        if not defer or self.mode != 'auto' or self.inTransaction():
+            yield state
+            return
+
+        entry = self.__entry(conn)
+        conn.setautocommit(False)
+        ok = False
+        try:
+            yield state
+            ok = True
+        finally:
+            with entry[1]:
+                try:
+                    if ok:
+                        self.__commit(entry)
+                    else:
+                        state['rolledBack'] = entry[2]
+                        entry[2] = 0
+                        conn.rollback()
+                    conn.setautocommit(True)
+                except dbapi.Error as e:
+                    # The connection broke, the server rolls back.
+                    if ok:
+                        state['rolledBack'] = entry[2]
+                        entry[2] = 0
+                        raise
+                    if self.debug == True:
+                        print("Rollback of {0} rows failed: {1}".format(state['rolledBack'], e))
+
+    def flush(self, conn=None):
+        """
+        Commit pending rows on conn, or on every connection (group commit).
+        Connections inside a transaction() block are left to its end.
+        Returns the number of connections committed.
+        """
+        if conn is not None:
+            entries = [self.__entry(conn)]
+        else:
+            with self.lock:
+                entries = list(self.conns.values())
+
+        committed = 0
+        for entry in entries:
+            with entry[1]:
+                if entry[3]:
+                    continue
+                try:
+                    if self.__commit(entry):
+                        committed = committed + 1
+                except dbapi.Error as e:
+                    print("ERROR: commit of {0} pending rows failed: {1}".format(entry[2], e))
+                    self.forget(entry[0])
+        if committed > 1:
+            with self.lock:
+                self.groupCommits = self.groupCommits + 1
+        return committed
+
+    def __flushLoop(self):
+        while self.running:
+            time.sleep(self.interval / 1000.0)
+            committed = self.flush()
+            if self.debug == True and committed > 0:
+                print("Flusher committed {0} connections".format(committed))
+
+    def begin(self, conn):
+        """
+        Start an explicit transaction on the calling thread's conn.
+        """
+        entry = self.__entry(conn)
+        with entry[1]:
+            # inTransaction() only tells the calling thread, this tells
+            # the flusher.
+            entry[3] = True
+        if self.mode == 'auto':
+            conn.setautocommit(False)
+        self.local.transaction = True
+        self.local.failed = False
+        return entry
+
+    def failed(self):
+        """
+        Mark the calling thread's transaction (if any) as failed.
+        """
+        if self.inTransaction():
+            self.local.failed = True
+
+    def end(self, conn, commit=True):
+        """
+        End the calling thread's transaction: commit, or roll back if
+        asked to or if an operation in it failed.
+        """
+        entry = self.__entry(conn)
+        self.local.transaction = False
+        with entry[1]:
+            try:
+                if commit and not getattr(self.local, 'failed', False):
+                    entry[2] = max(entry[2], 1)
+                    self.__commit(entry)
+                else:
+                    conn.rollback()
+                    entry[2] = 0
+            finally:
+                entry[3] = False
+                if self.mode == 'auto':
+                    conn.setautocommit(True)
+
+    def forget(self, conn):
+        """
+        Stop tracking conn (e.g. it broke).  Its uncommitted rows are lost.
+        """
+        with self.lock:
+            entry = self.conns.pop(id(conn), None)
+        if entry is not None and entry[2] > 0:
+            print("WARNING: {0} uncommitted rows lost on \"{1}\"".format(entry[2], conn))
+
+    def stop(self):
+        """
+        Stop the flusher and commit everything pending.
+        """
+        self.running = False
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            pending = sum([e[2] for e in self.conns.values()])
+            return {'mode': self.mode, 'commits': self.commits, 'groupCommits': self.groupCommits,
+                    'rowsCommitted': self.rowsCommitted, 'pendingRows': pending}
+
+class schemaCache:
+    def __init__(self):
+        """
+        Process wide cache of table metadata (does the table exist, its
+        columns) so workers & repeated database() constructions do not all
+        query the catalog.  Entries can also be kept in a JSON file so
+        separate processes (and later runs) share them.
+
+        Keys are "address:port:user:TABLE".  database invalidates its
+        entry when it creates or drops the table.
+        """
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def __load(self, fileName):
+        try:
+            with open(fileName) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def __save(self, fileName, key, entry):
+        # Read-modify-write through a temp file so readers never see a
+        # partial file.  Concurrent writers may lose each other's update,
+        # which only costs a catalog query later.
+        entries = self.__load(fileName)
+        if entry is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = entry
+        tmp = '{0}.{1}.tmp'.format(fileName, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            os.rename(tmp, fileName)
+        except (IOError, OSError) as e:
+            print("WARNING: could not write schema cache \"{0}\": {1}".format(fileName, e))
+
+    def get(self, key, fileName=None):
+        """
+        Return the cached entry for key (a dictionary) or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and fileName:
+                entry = self.__load(fileName).get(key)
+                if entry is not None:
+                    self.entries[key] = entry
+            return entry
+
+    def put(self, key, entry, fileName=None):
+        with self.lock:
+            self.entries[key] = entry
+            if fileName:
+                self.__save(fileName, key, entry)
+
+    def invalidate(self, key, fileName=None):
+        with self.lock:
+            self.entries.pop(key, None)
+            if fileName:
+                self.__save(fileName, key, None)
+
+# Shared by every database instance in this process.
+tableCache = schemaCache()
+
+class checkpointLog:
+    def __init__(self, fileName):
+        """
+        Local record of committed batches (one JSON line per batch id) so
+        an interrupted load resumes after the last committed batch instead
+        of starting over.  Records are appended with a single write() and
+        fsync()ed, so several processes can share one file and a crash
+        leaves at most a torn last line (which is ignored).
+
+        Parameter:
+          fileName - Checkpoint file.  Created on the first record().
+        """
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        # batch id -> rows
+        self.batches = {}
+        try:
+            with open(fileName) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.batches[entry['batch']] = entry['rows']
+        except (IOError, OSError):
+            pass
+
+    def rows(self, batchId):
+        """
+        Return the rows committed by batchId, or None if it was not.
+        """
+        with self.lock:
+            return self.batches.get(batchId)
+
+    def record(self, batchId, rows):
+        """
+        Record batchId as committed.  Call it only after the commit.
+        """
+        line = json.dumps({'batch': batchId, 'rows': rows, 'time': round(time.time(), 3)}) + '\n'
+        with self.lock:
+            fd = os.open(self.fileName, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.batches[batchId] = rows
+
+    def stats(self):
+        with self.lock:
+            return {'batches': len(self.batches), 'rows': sum(self.batches.values())}
+
+# Column type groups used to pick a value converter.  Anything not listed
+# (ST_GEOMETRY, ...) is passed to hdbcli as is.
+TEXTTYPES = ('VARCHAR', 'NVARCHAR', 'CHAR', 'NCHAR', 'ALPHANUM', 'SHORTTEXT', 'CLOB', 'NCLOB', 'TEXT')
+INTTYPES = ('TINYINT', 'SMALLINT', 'INTEGER', 'INT', 'BIGINT')
+DECTYPES = ('DECIMAL', 'SMALLDECIMAL')
+FLOATTYPES = ('DOUBLE', 'REAL', 'FLOAT')
+BINTYPES = ('VARBINARY', 'BINARY', 'BLOB')
+DATEFORMATS = {'DATE': ('%Y-%m-%d',),
+               'TIME': ('%H:%M:%S',),
+               'SECONDDATE': ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'),
+               'TIMESTAMP': ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f',
+                             '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')}
+TRUEVALUES = ('TRUE', 'T', 'Y', 'YES', '1')
+FALSEVALUES = ('FALSE', 'F', 'N', 'NO', '0')
+
+def _toText(v):
+    if v is None or isinstance(v, textTypes):
+        return v
+    if isinstance(v, (bytes, bytearray)):
+        return bytes(v).decode('utf-8')
+    return str(v)
+
+def _numeric(cast):
+    """
+    Converter for a numeric type.  Empty strings (CSV style NULLs) are NULL.
+    """
+    def convert(v):
+        if v is None or v == '':
+            return None
+        return cast(v)
+    return convert
+
+def _toDecimal(v):
+    if isinstance(v, float):
+        # Go through the shortest repr, not the exact binary value.
+        return decimal.Decimal(repr(v))
+    return decimal.Decimal(v)
+
+def _toInt(v):
+    if isinstance(v, textTypes):
+        return int(v.strip())
+    return int(v)
+
+def _toBool(v):
+    if isinstance(v, textTypes):
+        u = v.strip().upper()
+        if u in TRUEVALUES:
+            return True
+        if u in FALSEVALUES:
+            return False
+        raise ValueError("invalid BOOLEAN value: {0!r}".format(v))
+    return bool(v)
+
+def _toBinary(v):
+    if v is None:
+        return None
+    if isinstance(v, bytearray):
+        return bytes(v)
+    if isinstance(v, bytes):
+        return v
+    if isinstance(v, textTypes):
+        # Text given for a binary column is hex, as written to CSV files.
+        return binascii.unhexlify(v)
+    return bytes(v)
+
+def _dateTime(colType):
+    formats = DATEFORMATS[colType]
+    def convert(v):
+        if v is None or v == '':
+            return None
+        if not isinstance(v, textTypes):
+            # datetime/date/time objects go to hdbcli unchanged.
+            return v
+        v = v.strip()
+        for fmt in formats:
+            try:
+                d = datetime.datetime.strptime(v, fmt)
+            except ValueError:
+                continue
+            if colType == 'DATE':
+                return d.date()
+            if colType == 'TIME':
+                return d.time()
+            return d
+        raise ValueError("invalid {0} value: {1!r}".format(colType, v))
+    return convert
+
+def _identity(v):
+    return v
+
+def columnConverter(colType):
+    """
+    Return the callable that turns a value for a colType column into what
+    hdbcli binds for it.  None is always NULL; for non text columns an
+    empty string is NULL as well.
+    """
+    t = colType.upper()
+    if t in TEXTTYPES:
+        return _toText
+    if t in INTTYPES:
+        return _numeric(_toInt)
+    if t in DECTYPES:
+        return _numeric(_toDecimal)
+    if t in FLOATTYPES:
+        return _numeric(float)
+    if t in DATEFORMATS:
+        return _dateTime(t)
+    if t == 'BOOLEAN':
+        return _numeric(_toBool)
+    if t in BINTYPES:
+        return _toBinary
+    return _identity
+
+def _csvText(fieldDelimiter, recordDelimiter):
+    special = ('"', fieldDelimiter, recordDelimiter, '\n', '\r')
+    def convert(v):
+        if v is None:
+            return ''
+        v = _toText(v)
+        if v == '' or any([c in v for c in special]):
+            # Quote so delimiters survive & an empty string is not NULL.
+            return '"' + v.replace('"', '""') + '"'
+        return v
+    return convert
+
+def _csvValue(bind):
+    def convert(v):
+        v = bind(v)
+        if v is None:
+            return ''
+        if isinstance(v, bool):
+            return 'TRUE' if v else 'FALSE'
+        if isinstance(v, datetime.datetime):
+            return v.isoformat(' ')
+        if isinstance(v, (datetime.date, datetime.time)):
+            return v.isoformat()
+        if isinstance(v, float):
+            return repr(v)
+        return str(v)
+    return convert
+
+def _csvBinary(v):
+    v = _toBinary(v)
+    if v is None:
+        return ''
+    return binascii.hexlify(v).decode('ascii')
+
+def csvConverter(colType, fieldDelimiter=',', recordDelimiter='\n'):
+    """
+    Return the callable that turns a value for a colType column into its
+    IMPORT FROM CSV field text: NULL is an empty field, text is quoted
+    (with "" escapes) when needed and binary values are hex.
+    """
+    t = colType.upper()
+    if t in TEXTTYPES:
+        return _csvText(fieldDelimiter, recordDelimiter)
+    if t in BINTYPES:
+        return _csvBinary
+    return _csvValue(columnConverter(t))
+
+# HANA stores at most 2 billion rows in a column table partition (or an
+# unpartitioned column table).
+MAX_PARTITION_ROWS = 2000000000
+
+def partitionsNeeded(rows, fill=1.0):
+    """
+    Return the number of partitions rows need to stay under fill (0-1)
+    of MAX_PARTITION_ROWS per partition.
+    """
+    return max(1, int(math.ceil(float(rows) / (MAX_PARTITION_ROWS * fill))))
+
+def _sqlLiteral(v):
+    if isinstance(v, textTypes):
+        return "'{0}'".format(v.replace("'", "''"))
+    return str(v)
+
+def partitionClause(spec):
+    """
+    Return the PARTITION BY clause for a partition spec (a dictionary):
+
+        {'type': 'HASH', 'columns': ['EMAIL'], 'partitions': 8}
+        {'type': 'RANGE', 'columns': ['ID'], 'ranges': [(0, 1000000), (1000000, 2000000)], 'others': True}
+
+    HASH spreads the rows evenly over partitions (0 = one per indexserver,
+    GET_NUM_SERVERS()).  RANGE creates one partition per [low, high) range
+    plus, with others, one for the rows outside of them.  With a primary
+    key the partitioning columns have to be part of it.
+    """
+    kind = spec.get('type', 'HASH').upper()
+    columns = ', '.join(['"{0}"'.format(c.upper()) for c in spec['columns']])
+    if kind == 'HASH':
+        partitions = spec.get('partitions', 0)
+        return 'PARTITION BY HASH ({0}) PARTITIONS {1}'.format(
+               columns, partitions if partitions > 0 else 'GET_NUM_SERVERS()')
+    if kind == 'RANGE':
+        if len(spec['columns']) != 1:
+            raise ValueError("RANGE partitioning takes exactly one column.")
+        parts = ['PARTITION {0} <= VALUES < {1}'.format(_sqlLiteral(low), _sqlLiteral(high))
+                 for low, high in spec['ranges']]
+        if spec.get('others', False):
+            parts.append('PARTITION OTHERS')
+        if not parts:
+            raise ValueError("RANGE partitioning needs at least one range.")
+        return 'PARTITION BY RANGE ({0}) ({1})'.format(columns, ', '.join(parts))
+    raise ValueError("Unknown partition type \"{0}\".".format(kind))
 
 class database:
-    def __init__(self, address, port, tName, createStmt, user, passwd, drop=False, saccess=True, debug=False):
-	"""
-	Initialize SAP/HANA DB and create the table if it does not exist.
+    def __init__(self, address, port, tName, createStmt, user, passwd, drop=False, saccess=True, debug=False, poolSize=0, stmtCacheSize=64,
+                 commitMode='auto', commitRows=1000, commitInterval=100, schemaCacheFile=None, metrics=None,
+                 hosts=None, reconnectRetries=5, reconnectBackoff=1.0, batchLog='LOAD_BATCH_LOG', partitionSpec=None):
+        """
+        Initialize SAP/HANA DB and create the table if it does not exist.
 
-	Parameter:
+        Parameter:
         address - right now only tested on the master node
            port - See below.
       tableName - Have to provide the table name.
@@ -26,265 +994,811 @@ class database:
         saccess - If you use SYSTEM user set this to true.
           debug - Do not turn on debug unless you absolutely have to.  
                   It generates a lot fo info.
+       poolSize - Number of pooled connections for multithreaded use.  Each
+                  thread gets its own connection (session) from the pool.
+                  0 means all threads share the one connection.
+  stmtCacheSize - Number of prepared add/update/delete statements each
+                  thread keeps.
+     commitMode - When add/addMany/update/delete commit: 'auto' (every
+                  operation), 'rows' (every commitRows rows per connection),
+                  'time' (group commit every commitInterval ms) or
+                  'explicit' (commit()/transaction() only).  See commitPolicy.
+schemaCacheFile - Optional JSON file to keep the table's metadata in, so
+                  other processes & later runs skip the catalog queries.
+        metrics - hanaMetrics.metrics registry the operations are recorded
+                  in.  Defaults to the process wide hanaMetrics.registry.
+          hosts - Further (address, port) candidates (e.g. the system
+                  replication secondary) tried when address:port does
+                  not answer.  Broken connections are reopened on the
+                  first host that answers.
+reconnectRetries - Rounds over all hosts before a (re)connect gives up.
+reconnectBackoff - Seconds to wait after the first failed round, doubled
+                  after every further one.  See reconnector.
+       batchLog - Table addBatch() records committed batch ids in.
+  partitionSpec - HASH or RANGE partitioning the table is created with
+                  (see partitionClause()).  Ignored if the table exists
+                  or createStmt has its own PARTITION BY.
+
+        According to:
+           https://help.sap.com/viewer/0eec0d68141541d1b07893a39944924e/2.0.02/en-US/d12c86af7cb442d1b9f8520e2aba7758.html
+
+        The instance type & tenant type are part of the port number:
+                from hdbcli import dbapi
+                conn = dbapi.connect(
+                    address="<hostname>",
+                    port=3<NN>MM, 
+                    user="<username>", 
+                    password="<password>"
+                )
+                For HANA tenant databases, you can use the port number 3<NN>13 (where <NN> is the SAP instance number).
+                For HANA system databases in a multitenant system, the port number is 3NN13.
+                For HANA single-tenant databases, the port number is 3NN15.
+        """
+        self.drop = drop
+        self.colNames=[]
 
-	According to:
-	   https://help.sap.com/viewer/0eec0d68141541d1b07893a39944924e/2.0.02/en-US/d12c86af7cb442d1b9f8520e2aba7758.html
-
-	The instance type & tenant type are part of the port number:
-		from hdbcli import dbapi
-		conn = dbapi.connect(
-		    address="<hostname>",
-		    port=3<NN>MM, 
-		    user="<username>", 
-		    password="<password>"
-		)
-		For HANA tenant databases, you can use the port number 3<NN>13 (where <NN> is the SAP instance number).
-		For HANA system databases in a multitenant system, the port number is 3NN13.
-		For HANA single-tenant databases, the port number is 3NN15.
-	"""
-	self.drop = drop
-	self.colNames=[]
-
-	self.sysAccess = saccess
-	self.debug = debug
+        self.sysAccess = saccess
+        self.debug = debug
+        self.pool = None
+        self.metrics = metrics or hanaMetrics.registry
+        self.stmtCache = statementCache(stmtCacheSize)
+        self.commits = commitPolicy(commitMode, commitRows, commitInterval, debug, self.metrics)
+        self.schemaCacheFile = schemaCacheFile
 
-	if( tName == "" ):
-	    raise ValueError("Table Name must be provided.")
+        if( tName == "" ):
+            raise ValueError("Table Name must be provided.")
 
-	self.tableName = tName
+        self.tableName = tName
 
-	if( address == "" ):
-	    raise ValueError("Address/Hostname must be provided.")
+        if( address == "" ):
+            raise ValueError("Address/Hostname must be provided.")
 
-	self.address = address
+        self.address = address
 
-	if( port == "" ):
-	    raise ValueError("Port number must be provided.")
+        if( port == "" ):
+            raise ValueError("Port number must be provided.")
 
-	self.port = port
+        self.port = port
 
-	if( createStmt == "" ):
-	    raise ValueError("Table create statement must be provided.")
+        if( createStmt == "" ):
+            raise ValueError("Table create statement must be provided.")
 
-	if "TEXT" in createStmt.upper():
-		print("""
-		      ERROR:
-		      The TEXT column field data type will break update & delete SQL statements
-		      as they do not support WHERE clause against text matches
-		      with columns defined as type TEXT.  Please use VARCHAR(<1-5000>)
-		      type instead.
-		      Exiting....
-		      """)
-		return
+        if "TEXT" in createStmt.upper():
+                print("""
+                      ERROR:
+                      The TEXT column field data type will break update & delete SQL statements
+                      as they do not support WHERE clause against text matches
+                      with columns defined as type TEXT.  Please use VARCHAR(<1-5000>)
+                      type instead.
+                      Exiting....
+                      """)
+                return
 
-	self.createStmt = createStmt
+        self.createStmt = createStmt
 
-	if( user == "" ):
-	   raise ValueError("User must be provided.")
+        if( user == "" ):
+           raise ValueError("User must be provided.")
 
-	self.user = user
+        self.user = user
+        self.cacheKey = '{0}:{1}:{2}:{3}'.format(self.address, self.port, self.user, self.tableName.upper())
 
-	if( passwd == "" ):
-	   raise ValueError("Passwd must be provided.")
+        if( passwd == "" ):
+           raise ValueError("Passwd must be provided.")
 
-	self.passwd = passwd
+        self.passwd = passwd
+        self.batchLog = batchLog
+        self.batchLogReady = False
+        self.partitionSpec = partitionSpec
+        self.partitions = None
+        self.partitionRoutes = None
+        self.connLock = threading.Lock()
+        self.connector = reconnector([(self.address, self.port)] + list(hosts or []), self.user, self.passwd,
+                                     reconnectRetries, reconnectBackoff, debug=self.debug, metrics=self.metrics)
+        self.conn = None
 
-	try:
-	    self.conn = dbapi.connect(address=self.address, port=self.port, user=self.user, password=self.passwd)
-	except dbapi.Error as e:
-	    print("ERROR: connecting to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e, traceback.format_exc()))
-	finally:
-	    if (self.conn):
-		if self.drop == True :
-			self.dropTable()
-		self.__createTable()
-		self.__populateColumnInfo()
+        try:
+            self.conn = self.connector.connect()
+        except dbapi.Error as e:
+            print("ERROR: connecting to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e, traceback.format_exc()))
+        finally:
+            if (self.conn):
+                if self.drop == True :
+                        self.dropTable()
+                self.__createTable()
+                self.__populateColumnInfo()
+                if poolSize > 0:
+                        self.pool = connectionPool(self.address, self.port, self.user, self.passwd, poolSize,
+                                                   debug=self.debug, metrics=self.metrics, connector=self.connector)
+
+    def __text(self, value):
+        """
+        hdbcli returns catalog names as bytes under python 2 and as str
+        under python 3.
+        """
+        if isinstance(value, bytes):
+            return value.decode()
+        return value
 
     def __findTable(self):
-	"""
-	Search for table.  Returns True if found, False otherwise
-	"""
-	found = False
-	sql = 'SELECT TABLE_NAME FROM TABLES'
-	try:
-	    cursor = self.conn.cursor()
-	    cursor.execute(sql)
-	    result_set = cursor.fetchall()
-	    cursor.close()
-	except dbapi.Error as e:
-	    print("ERROR: __findTable() \"{0}\": {1}\n{2}".format(self.tableName,e,traceback.format_exc()))
-
-	for cname in result_set:
-		if self.tableName.upper() in cname[0].decode():
-			print("Table \'{0}\' exists...".format(self.tableName))
-			found = True
-	return found
+        """
+        Search for table in the session's current schema.
+        Returns True if found, False otherwise
+        """
+        entry = tableCache.get(self.cacheKey, self.schemaCacheFile)
+        if entry is not None:
+                if entry['exists']:
+                        print("Table \'{0}\' exists...".format(self.tableName))
+                return entry['exists']
+
+        found = False
+        sql = 'SELECT COUNT(*) FROM SYS.TABLES WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?'
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, [self.tableName.upper()])
+            found = cursor.fetchone()[0] > 0
+            cursor.close()
+        except dbapi.Error as e:
+            print("ERROR: __findTable() \"{0}\": {1}\n{2}".format(self.tableName,e,traceback.format_exc()))
+            return found
+
+        if found:
+                print("Table \'{0}\' exists...".format(self.tableName))
+        tableCache.put(self.cacheKey, {'exists': found}, self.schemaCacheFile)
+        return found
 
     def __createTable(self):
-	"""
-	Use user provided SQL to create the table if it does not exist.
-	"""
-	if self.__findTable() == True:
-		return
-
-	try:
-	    cursor = self.conn.cursor()
-	    cursor.execute(self.createStmt)
-	    self.conn.commit()
-	    cursor.close()
-	except dbapi.Error as e:
-	    print("ERROR: createTable() to \"{0}:{1}\" \"{2}\": {3}\n{4}".format(self.address,self.port,self.createStmt,e,traceback.format_exc()))
+        """
+        Use user provided SQL to create the table if it does not exist.
+        """
+        if self.__findTable() == True:
+                return
+
+        createStm = self.createStmt
+        if self.partitionSpec:
+            if 'PARTITION BY' in createStm.upper():
+                print("WARNING: createStmt is partitioned already, ignoring partitionSpec")
+            else:
+                createStm = createStm.strip().rstrip(';') + ' ' + partitionClause(self.partitionSpec)
+
+        try:
+            cursor = self.conn.cursor()
+            if self.debug == True:
+                print("SQL CREATE statement: {0}".format(createStm))
+            cursor.execute(createStm)
+            self.conn.commit()
+            cursor.close()
+            tableCache.invalidate(self.cacheKey, self.schemaCacheFile)
+            self.partitions = None
+        except dbapi.Error as e:
+            print("ERROR: createTable() to \"{0}:{1}\" \"{2}\": {3}\n{4}".format(self.address,self.port,createStm,e,traceback.format_exc()))
 
     def __populateColumnInfo(self):
-	"""
-	Create a dictionary of columns names and respective types. This class
-	needs to know the column field types so it can type the data correctly
+        """
+        Create a dictionary of columns names and respective types. This class
+        needs to know the column field types so it can type the data correctly
         and provide column field names for displays.
-	"""
-	# Dictionary of column names as key and column type as value
-	# Ex: columns['FNAME'] = "VARCHAR"
-	#
-	# Python versions < 3 do not keep dictionaries ordered so
-	# have to use OrderedDict from collections.
-	if sys.version_info[0] < 3:
-		self.columns=OrderedDict()
-	else:
-		self.columns={}
-
-	if self.sysAccess == True:
-		sql = "select column_name,data_type_name from SYS.COLUMNS where table_name=\'{0}\' ORDER by POSITION".format(self.tableName.upper())
-	else:
-		sql = "select column_name from SYS.M_CS_COLUMNS where table_name=\'{0}\'".format(self.tableName.upper())
-	try:
-	    cursor = self.conn.cursor()
-
-	    cursor.execute(sql)
-	    data = cursor.fetchall()
-
-	    if self.debug == True:
-		print("RAW DB output: {0}".format(data))
-
-	    # The column information is returned as a list of list.
-	    # The column indexes matches with the table so all we want
-	    # to save is the column name & type
-	    for row in data:
-		if self.debug == True:
-			print("{0}\nPreformated - Name: {1}, {2}".format(row,row[0].decode(),type(row[0])))
-
-		colName = row[0].decode()
-		if self.sysAccess == True:
-			t = row[1].upper()
-			colDataType = t.upper()
-		else:
-			colDataType = 'VARCHAR'
-
-		self.columns[colName] = colDataType
-		if self.debug == True:
-			print("Postformated - Name: {0}, {1}".format(colName,type(colDataType)))
-			print("\t {0}".format(self.columns))
-
-	    cursor.close()
-	except dbapi.Error as e:
-	    print("ERROR: connecting to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+        """
+        # Dictionary of column names as key and column type as value
+        # Ex: columns['FNAME'] = "VARCHAR"
+        #
+        # Python versions < 3 do not keep dictionaries ordered so
+        # have to use OrderedDict from collections.
+        if sys.version_info[0] < 3:
+                self.columns=OrderedDict()
+        else:
+                self.columns={}
+
+        # Column length (or precision) & scale, e.g. columnSizes['FNAME'] = (5000, None)
+        # Only known with SYSTEM access.
+        self.columnSizes={}
+
+        # Primary key column names, empty if the table has none.
+        self.primaryKey=[]
+
+        entry = tableCache.get(self.cacheKey, self.schemaCacheFile)
+        if entry is not None and entry.get('columns'):
+                for colName, colDataType, length, scale in entry['columns']:
+                        self.columns[colName] = colDataType
+                        self.columnSizes[colName] = (length, scale)
+                if self.debug == True:
+                        print("Cached columns: {0}".format(entry['columns']))
+                if entry.get('primaryKey') is None:
+                        entry['primaryKey'] = self.__findPrimaryKey()
+                        tableCache.put(self.cacheKey, entry, self.schemaCacheFile)
+                self.primaryKey = entry['primaryKey']
+                self.__buildConverters()
+                return
+
+        if self.sysAccess == True:
+                sql = "SELECT COLUMN_NAME, DATA_TYPE_NAME, LENGTH, SCALE FROM SYS.COLUMNS " + \
+                      "WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ? ORDER BY POSITION"
+        else:
+                sql = "SELECT COLUMN_NAME FROM SYS.M_CS_COLUMNS WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?"
+        try:
+            cursor = self.conn.cursor()
+
+            cursor.execute(sql, [self.tableName.upper()])
+            data = cursor.fetchall()
+
+            if self.debug == True:
+                print("RAW DB output: {0}".format(data))
+
+            # The column information is returned as a list of list.
+            # The column indexes matches with the table so all we want
+            # to save is the column name & type
+            for row in data:
+                if self.debug == True:
+                        print("{0}\nPreformated - Name: {1}, {2}".format(row,self.__text(row[0]),type(row[0])))
+
+                colName = self.__text(row[0])
+                if self.sysAccess == True:
+                        t = row[1].upper()
+                        colDataType = t.upper()
+                        self.columnSizes[colName] = (row[2], row[3])
+                else:
+                        colDataType = 'VARCHAR'
+                        self.columnSizes[colName] = (None, None)
+
+                self.columns[colName] = colDataType
+                if self.debug == True:
+                        print("Postformated - Name: {0}, {1}".format(colName,type(colDataType)))
+                        print("\t {0}".format(self.columns))
+
+            cursor.close()
+            if self.columns:
+                    self.primaryKey = self.__findPrimaryKey()
+                    tableCache.put(self.cacheKey, {'exists': True, 'columns': self.getColumnInfo(),
+                                                   'primaryKey': self.primaryKey}, self.schemaCacheFile)
+        except dbapi.Error as e:
+            print("ERROR: connecting to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+        self.__buildConverters()
+
+    def __findPrimaryKey(self):
+        """
+        Return the table's primary key column names in key order (an empty
+        list if it has none).
+        """
+        sql = "SELECT COLUMN_NAME FROM SYS.CONSTRAINTS WHERE SCHEMA_NAME = CURRENT_SCHEMA " + \
+              "AND TABLE_NAME = ? AND IS_PRIMARY_KEY = 'TRUE' ORDER BY POSITION"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, [self.tableName.upper()])
+            key = [self.__text(row[0]) for row in cursor.fetchall()]
+            cursor.close()
+        except dbapi.Error as e:
+            print("ERROR: __findPrimaryKey() \"{0}\": {1}\n{2}".format(self.tableName,e,traceback.format_exc()))
+            return []
+
+        if self.debug == True:
+                print("Primary key: {0}".format(key))
+        return key
+
+    def __getConn(self):
+        """
+        Connection for the calling thread.  With a pool each thread
+        checks out its own connection, otherwise all share self.conn.
+        """
+        if self.pool is not None:
+            return self.pool.checkout()
+        return self.conn
+
+    def __connError(self):
+        """
+        Called when an operation fails.  Drops the calling thread's
+        pooled connection if it is broken so the next operation reconnects,
+        or reopens the shared connection (see reconnect()).
+        """
+        self.stmtCache.forgetThread()
+        self.commits.failed()
+        if self.pool is not None:
+            conn = self.pool.current()
+            if not self.pool.validate() and conn is not None:
+                self.commits.forget(conn)
+        else:
+            self.reconnect()
+
+    def reconnect(self):
+        """
+        Reopen the shared connection if it broke (e.g. after a takeover),
+        on the first candidate host that answers.  Rows the old connection
+        had not committed are lost.  Returns True if the connection is
+        usable.
+        """
+        with self.connLock:
+            conn = self.conn
+            if conn is not None and connectionHealthy(conn):
+                return True
+            if conn is not None:
+                print("WARNING: connection to \"{0}:{1}\" lost, reconnecting".format(*self.connector.current()))
+                self.commits.forget(conn)
+                try:
+                    conn.close()
+                except dbapi.Error:
+                    pass
+            try:
+                self.conn = self.connector.connect()
+            except dbapi.Error as e:
+                print("ERROR: reconnecting to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+                return False
+            return True
+
+    def releaseConn(self):
+        """
+        Give the calling thread's pooled connection back to the pool.
+        Worker threads should call this when they are done.
+        """
+        if self.pool is not None:
+            self.pool.checkin()
 
     def __getColumnNames(self):
         """
         Get the column Names for building sql where clauses
         """
-	if self.columns is None:
-		print("ERROR: NameError(\"columns\"): \n{0}".format(traceback.format_exc()))
-		return []
+        if self.columns is None:
+                print("ERROR: NameError(\"columns\"): \n{0}".format(traceback.format_exc()))
+                return []
 
-        return self.columns.keys()
+        return list(self.columns.keys())
 
     def getColumnNames(self):
-	"""
-	Public getter.
-	"""
-	return self.__getColumnNames()
-
-    def __normalizeColData(self,colData):
-	"""
-	Required to when adding data so that the proper type can be added
-	to each column field.	
-	"""
-        newColData = []
-	if self.debug == True:
-		print("Column Data Length: {0}\nColumn Data: {1}".format(len(colData),colData))
+        """
+        Public getter.
+        """
+        return self.__getColumnNames()
 
-        try:
-            colNames = self.__getColumnNames()
-        except ValueError as e:
-            print("ERROR: retrieving column name data: {0}\n{1}", e, traceback.format_exc())
-            return
+    def getColumnInfo(self):
+        """
+        Return a list of (name, type, length, scale) for each column in table
+        order.  length & scale are None when they are not known.
+        """
+        return [(n, t) + self.columnSizes.get(n, (None, None)) for n, t in self.columns.items()]
 
-	if self.debug == True:
-		print("Column Names Length: {0}\nColumn Names: {1}".format(len(colNames),colNames))
+    def __buildConverters(self):
+        """
+        Build the per-column converter vectors once from the column types
+        so rows are converted in a single pass without type lookups.
+        """
+        types = list(self.columns.values())
+        self.converters = [columnConverter(t) for t in types]
+        self.csvConverters = [csvConverter(t) for t in types]
+
+        # Positions of the primary key columns in a row.
+        names = list(self.columns.keys())
+        if self.primaryKey and all([k in names for k in self.primaryKey]):
+            self.keyIndexes = [names.index(k) for k in self.primaryKey]
+        else:
+            self.keyIndexes = []
+
+    def convertRow(self, rowData):
+        """
+        Return rowData (in table column order, may be shorter than the
+        table) as a list of values converted for the column types.
+        """
+        if len(rowData) > len(self.converters):
+            raise ValueError("row has {0} values, table has {1} columns".format(len(rowData), len(self.converters)))
+        return [conv(v) for conv, v in zip(self.converters, rowData)]
 
-        try:
-            for i in range(len(colData)):
-		if self.debug == True:
-			print("i: {0}\ncolNames[{0}]={1}\ncolumns[colNames[{1}]]={2}".format(i,colNames[i],self.columns[colNames[i]]))
-                if "VARCHAR" in self.columns[colNames[i]].upper():
-                    newColData.insert(i,str("\'{0}\'".format(colData[i])))
-                else:
-                    newColData.insert(i,colData[i])
-        except ValueError as e:
-            print("ERROR: {0}\n{1}".format(e,traceback.format_exc()))
-        except IndexError as e:
-            print("ERROR: {0}\n{1}".format(e,traceback.format_exc()))
+    def convertRows(self, rows):
+        """
+        convertRow() for every row in a list of rows.
+        """
+        convs = self.converters
+        numCols = len(convs)
+        converted = []
+        for row in rows:
+            if len(row) > numCols:
+                raise ValueError("row has {0} values, table has {1} columns".format(len(row), numCols))
+            converted.append([conv(v) for conv, v in zip(convs, row)])
+        return converted
+
+    def toCSV(self, rows, fieldDelimiter=',', recordDelimiter='\n'):
+        """
+        Return rows as CSV lines (bytes) for importFromCSV().
+        """
+        if fieldDelimiter == ',' and recordDelimiter == '\n':
+            convs = self.csvConverters
+        else:
+            convs = [csvConverter(t, fieldDelimiter, recordDelimiter) for t in self.columns.values()]
+        lines = [fieldDelimiter.join([conv(v) for conv, v in zip(convs, row)]) + recordDelimiter for row in rows]
+        return ''.join(lines).encode('utf-8')
+
+    def __hasKey(self, values):
+        """
+        True if values (a converted row) holds the whole primary key, so the
+        row can be found by key instead of by comparing every column.
+        """
+        if not self.keyIndexes or max(self.keyIndexes) >= len(values):
+            return False
+        for i in self.keyIndexes:
+            if values[i] is None:
+                return False
+        return True
 
-        return newColData
+    def __insertSql(self, numCols):
+        return 'INSERT INTO {0} VALUES ({1})'.format(self.tableName, ','.join(['?'] * numCols))
 
-    def add(self, rowData):
+    def __whereSql(self, colNames, values):
         """
-        Insert row data into table.
+        WHERE clause matching values (NULL values need IS NULL).
         """
-        newData = []
+        return ' AND '.join(['"{0}" IS NULL'.format(c) if v is None else '"{0}" = ?'.format(c)
+                             for c, v in zip(colNames, values)])
 
-        try:
-            cursor = self.conn.cursor()
+    def __execute(self, cursor, sql, params):
+        """
+        Execute a cached statement with bound parameters.
+        """
+        if hasattr(cursor, 'executeprepared'):
+            return cursor.executeprepared(params)
+        return cursor.execute(sql, params)
 
-            # Let's build up the row data statement values to be inserted
-            addStm='INSERT INTO {0} VALUES ('.format(self.tableName)
-            aSize = len(rowData)
-            newData = self.__normalizeColData(rowData)
-	    if self.debug == True:
-		print("newData: {0}".format(newData))
-
-            for i in range(aSize):
-                if( i == (aSize - 1) ):
-                    addStm = addStm + '{0})'.format(newData[i])
-                else:
-                    addStm = addStm + '{0},'.format(newData[i])
+    def __executeMany(self, cursor, sql, rows):
+        if hasattr(cursor, 'executemanyprepared'):
+            return cursor.executemanyprepared(rows)
+        return cursor.executemany(sql, rows)
 
-	    if self.debug == True:
-		print("SQL Add statement: {0}".format(addStm))
+    def getStatementCacheStats(self):
+        """
+        Return the prepared statement cache's hits, misses and entries.
+        """
+        return self.stmtCache.stats()
 
-            rc = cursor.execute(addStm)
-	    if self.debug == True:
-		print("RC execute \'ADD\' statement: {0}".format(rc))
+    def add(self, rowData):
+        """
+        Insert row data into table.  Returns True if the row was inserted.
+        """
+        try:
+            conn = self.__getConn()
+            cursor, addStm = self.stmtCache.get(conn, ('add', len(rowData)),
+                                                lambda: self.__insertSql(len(rowData)))
+            if self.debug == True:
+                print("SQL Add statement: {0}\nValues: {1}".format(addStm, rowData))
 
-            self.conn.commit()
-            cursor.close()
+            values = self.convertRow(rowData)
+            with self.metrics.timed('add', 1, hanaMetrics.rowBytes(values)):
+                with self.commits.hold(conn):
+                    rc = self.__execute(cursor, addStm, values)
+                    self.commits.written(conn, 1)
+            if self.debug == True:
+                print("RC execute \'ADD\' statement: {0}".format(rc))
+            return True
         except dbapi.Error as e:
+            self.__connError()
             print("ERROR: connecting/adding RowData to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
         except ValueError as e:
             print("ERROR: row data: (\"", rowData, "\"):i {0}\n{1}".format(e,traceback.format_exc()))
         except IndexError as e:
             print("ERROR: indexing row data: (\"", rowData, "\"): {0}\n{1}".format(e,traceback.format_exc()))
+        return False
+
+    def __sendBatch(self, conn, cursor, addStm, batch, commit_every):
+        """
+        Convert & insert one addMany() batch with a single executemany().
+        """
+        batch = self.convertRows(batch)
+        nbytes = sum([hanaMetrics.rowBytes(row) for row in batch])
+        with self.metrics.timed('addMany', len(batch), nbytes):
+            with self.commits.hold(conn):
+                self.__executeMany(cursor, addStm, batch)
+                self.commits.written(conn, len(batch), commit_every)
+
+    def addMany(self, rows, batch_size=1000, commit_every=None):
+        """
+        Insert many rows using a single parameterized INSERT statement.
+        Rows are sent to the server batch_size at a time with
+        cursor.executemany() instead of one round trip per row.
+
+        Parameter:
+               rows - Any iterable (list, generator, ...) of row data lists.
+         batch_size - Number of rows sent per executemany() call.
+       commit_every - Commit after at least this many rows have been sent.
+                      Defaults to batch_size (i.e. commit every batch).
+                      Only used with the 'auto' commit mode, the other
+                      modes commit according to the database's commit policy.
+                      When larger than batch_size autocommit is off while
+                      the rows are sent, and rows not yet committed when
+                      an error occurs are rolled back.
+
+        Returns the number of rows inserted (and committed in 'auto' mode).
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0.")
+
+        if commit_every is None:
+            commit_every = batch_size
+
+        numCols = len(self.columns)
+        added = 0
+        batch = []
+        span = {'rolledBack': 0}
+        try:
+            conn = self.__getConn()
+            cursor, addStm = self.stmtCache.get(conn, ('add', numCols), lambda: self.__insertSql(numCols))
+            if self.debug == True:
+                print("SQL AddMany statement: {0}".format(addStm))
+
+            # Every executemany() is committed on its own unless autocommit
+            # is off.
+            with self.commits.deferred(conn, commit_every > batch_size) as span:
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) < batch_size:
+                        continue
+
+                    self.__sendBatch(conn, cursor, addStm, batch, commit_every)
+                    added = added + len(batch)
+                    batch = []
+
+                if batch:
+                    self.__sendBatch(conn, cursor, addStm, batch, commit_every)
+                    added = added + len(batch)
+
+            if self.commits.mode == 'auto' and not self.commits.inTransaction():
+                self.commits.flush(conn)
+        except dbapi.Error as e:
+            self.__connError()
+            print("ERROR: connecting/adding many rows to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+        except ValueError as e:
+            print("ERROR: row data batch: {0}\n{1}".format(e,traceback.format_exc()))
+        added = added - span['rolledBack']
+
+        if self.debug == True:
+            print("AddMany inserted {0} rows".format(added))
+
+        return added
+
+    def __prepareBatchLog(self, conn):
+        """
+        Create the batch log table if it does not exist yet.
+        """
+        if self.batchLogReady:
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM SYS.TABLES WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?", [self.batchLog])
+            if cursor.fetchone()[0] == 0:
+                if self.debug == True:
+                    print("Creating batch log table {0}".format(self.batchLog))
+                cursor.execute("""CREATE COLUMN TABLE {0} (BATCH_ID NVARCHAR(256) PRIMARY KEY,
+                                  TABLE_NAME NVARCHAR(256), ROWS_LOADED BIGINT,
+                                  LOADED_AT TIMESTAMP)""".format(self.batchLog))
+            self.batchLogReady = True
+        finally:
+            cursor.close()
+
+    def __loadedBatch(self, conn, batchId):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT ROWS_LOADED FROM {0} WHERE BATCH_ID = ?".format(self.batchLog), [batchId])
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        return None if row is None else int(row[0])
+
+    def addBatch(self, batchId, rows, batch_size=1000, retries=3):
+        """
+        Insert rows exactly once under batchId.  The rows and a batchLog
+        entry for batchId are committed in one transaction, and a batch
+        already in the log is skipped, so after a failure (or a takeover
+        that lost the commit's reply) the batch can be sent again without
+        duplicating rows.
+
+        Parameter:
+           batchId - Unique, repeatable id of this batch, e.g.
+                     "<load>:<batch number>".
+              rows - List of row data lists (sent again on a retry).
+        batch_size - Number of rows sent per executemany() call.
+           retries - How often to retry (after reconnecting) on failure.
+
+        Returns the number of rows the batch loaded (now or before), or
+        None if it failed.
+        """
+        rows = list(rows)
+        for attempt in range(retries + 1):
+            try:
+                conn = self.__getConn()
+                self.__prepareBatchLog(conn)
+                loaded = self.__loadedBatch(conn, batchId)
+                if loaded is not None:
+                    if self.debug == True:
+                        print("Batch {0} already loaded ({1} rows)".format(batchId, loaded))
+                    return loaded
+
+                with self.transaction():
+                    added = self.addMany(rows, batch_size=batch_size)
+                    if added == len(rows):
+                        cursor = conn.cursor()
+                        cursor.execute("INSERT INTO {0} VALUES (?, ?, ?, CURRENT_TIMESTAMP)".format(self.batchLog),
+                                       [batchId, self.tableName.upper(), added])
+                        cursor.close()
+                    else:
+                        self.commits.failed()
+                if added == len(rows):
+                    return added
+            except dbapi.Error as e:
+                self.metrics.error('addBatch', e)
+                self.__connError()
+                print("ERROR: loading batch {0} into \"{1}:{2}\": {3}\n{4}".format(batchId,self.address,self.port,e,traceback.format_exc()))
+            if attempt < retries:
+                print("WARNING: retrying batch {0} ({1}/{2})".format(batchId, attempt + 1, retries))
+        return None
+
+    def getPartitions(self, refresh=False):
+        """
+        Return the table's first level partitions in PART_ID order, as
+        dictionaries:
+
+            partId - Partition id.
+              type - 'HASH' or 'RANGE'.
+           columns - Partitioning columns.
+             count - Number of partitions.
+         low, high - Bounds of a RANGE partition as text, None for the
+                     OTHERS partition and for HASH partitions.
+        host, rows - Host the partition is loaded on and its record count,
+                     None if it is not loaded.
+
+        An unpartitioned table has no partitions.  The result is cached
+        until refresh is True.
+        """
+        if self.partitions is not None and not refresh:
+            return self.partitions
+
+        sql = "SELECT PART_ID, LEVEL_1_TYPE, LEVEL_1_COUNT, LEVEL_1_EXPRESSION, LEVEL_1_RANGE_MIN_VALUE, " + \
+              "LEVEL_1_RANGE_MAX_VALUE FROM SYS.TABLE_PARTITIONS WHERE SCHEMA_NAME = CURRENT_SCHEMA " + \
+              "AND TABLE_NAME = ? ORDER BY PART_ID"
+        loadedSql = "SELECT PART_ID, HOST, RECORD_COUNT FROM SYS.M_CS_TABLES " + \
+                    "WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?"
+        partitions = []
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, [self.tableName.upper()])
+            for partId, kind, count, expression, low, high in cursor.fetchall():
+                columns = [c.strip().strip('"').upper() for c in (self.__text(expression) or '').split(',') if c.strip()]
+                partitions.append({'partId': int(partId), 'type': self.__text(kind).upper(), 'columns': columns,
+                                   'count': int(count or 0), 'low': self.__text(low) or None,
+                                   'high': self.__text(high) or None, 'host': None, 'rows': None})
+
+            cursor.execute(loadedSql, [self.tableName.upper()])
+            loaded = dict([(int(r[0]), (self.__text(r[1]), int(r[2]))) for r in cursor.fetchall()])
+            cursor.close()
+        except dbapi.Error as e:
+            print("ERROR: getPartitions() \"{0}\": {1}\n{2}".format(self.tableName,e,traceback.format_exc()))
+            return []
+
+        for p in partitions:
+            if p['partId'] in loaded:
+                p['host'], p['rows'] = loaded[p['partId']]
+        if self.debug == True:
+            print("Partitions: {0}".format(partitions))
+        self.partitions = partitions
+        self.partitionRoutes = None
+        return partitions
+
+    def __partitionRoutes(self):
+        """
+        Build (type, column positions, [(low, high, index)], OTHERS index)
+        from getPartitions() for partitionOf().  RANGE bounds are converted
+        like the column's values so they compare correctly.
+        """
+        if self.partitions is None or self.partitionRoutes is None:
+            partitions = self.getPartitions()
+            names = list(self.columns.keys())
+            if not partitions:
+                self.partitionRoutes = (None, [], [], None)
+                return self.partitionRoutes
+
+            columns = partitions[0]['columns']
+            indexes = [names.index(c) for c in columns if c in names]
+            ranges = []
+            others = None
+            if partitions[0]['type'] == 'RANGE':
+                convert = columnConverter(self.columns[columns[0]])
+                for i, p in enumerate(partitions):
+                    if p['low'] is None and p['high'] is None:
+                        others = i
+                    else:
+                        ranges.append((convert(p['low']), convert(p['high']), i))
+            self.partitionRoutes = (partitions[0]['type'], indexes, ranges, others)
+        return self.partitionRoutes
+
+    def partitionOf(self, rowData):
+        """
+        Return the index (into getPartitions()) of the partition rowData
+        belongs to, 0 for an unpartitioned table, or None if no RANGE
+        partition takes it (the server rejects such rows).
+
+        HANA picks HASH partitions with its own hash function, so for those
+        the index is a stable client side hash bucket of the partitioning
+        columns instead: the rows of a bucket spread over the partitions
+        like any rows do, but each bucket can be loaded over its own
+        session.
+        """
+        kind, indexes, ranges, others = self.__partitionRoutes()
+        if kind is None:
+            return 0
+
+        if kind == 'RANGE':
+            v = self.converters[indexes[0]](rowData[indexes[0]])
+            if v is not None:
+                for low, high, i in ranges:
+                    if low <= v < high:
+                        return i
+            return others
+
+        key = '\x00'.join([_toText(rowData[i]) or '' for i in indexes])
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return (zlib.crc32(key) & 0xffffffff) % len(self.partitions)
+
+    def splitByPartition(self, rows):
+        """
+        Group rows by partitionOf().  Returns a dictionary of partition
+        index -> list of rows.
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(self.partitionOf(row), []).append(row)
+        return groups
+
+    def addManyPartitioned(self, rows, batch_size=1000, commit_every=None, sessions=0):
+        """
+        Route rows to their partitions (see splitByPartition()) and insert
+        the partitions concurrently with addMany(), each over its own
+        pooled session, so a large load is spread over the partitions (and
+        the hosts & indexserver threads they live on) instead of one after
+        the other.
+
+        Parameter:
+            sessions - Number of partitions loaded at once.  Defaults to
+                       the pool size.
+
+        Returns the number of rows inserted.
+        """
+        groups = self.splitByPartition(rows)
+        if sessions < 1:
+            if self.pool is not None:
+                sessions = self.pool.size
+            else:
+                sessions = 1
+        sessions = max(1, min(sessions, len(groups)))
+
+        work = queue.Queue()
+        for part in sorted(groups.keys(), key=lambda p: -1 if p is None else p):
+            work.put(groups[part])
+        added = [0]
+        lock = threading.Lock()
+
+        def loader():
+            try:
+                while True:
+                    try:
+                        partRows = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    n = self.addMany(partRows, batch_size=batch_size, commit_every=commit_every)
+                    with lock:
+                        added[0] = added[0] + n
+            finally:
+                self.releaseConn()
+
+        loaders = [threading.Thread(target=loader) for i in range(sessions)]
+        for t in loaders:
+            t.start()
+        for t in loaders:
+            t.join()
+        return added[0]
 
     def __csvFileloading(self, disable):
-	"""
-	Enable/Disable CSV import loading for importing CSV data
-	into HANA DB tables.  NOTE: Requires SYSTEM user access.
-	"""
+        """
+        Enable/Disable CSV import loading for importing CSV data
+        into HANA DB tables.  NOTE: Requires SYSTEM user access.
+        """
         try:
             cursor = self.conn.cursor()
 
             alterStm='ALTER SYSTEM ALTER CONFIGURATION ( \'indexserver.ini\',\'SYSTEM\' ) ' + \
-		     'SET ( \'import_export\',\'enable_csv_import_path_filter\' ) = \'{0}\' ' + \
-		     'WITH RECONFIGURE'.format(disable) 
+                     'SET ( \'import_export\',\'enable_csv_import_path_filter\' ) = \'{0}\' ' + \
+                     'WITH RECONFIGURE'.format(disable) 
 
             if self.debug == True:
                 print("Alter SQL Statement: {0}".format(alterStm))
@@ -300,43 +1814,71 @@ class database:
         except ValueError as e:
             print("ERROR: Alter: (\"", disable, "\"):i {0}\n{1}".format(e,traceback.format_exc()))
 
-	
-    def importFromCSV(self, csvFile, fieldDelimiter=',', recordDelimiter='\n'):
+        
+    def importFromCSV(self, csvFile, fieldDelimiter=',', recordDelimiter='\n', threads=0, batch=0):
         """
         Import row data from CSV file. By default CSV import loading is disabled 
-	(see SAPNOTE https://launchpad.support.sap.com/#/notes/2109565)
-	because of security concern.
-	
-	CSV file contains only data, otherwise header will get inserted a record.
+        (see SAPNOTE https://launchpad.support.sap.com/#/notes/2109565)
+        because of security concern.
+        
+        CSV file contains only data, otherwise header will get inserted a record.
+
+        Default field delimiter is comma (',') 
+        Default record delimiter is newline.
 
-	Default field delimiter is comma (',') 
-	Default record delimiter is newline.
+        threads & batch map to the IMPORT THREADS/BATCH options so HANA
+        loads the file with several threads.  0 leaves them at the default.
 
-	NOTE: Because we are enabling/disabling calling this function
+        NOTE: Because we are enabling/disabling calling this function
               requires SYSTEM user access.
         """
+        # Enable CSV file importing
+        self.__csvFileloading(False)
         try:
-	    # Enable CSV file importing
-	    self.__csvFileloading(False)
+            return self.__importFromCSV(csvFile, fieldDelimiter, recordDelimiter, threads, batch)
+        finally:
+            # Disable CSV file importing
+            self.__csvFileloading(False)
 
-            cursor = self.conn.cursor()
+    def __importFromCSV(self, csvFile, fieldDelimiter, recordDelimiter, threads, batch):
+        """
+        Run the IMPORT FROM CSV statement on the calling thread's connection.
+        Returns True on success, False otherwise.
+        """
+        ok = False
+        try:
+            conn = self.__getConn()
+            cursor = conn.cursor()
 
             # Let's build up the row data statement values to be inserted
-	    importStm='IMPORT FROM CSV FILE \'{0}\' '.format(csvFile) + \
+            importStm='IMPORT FROM CSV FILE \'{0}\' '.format(csvFile) + \
                   'INTO {0} '.format(self.tableName) + \
                   'WITH RECORD DELIMITED BY \'\\n\' '.format(fieldDelimiter) + \
                   'FIELD DELIMITED BY \',\''.format(recordDelimiter)
 
-	    if self.debug == True:
-		print("Import SQL Statement: {0}".format(importStm))
+            # Let HANA parallelize the import itself.
+            if threads > 0:
+                importStm = importStm + ' THREADS {0}'.format(threads)
+            if batch > 0:
+                importStm = importStm + ' BATCH {0}'.format(batch)
 
+            if self.debug == True:
+                print("Import SQL Statement: {0}".format(importStm))
+
+            t0 = time.time()
             rc = cursor.execute(importStm)
-	    if self.debug == True:
-		print("RC execute \'ADD\' statement: {0}".format(rc))
+            if self.debug == True:
+                print("RC execute \'ADD\' statement: {0}".format(rc))
 
-            self.conn.commit()
+            conn.commit()
+            rows = cursor.rowcount if cursor.rowcount > 0 else 0
+            nbytes = os.path.getsize(csvFile) if os.path.exists(csvFile) else 0
+            self.metrics.observe('import', time.time() - t0, rows, nbytes)
             cursor.close()
+            ok = True
         except dbapi.Error as e:
+            self.metrics.error('import', e)
+            self.__connError()
             print("ERROR: connecting/adding CSV File Data to \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
         except ValueError as e:
             print("ERROR: CSV File: (\"", csvFile, "\"):i {0}\n{1}".format(e,traceback.format_exc()))
@@ -344,144 +1886,682 @@ class database:
             print("ERROR: indexing row data: (\"", csvFile, "\"): {0}\n{1}".format(e,traceback.format_exc()))
         except IOError as e:
             print("ERROR: CSB File IO Error: (\"", csvFile, "\"): {0}\n{1}".format(e,traceback.format_exc()))
-	finally:
-	    # Disable CSV file importing
-	    self.__csvFileloading(False)
+
+        return ok
+
+    def importManyFromCSV(self, csvFiles, sessions=0, fieldDelimiter=',', recordDelimiter='\n', threads=0, batch=0, onImport=None):
+        """
+        Import several CSV files (shards) concurrently.  Each file gets its
+        own IMPORT FROM CSV statement and each session runs in its own
+        thread on its own pooled connection, so the imports run in parallel
+        on the server.  Without a pool (poolSize=0) they share one
+        connection and end up serialized.
+
+        Parameter:
+           csvFiles - List of CSV files (absolute paths on the HANA host), or
+                      a queue.Queue fed by a producer while the imports run.
+                      Put one None per session on the queue to stop.
+           sessions - Number of concurrent imports.  Defaults to the pool size.
+     threads, batch - Passed on to each IMPORT statement (see importFromCSV()).
+           onImport - Optional callback(file, ok, seconds) called from the
+                      importing thread after each file.
+
+        Returns the list of files that were imported successfully.
+        NOTE: Requires SYSTEM user access (see importFromCSV()).
+        """
+        if sessions < 1:
+            if self.pool is not None:
+                sessions = self.pool.size
+            else:
+                sessions = 1
+
+        if isinstance(csvFiles, queue.Queue):
+            files = csvFiles
+        else:
+            files = queue.Queue()
+            for f in csvFiles:
+                files.put(f)
+            sessions = min(sessions, len(csvFiles))
+            for i in range(sessions):
+                files.put(None)
+
+        imported = []
+        lock = threading.Lock()
+
+        def importer():
+            try:
+                while True:
+                    f = files.get()
+                    if f is None:
+                        return
+                    t0 = time.time()
+                    ok = self.__importFromCSV(f, fieldDelimiter, recordDelimiter, threads, batch)
+                    if ok:
+                        with lock:
+                            imported.append(f)
+                    if onImport is not None:
+                        onImport(f, ok, time.time() - t0)
+            finally:
+                self.releaseConn()
+
+        # Enable CSV file importing once for all the sessions.
+        self.__csvFileloading(False)
+        try:
+            importers = [threading.Thread(target=importer) for i in range(sessions)]
+            for t in importers:
+                t.start()
+            for t in importers:
+                t.join()
+        finally:
+            # Disable CSV file importing
+            self.__csvFileloading(False)
+
+        return imported
 
     def delete(self, rowData):
         """
         Delete the row corresponding to the given rowdata.  This method
-        will compare every value in the row in the select statement.
+        will compare every value in the row in the select statement
+        (only the primary key if the table has one).  Returns True if the
+        DELETE statement ran.
         """
         colNames=""
         try:
             colNames = self.__getColumnNames()
         except ValueError as e:
             print("ERROR: retrieving column name data: {0}\n{1}", e, traceback.format_exc())
-            return
+            return False
 
-	if self.debug == True:
-		print("Column Names: {0}".format(colNames))
+        if self.debug == True:
+                print("Column Names: {0}".format(colNames))
 
         try:
-            cursor = self.conn.cursor()
-
-            # Let's build up the row data statement values to be inserted
-            deleteStm="DELETE FROM {0} WHERE (".format(self.tableName)
-            aSize = len(rowData)
-            for i in range(aSize):
-                if( i == (aSize - 1) ):
-                    deleteStm = deleteStm + "{0} = \'{1}\')".format(colNames[i],rowData[i])
-                else:
-                    deleteStm = deleteStm + "{0} = \'{1}\' AND ".format(colNames[i],rowData[i])
-
-	    if self.debug == True:
-		print("SQL DELETE statement: {0}".format(deleteStm))
+            conn = self.__getConn()
+
+            # Statements are cached per column shape; NULLs change the WHERE clause.
+            values = self.convertRow(rowData)
+            if self.__hasKey(values):
+                params = [values[i] for i in self.keyIndexes]
+                cursor, deleteStm = self.stmtCache.get(conn, ('delete', 'key'), lambda: "DELETE FROM {0} WHERE ({1})".format(
+                                                       self.tableName, self.__whereSql(self.primaryKey, params)))
+            else:
+                aSize = len(values)
+                key = ('delete', aSize, tuple([v is None for v in values]))
+                cursor, deleteStm = self.stmtCache.get(conn, key, lambda: "DELETE FROM {0} WHERE ({1})".format(
+                                                       self.tableName, self.__whereSql(colNames[:aSize], values)))
+                params = [v for v in values if v is not None]
 
-            rc = cursor.execute(deleteStm)
-	    if self.debug == True:
-		print("RC execute \'DELETE\' statement: {0}".format(rc))
+            if self.debug == True:
+                print("SQL DELETE statement: {0}".format(deleteStm))
 
-            self.conn.commit()
-            cursor.close()
+            with self.metrics.timed('delete', 1):
+                with self.commits.hold(conn):
+                    rc = self.__execute(cursor, deleteStm, params)
+                    self.commits.written(conn, 1)
+            if self.debug == True:
+                print("RC execute \'DELETE\' statement: {0}".format(rc))
+            return True
         except dbapi.Error as e:
+            self.__connError()
             print("ERROR: connecting/deleting row data \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
         except ValueError as e:
             print("ERROR: deleting row data: (\"", rowData, "\"): {0}\n{1}".format(e,traceback.format_exc()))
         except IndexError as e:
             print("ERROR: indexing row data: (\"", rowData, "\"): {0}\n{1}".format(e,traceback.format_exc()))
+        return False
 
     def update(self, curRowData, newRowData):
         """
         Update a row given curRowData with new rowData.
-	Requires the current row data for comparision.
+        Requires the current row data for comparision.  Returns True if the
+        UPDATE statement ran.
         """
         colNames=""
         try:
             colNames = self.__getColumnNames()
         except ValueError as e:
             print("ERROR: retrieving column name data: {0}\n{1}", e, traceback.format_exc())
-            return
+            return False
 
-	if self.debug == True:
-		print("Column Names: {0}".format(colNames))
+        if self.debug == True:
+                print("Column Names: {0}".format(colNames))
 
         try:
-            cursor = self.conn.cursor()
+            conn = self.__getConn()
+
+            # Statements are cached per column shape; NULLs change the WHERE clause.
+            curValues = self.convertRow(curRowData)
+            aSize = len(curValues)
+            if self.__hasKey(curValues):
+                keyValues = [curValues[i] for i in self.keyIndexes]
+                cursor, updateStm = self.stmtCache.get(conn, ('update', aSize, 'key'), lambda: "UPDATE {0} SET {1} WHERE {2}".format(
+                                                       self.tableName,
+                                                       ', '.join(['"{0}" = ?'.format(c) for c in colNames[:aSize]]),
+                                                       self.__whereSql(self.primaryKey, keyValues)))
+                params = self.convertRow(newRowData[:aSize]) + keyValues
+            else:
+                key = ('update', aSize, tuple([v is None for v in curValues]))
+                cursor, updateStm = self.stmtCache.get(conn, key, lambda: "UPDATE {0} SET {1} WHERE {2}".format(
+                                                       self.tableName,
+                                                       ', '.join(['"{0}" = ?'.format(c) for c in colNames[:aSize]]),
+                                                       self.__whereSql(colNames[:aSize], curValues)))
+                params = self.convertRow(newRowData[:aSize]) + [v for v in curValues if v is not None]
 
-            # Let's build up the SET part of the Update st
-            updateStm="UPDATE {0} SET ".format(self.tableName)
-            aSize = len(curRowData)
-            for i in range(aSize):            
-                if( i == (aSize - 1) ):
-                    updateStm = updateStm + "{0} = \'{1}\' WHERE ".format(colNames[i],newRowData[i])
-                else:
-                    updateStm = updateStm + "{0} = \'{1}\', ".format(colNames[i],newRowData[i])
-
-            # Let's build up the WHERE part of the Update statement
-            aSize=len(curRowData)
-            for i in range(aSize):
-                if( i == (aSize - 1) ):
-                    updateStm = updateStm + "\"{0}\" = \'{1}\'".format(colNames[i],curRowData[i])
-                else:
-                    updateStm = updateStm + "\"{0}\" = \'{1}\' AND ".format(colNames[i],curRowData[i])
-
-	    if self.debug == True:
-		print("SQL UPDATE statement: {0}".format(updateStm))
-
-            rc = cursor.execute(updateStm)
-	    if self.debug == True:
-		print("RC execute \'UPDATE\' statement: {0}".format(rc))
+            if self.debug == True:
+                print("SQL UPDATE statement: {0}".format(updateStm))
 
-            self.conn.commit()
-            cursor.close()
+            with self.metrics.timed('update', 1, hanaMetrics.rowBytes(params[:aSize])):
+                with self.commits.hold(conn):
+                    rc = self.__execute(cursor, updateStm, params)
+                    self.commits.written(conn, 1)
+            if self.debug == True:
+                print("RC execute \'UPDATE\' statement: {0}".format(rc))
+            return True
         except dbapi.Error as e:
+            self.__connError()
             print("ERROR: connecting/updating row data \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
         except ValueError as e:
             print("ERROR: updating row data: {0}\n{1}".format(e,traceback.format_exc()))
         except IndexError as e:
             print("ERROR: indexing row data:i {0}\n{1}".format(e,traceback.format_exc()))
+        return False
+
+    def __stageSql(self, keyCols, withRows):
+        """
+        SQL to create the calling session's staging table: the match
+        columns (prefixed "K_") and, for updates, every table column.
+        """
+        cols = ['"{0}" AS "K_{0}"'.format(c) for c in keyCols]
+        if withRows:
+            cols = cols + ['"{0}"'.format(c) for c in self.columns.keys()]
+        return "CREATE LOCAL TEMPORARY COLUMN TABLE {0} AS (SELECT {1} FROM {2}) WITH NO DATA".format(
+               self.__stageName(), ', '.join(cols), self.tableName)
+
+    def __stageName(self):
+        # Local temporary tables are private to the session, so every
+        # pooled connection can use the same name.
+        return '#{0}_STAGE'.format(self.tableName.upper())
+
+    def __joinSql(self, keyCols, nullable):
+        """
+        Join condition between the table and the staging table (alias S).
+        Without a primary key NULLs have to match NULLs.
+        """
+        if nullable:
+            return ' AND '.join(['({0}."{1}" = S."K_{1}" OR ({0}."{1}" IS NULL AND S."K_{1}" IS NULL))'.format(
+                                 self.tableName, c) for c in keyCols])
+        return ' AND '.join(['{0}."{1}" = S."K_{1}"'.format(self.tableName, c) for c in keyCols])
+
+    def __dropStage(self, cursor):
+        try:
+            cursor.execute("DROP TABLE {0}".format(self.__stageName()))
+        except dbapi.Error:
+            pass
+
+    def __bulkApply(self, stageSql, width, rows, applySql, batch_size):
+        """
+        Create the session's staging table with stageSql, insert rows
+        (lists of width values) into it batch_size at a time, then run the
+        single set based applySql.  Returns the number of table rows it
+        changed.
+        """
+        conn = self.__getConn()
+        cursor = conn.cursor()
+        self.__dropStage(cursor)
+        try:
+            cursor.execute(stageSql)
+            insertStm = 'INSERT INTO {0} VALUES ({1})'.format(self.__stageName(), ','.join(['?'] * width))
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    cursor.executemany(insertStm, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insertStm, batch)
+
+            if self.debug == True:
+                print("SQL bulk statement: {0}".format(applySql))
+
+            with self.commits.hold(conn):
+                cursor.execute(applySql)
+                changed = cursor.rowcount
+                self.commits.written(conn, max(changed, 0))
+        finally:
+            self.__dropStage(cursor)
+            cursor.close()
+        return changed
+
+    def __fullRows(self, rows, perItem=1):
+        """
+        Pass rows (or tuples of perItem rows) through, making sure each
+        row has every table column.
+        """
+        numCols = len(self.converters)
+        for item in rows:
+            for row in (item if perItem > 1 else (item,)):
+                if len(row) != numCols:
+                    raise ValueError("row has {0} values, table has {1} columns".format(len(row), numCols))
+            yield item
+
+    def deleteMany(self, rows, batch_size=1000):
+        """
+        Delete many rows with one set based statement.  The rows are staged
+        in a local temporary table (batch_size rows per executemany()) and
+        removed with a single DELETE ... WHERE EXISTS join, so the table is
+        scanned once instead of once per row.
+
+        When the table has a primary key only the key values are staged
+        and matched, otherwise rows match on every column (like delete()).
+
+        Parameter:
+               rows - Iterable of full rows (every table column).
+         batch_size - Number of rows staged per executemany() call.
+
+        Returns the number of rows deleted, -1 on error.
+
+        NOTE: Creating & dropping the staging table is DDL, which HANA
+              commits, so do not use this inside transaction().
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0.")
+
+        colNames = self.__getColumnNames()
+        keyCols = self.primaryKey if self.keyIndexes else colNames
+        keyIdx = self.keyIndexes or list(range(len(colNames)))
+        convs = self.converters
+        staged = ([convs[i](row[i]) for i in keyIdx] for row in self.__fullRows(rows))
+
+        deleteStm = "DELETE FROM {0} WHERE EXISTS (SELECT 1 FROM {1} S WHERE {2})".format(
+                    self.tableName, self.__stageName(), self.__joinSql(keyCols, not self.keyIndexes))
+        t0 = time.time()
+        try:
+            deleted = self.__bulkApply(self.__stageSql(keyCols, False), len(keyCols), staged, deleteStm, batch_size)
+        except dbapi.Error as e:
+            self.metrics.error('deleteMany', e)
+            self.__connError()
+            print("ERROR: connecting/deleting many rows \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+            return -1
+        except ValueError as e:
+            print("ERROR: deleting many rows: {0}\n{1}".format(e,traceback.format_exc()))
+            return -1
+
+        self.metrics.observe('deleteMany', time.time() - t0, deleted)
+        if self.debug == True:
+            print("DeleteMany deleted {0} rows".format(deleted))
+        return deleted
+
+    def updateMany(self, pairs, batch_size=1000):
+        """
+        Update many rows with one set based statement.  The current rows'
+        keys & the new rows are staged in a local temporary table and
+        applied with a single UPDATE ... FROM join.
+
+        When the table has a primary key rows are matched on it, otherwise
+        on every column of the current row (like update()).
+
+        Parameter:
+              pairs - Iterable of (curRowData, newRowData) full rows.
+         batch_size - Number of rows staged per executemany() call.
+
+        Returns the number of rows updated, -1 on error.
+
+        NOTE: Creating & dropping the staging table is DDL, which HANA
+              commits, so do not use this inside transaction().
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0.")
+
+        colNames = self.__getColumnNames()
+        keyCols = self.primaryKey if self.keyIndexes else colNames
+        keyIdx = self.keyIndexes or list(range(len(colNames)))
+        convs = self.converters
+        staged = ([convs[i](cur[i]) for i in keyIdx] + [conv(v) for conv, v in zip(convs, new)]
+                  for cur, new in self.__fullRows(pairs, 2))
+
+        updateStm = "UPDATE {0} SET {1} FROM {0}, {2} S WHERE {3}".format(
+                    self.tableName, ', '.join(['"{0}" = S."{0}"'.format(c) for c in colNames]),
+                    self.__stageName(), self.__joinSql(keyCols, not self.keyIndexes))
+        t0 = time.time()
+        try:
+            updated = self.__bulkApply(self.__stageSql(keyCols, True), len(keyCols) + len(colNames),
+                                       staged, updateStm, batch_size)
+        except dbapi.Error as e:
+            self.metrics.error('updateMany', e)
+            self.__connError()
+            print("ERROR: connecting/updating many rows \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+            return -1
+        except ValueError as e:
+            print("ERROR: updating many rows: {0}\n{1}".format(e,traceback.format_exc()))
+            return -1
+
+        self.metrics.observe('updateMany', time.time() - t0, updated)
+        if self.debug == True:
+            print("UpdateMany updated {0} rows".format(updated))
+        return updated
 
     def getAllRows(self):
         """
         Fetch all rows from the table
+        NOTE: Loads the whole table into memory.  Use iterRows() for big tables.
         """
         records = ""
         try:
-            cursor = self.conn.cursor()
+            conn = self.__getConn()
+            cursor = conn.cursor()
+            t0 = time.time()
             rc = cursor.execute("SELECT * FROM {0}".format(self.tableName))
-	    if self.debug == True:
-		print("RC execute \'SELECT *\' statement: {0}".format(rc))
+            if self.debug == True:
+                print("RC execute \'SELECT *\' statement: {0}".format(rc))
 
             records = cursor.fetchall()
+            self.metrics.observe('fetch', time.time() - t0, len(records),
+                                 sum([hanaMetrics.rowBytes(row) for row in records]))
             cursor.close()
         except dbapi.Error as e:
+            self.metrics.error('fetch', e)
+            self.__connError()
             print("ERROR: connecting/fetching row data \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
 
         return records
 
+    def getRows(self, where, params=None, columns=None):
+        """
+        Return the rows matching where (a predicate with ? placeholders,
+        see iterRows()) as a list, e.g. a point read by key.  Returns None
+        if the query failed.
+        """
+        if columns is None:
+            columns = self.__getColumnNames()
+        for c in columns:
+            if c not in self.columns:
+                raise ValueError("Unknown column \"{0}\".".format(c))
+
+        try:
+            conn = self.__getConn()
+            cursor, sql = self.stmtCache.get(conn, ('get', tuple(columns), where), lambda: "SELECT {0} FROM {1} WHERE {2}".format(
+                                             ', '.join(['"{0}"'.format(c) for c in columns]), self.tableName, where))
+            if self.debug == True:
+                print("SQL getRows statement: {0}".format(sql))
+            t0 = time.time()
+            self.__execute(cursor, sql, list(params or []))
+            rows = cursor.fetchall()
+            self.metrics.observe('fetch', time.time() - t0, len(rows),
+                                 sum([hanaMetrics.rowBytes(row) for row in rows]))
+            return rows
+        except dbapi.Error as e:
+            self.metrics.error('fetch', e)
+            self.__connError()
+            print("ERROR: connecting/reading row data \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+        return None
+
+    def iterRows(self, columns=None, where=None, params=None, arraysize=1000, columnar=False):
+        """
+        Generator streaming the table's rows arraysize rows at a time with
+        fetchmany(), so scanning, verifying or exporting a big table uses
+        constant client memory.
+
+        Parameter:
+            columns - List of column names to fetch.  Defaults to all.
+              where - Optional predicate with ? placeholders, e.g.
+                      '"STATE" = ? AND "ZIPCODE" > ?'
+             params - Values for the where placeholders.
+          arraysize - Rows per fetchmany() round trip.
+           columnar - Yield one batch per fetchmany() as a dictionary of
+                      column name -> values (NumPy arrays when NumPy is
+                      installed) instead of single rows.
+        """
+        if arraysize < 1:
+            raise ValueError("arraysize must be greater than 0.")
+
+        if columns is None:
+            columns = self.__getColumnNames()
+        for c in columns:
+            if c not in self.columns:
+                raise ValueError("Unknown column \"{0}\".".format(c))
+
+        sql = "SELECT {0} FROM {1}".format(', '.join(['"{0}"'.format(c) for c in columns]), self.tableName)
+        if where:
+            sql = sql + " WHERE " + where
+        if self.debug == True:
+            print("SQL iterRows statement: {0}".format(sql))
+
+        cursor = None
+        try:
+            conn = self.__getConn()
+            cursor = conn.cursor()
+            cursor.arraysize = arraysize
+            if params:
+                cursor.execute(sql, list(params))
+            else:
+                cursor.execute(sql)
+
+            while True:
+                t0 = time.time()
+                rows = cursor.fetchmany(arraysize)
+                if not rows:
+                    break
+                self.metrics.observe('fetch', time.time() - t0, len(rows),
+                                     sum([hanaMetrics.rowBytes(row) for row in rows]))
+                if not columnar:
+                    for row in rows:
+                        yield row
+                    continue
+
+                batch = OrderedDict()
+                for i, c in enumerate(columns):
+                    values = [row[i] for row in rows]
+                    if numpy is not None:
+                        if None in values:
+                            values = numpy.array(values, dtype=object)
+                        else:
+                            values = numpy.array(values)
+                    batch[c] = values
+                yield batch
+        except dbapi.Error as e:
+            self.metrics.error('fetch', e)
+            self.__connError()
+            print("ERROR: connecting/streaming row data \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except dbapi.Error:
+                    pass
+
     def dropTable(self):
         """
         Drop the table.
-	(My favorite SQL statment. ;-))
+        (My favorite SQL statment. ;-))
         """
-	if self.__findTable() == False:
-		return
+        if self.__findTable() == False:
+                return
 
         try:
             cursor = self.conn.cursor()
 
             dropStm="DROP TABLE {0}".format(self.tableName)
-	    print("Dropping Table: {0}".format(self.tableName))
-	    if self.debug == True:
-		print("SQL DROP statement: {0}".format(dropStm))
+            print("Dropping Table: {0}".format(self.tableName))
+            if self.debug == True:
+                print("SQL DROP statement: {0}".format(dropStm))
 
             rc = cursor.execute(dropStm)
-	    if self.debug == True:
-		print("RC execute \'DROP TABLE\' statement: {0}".format(rc))
+            if self.debug == True:
+                print("RC execute \'DROP TABLE\' statement: {0}".format(rc))
 
             self.conn.commit()
             cursor.close()
+            tableCache.invalidate(self.cacheKey, self.schemaCacheFile)
+            self.partitions = None
         except dbapi.Error as e:
             print("ERROR: connecting/DROP TABLE \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
 
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Explicit transaction for the calling thread:
+
+            with db.transaction():
+                db.add(row1)
+                db.update(row1, row2)
+
+        Everything in the block is committed at the end, or rolled back if
+        the block raises or one of the operations in it failed.
+        """
+        conn = self.__getConn()
+        self.commits.begin(conn)
+        try:
+            yield self
+        except:
+            self.commits.end(conn, commit=False)
+            raise
+        self.commits.end(conn, commit=True)
+
+    def __tableOptions(self):
+        """
+        Return the table's (TABLE_TYPE, AUTO_MERGE_ON, IS_LOGGED), or None
+        if they cannot be read.
+        """
+        sql = 'SELECT TABLE_TYPE, AUTO_MERGE_ON, IS_LOGGED FROM SYS.TABLES ' + \
+              'WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?'
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, [self.tableName.upper()])
+            row = cursor.fetchone()
+            cursor.close()
+        except dbapi.Error as e:
+            print("ERROR: __tableOptions() \"{0}\": {1}\n{2}".format(self.tableName,e,traceback.format_exc()))
+            return None
+
+        if row is None:
+            return None
+        return tuple([self.__text(v).upper() for v in row])
+
+    def __tableDDL(self, stmt, warnOnly=False):
+        """
+        Run a table setting/maintenance statement on the shared connection.
+        If the connection broke (e.g. in a takeover) it is reopened and the
+        statement retried once.  Returns True on success, False otherwise.
+        """
+        for attempt in range(2):
+            try:
+                if self.debug == True:
+                    print("Table SQL Statement: {0}".format(stmt))
+                cursor = self.conn.cursor()
+                cursor.execute(stmt)
+                self.conn.commit()
+                cursor.close()
+                return True
+            except dbapi.Error as e:
+                if attempt == 0 and not connectionHealthy(self.conn) and self.reconnect():
+                    continue
+                if warnOnly:
+                    print("WARNING: \"{0}\" not allowed: {1}".format(stmt, e))
+                else:
+                    print("ERROR: \"{0}\" on \"{1}:{2}\": {3}\n{4}".format(stmt,self.address,self.port,e,traceback.format_exc()))
+                return False
+
+    @contextlib.contextmanager
+    def bulkLoad(self, noDeltaLog=False, merge=True):
+        """
+        Bulk load session for big loads (e.g. many CSV imports):
+
+            with db.bulkLoad() as stats:
+                db.importFromCSV(fileName)
+            print(stats['load'], stats['merge'])
+
+        Automerge is disabled on the table while the block runs, so the
+        mergedog does not merge the growing delta storage over and over
+        while the import competes with it.  At the end the pending commits
+        are flushed and one MERGE DELTA OF moves everything into main
+        storage.  The original settings are restored afterwards, also when
+        the block raises (the merge still runs, so the committed rows do
+        not stay in the delta).
+
+        Parameter:
+        noDeltaLog - Also disable the delta log (redo logging) of the table
+                     during the load.  The loaded rows are not recoverable
+                     from the log: they become durable with the final merge
+                     and the savepoint that follows it.  Not allowed in
+                     every setup (e.g. system replication); then a warning
+                     is printed and the load runs logged.
+             merge - Run the final MERGE DELTA OF.
+
+        The yielded dictionary is filled in at the end with the seconds
+        spent loading ('load'), merging ('merge') and in total ('total'),
+        whether the merge succeeded ('merged') and which settings were
+        changed ('automerge', 'deltaLog').  Row tables have no delta
+        storage and are loaded without any changes.
+        """
+        stats = {'load': 0.0, 'merge': 0.0, 'total': 0.0, 'merged': False,
+                 'automerge': False, 'deltaLog': False}
+        options = self.__tableOptions()
+        if options is not None and options[0] != 'COLUMN':
+            print("WARNING: \"{0}\" is a {1} table, loading without bulk settings".format(self.tableName, options[0]))
+            options = None
+        elif options is None:
+            print("WARNING: cannot read the settings of \"{0}\", loading without bulk settings".format(self.tableName))
+
+        if options is not None:
+            tableType, autoMerge, logged = options
+            if autoMerge == 'TRUE':
+                stats['automerge'] = self.__tableDDL('ALTER TABLE {0} DISABLE AUTOMERGE'.format(self.tableName))
+            if noDeltaLog and logged == 'TRUE':
+                stats['deltaLog'] = self.__tableDDL('ALTER TABLE {0} DISABLE DELTA LOG'.format(self.tableName),
+                                                    warnOnly=True)
+
+        t0 = time.time()
+        try:
+            yield stats
+        finally:
+            t1 = time.time()
+            stats['load'] = t1 - t0
+            try:
+                self.commits.flush()
+                if merge and options is not None:
+                    print("Merging delta of {0}...".format(self.tableName))
+                    stats['merged'] = self.__tableDDL('MERGE DELTA OF {0}'.format(self.tableName))
+                    stats['merge'] = time.time() - t1
+                    if stats['merged']:
+                        self.metrics.observe('merge', stats['merge'])
+            finally:
+                if stats['deltaLog']:
+                    self.__tableDDL('ALTER TABLE {0} ENABLE DELTA LOG'.format(self.tableName))
+                    # Persist the unlogged rows now instead of at the next
+                    # regular savepoint.
+                    self.__tableDDL('ALTER SYSTEM SAVEPOINT')
+                if stats['automerge']:
+                    self.__tableDDL('ALTER TABLE {0} ENABLE AUTOMERGE'.format(self.tableName))
+                stats['total'] = time.time() - t0
+
+    def commit(self):
+        """
+        Commit pending rows on every connection (see commitPolicy).
+        """
+        return self.commits.flush()
+
+    def getCommitStats(self):
+        """
+        Return the commit policy's commit counts and pending rows.
+        """
+        return self.commits.stats()
+
+    def getMetrics(self):
+        """
+        Return a snapshot of the operation latency histograms, row/byte
+        counters and error counts (see hanaMetrics.metrics.snapshot()).
+        """
+        return self.metrics.snapshot()
+
+    def close(self):
+        """
+        Commit pending rows and close the pooled connections and the main
+        connection.
+        """
+        self.commits.stop()
+        if self.pool is not None:
+            self.pool.closeAll()
+        try:
+            self.conn.close()
+        except dbapi.Error as e:
+            print("ERROR: closing \"{0}:{1}\": {2}\n{3}".format(self.address,self.port,e,traceback.format_exc()))
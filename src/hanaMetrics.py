@@ -0,0 +1,279 @@
+#  Operation level metrics for the SAP/HANA DB database class.
+#
+#  Every database operation (connect, add, addMany, commit, fetch, import,
+#  ...) records its client side latency in a log-linear (HDR style)
+#  histogram plus call, row, byte and error counters, so throughput and
+#  latency can be lined up with cluster events (takeover, ...) while a
+#  load runs.  Snapshots can be written as JSON or in Prometheus' text
+#  format (for node_exporter's textfile collector), once or periodically
+#  with an exporter.
+#
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+if sys.version_info[0] < 3:
+    textTypes = (str, unicode)
+else:
+    textTypes = (str,)
+
+# Percentiles in snapshots & Prometheus summaries.
+PERCENTILES = (50, 90, 99, 99.9)
+
+def rowBytes(row):
+    """
+    Approximate size of a row on the wire: the length of text & binary
+    values, 8 bytes for anything else, nothing for NULL.
+    """
+    size = 0
+    for v in row:
+        if v is None:
+            continue
+        if isinstance(v, textTypes) or isinstance(v, (bytes, bytearray)):
+            size = size + len(v)
+        else:
+            size = size + 8
+    return size
+
+class histogram:
+    def __init__(self, significantBits=7):
+        """
+        Latency histogram with constant relative precision.  Values are
+        kept in microseconds in buckets at most 1/2^(significantBits - 1)
+        of their value wide (under 1.6% for 7), so memory stays small and
+        percentiles stay accurate from microseconds to minutes without
+        keeping the samples.
+        """
+        self.significantBits = significantBits
+        # bucket lower bound (us) -> count
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def __bucket(self, us):
+        shift = max(0, us.bit_length() - self.significantBits)
+        return (us >> shift) << shift, shift
+
+    def record(self, seconds):
+        us = max(0, int(seconds * 1000000))
+        low, shift = self.__bucket(us)
+        self.buckets[low] = self.buckets.get(low, 0) + 1
+        self.count = self.count + 1
+        self.sum = self.sum + seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for low, n in other.buckets.items():
+            self.buckets[low] = self.buckets.get(low, 0) + n
+        self.count = self.count + other.count
+        self.sum = self.sum + other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, pct):
+        """
+        Return the pct (0-100) percentile in seconds: the highest value of
+        the bucket it falls in (capped at the largest value recorded).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(self.count * pct / 100.0 + 0.5))
+        seen = 0
+        for low in sorted(self.buckets.keys()):
+            seen = seen + self.buckets[low]
+            if seen >= rank:
+                low, shift = self.__bucket(low)
+                return min(self.max, (low + (1 << shift) - 1) / 1000000.0)
+        return self.max
+
+    def snapshot(self):
+        snap = {'count': self.count, 'sum': round(self.sum, 6),
+                'min': self.min, 'max': self.max}
+        for pct in PERCENTILES:
+            snap['p{0:g}'.format(pct)] = round(self.percentile(pct), 6)
+        return snap
+
+class metrics:
+    def __init__(self):
+        """
+        Thread safe registry of per operation latency histograms and
+        call/row/byte counters, plus error counters per operation and
+        dbapi.Error code.
+        """
+        self.lock = threading.Lock()
+        self.started = time.time()
+        # op -> [histogram, calls, rows, bytes]
+        self.ops = {}
+        # (op, error code) -> count
+        self.errors = {}
+
+    def observe(self, op, seconds, rows=0, nbytes=0):
+        """
+        Record one op call that took seconds and moved rows/nbytes.
+        """
+        with self.lock:
+            entry = self.ops.get(op)
+            if entry is None:
+                entry = [histogram(), 0, 0, 0]
+                self.ops[op] = entry
+            entry[0].record(seconds)
+            entry[1] = entry[1] + 1
+            entry[2] = entry[2] + rows
+            entry[3] = entry[3] + nbytes
+
+    def error(self, op, e):
+        """
+        Count a failed op by its error code (dbapi.Error.errorcode, or
+        the exception's class name).
+        """
+        code = getattr(e, 'errorcode', None)
+        if code is None:
+            code = type(e).__name__
+        key = (op, str(code))
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    @contextlib.contextmanager
+    def timed(self, op, rows=0, nbytes=0):
+        """
+        Time the block as one op call.  Failures are counted as errors
+        (and not timed) and re-raised.
+        """
+        t0 = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.error(op, e)
+            raise
+        self.observe(op, time.time() - t0, rows, nbytes)
+
+    def counters(self, op):
+        """
+        Return (calls, rows, bytes) recorded for op so far.
+        """
+        with self.lock:
+            entry = self.ops.get(op)
+            if entry is None:
+                return (0, 0, 0)
+            return (entry[1], entry[2], entry[3])
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.ops = {}
+            self.errors = {}
+
+    def snapshot(self):
+        """
+        Return everything recorded as a dictionary (see writeJSON()).
+        """
+        with self.lock:
+            now = time.time()
+            elapsed = now - self.started
+            ops = {}
+            for op, (hist, calls, rows, nbytes) in self.ops.items():
+                snap = hist.snapshot()
+                snap.update({'calls': calls, 'rows': rows, 'bytes': nbytes,
+                             'rowsPerSec': round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+                             'mbPerSec': round(nbytes / 1048576.0 / elapsed, 3) if elapsed > 0 else 0.0})
+                ops[op] = snap
+            errors = {}
+            for (op, code), n in self.errors.items():
+                errors.setdefault(op, {})[code] = n
+            return {'time': now, 'elapsed': round(elapsed, 3), 'pid': os.getpid(),
+                    'operations': ops, 'errors': errors}
+
+    def prometheus(self, prefix='hanaload', labels=None):
+        """
+        Return the metrics in Prometheus text format.  Latency is a summary
+        per op, rows/bytes/calls/errors are counters.  labels (a dictionary)
+        is added to every sample, e.g. {'host': 'hana01'}.
+        """
+        extra = ''.join([',{0}="{1}"'.format(k, v) for k, v in sorted((labels or {}).items())])
+        snap = self.snapshot()
+        ops = sorted(snap['operations'].items())
+        lines = ['# HELP {0}_operation_seconds Client side latency of database operations.'.format(prefix),
+                 '# TYPE {0}_operation_seconds summary'.format(prefix)]
+        for op, s in ops:
+            for pct in PERCENTILES:
+                lines.append('{0}_operation_seconds{{op="{1}",quantile="{2:g}"{3}}} {4}'.format(
+                             prefix, op, pct / 100.0, extra, s['p{0:g}'.format(pct)]))
+            lines.append('{0}_operation_seconds_sum{{op="{1}"{2}}} {3}'.format(prefix, op, extra, s['sum']))
+            lines.append('{0}_operation_seconds_count{{op="{1}"{2}}} {3}'.format(prefix, op, extra, s['count']))
+        for name, key, text in (('rows', 'rows', 'Rows written or read.'),
+                                ('bytes', 'bytes', 'Approximate bytes written or read.')):
+            lines.append('# HELP {0}_{1}_total {2}'.format(prefix, name, text))
+            lines.append('# TYPE {0}_{1}_total counter'.format(prefix, name))
+            for op, s in ops:
+                lines.append('{0}_{1}_total{{op="{2}"{3}}} {4}'.format(prefix, name, op, extra, s[key]))
+        lines.append('# HELP {0}_errors_total Failed operations by error code.'.format(prefix))
+        lines.append('# TYPE {0}_errors_total counter'.format(prefix))
+        for op, codes in sorted(snap['errors'].items()):
+            for code, n in sorted(codes.items()):
+                lines.append('{0}_errors_total{{op="{1}",code="{2}"{3}}} {4}'.format(prefix, op, code, extra, n))
+        return '\n'.join(lines) + '\n'
+
+    def __write(self, fileName, text):
+        # Write & rename so readers (e.g. node_exporter) never see a partial file.
+        tmp = '{0}.{1}.tmp'.format(fileName, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.rename(tmp, fileName)
+
+    def writeJSON(self, fileName):
+        self.__write(fileName, json.dumps(self.snapshot(), indent=1, sort_keys=True))
+
+    def writePrometheus(self, fileName, prefix='hanaload', labels=None):
+        self.__write(fileName, self.prometheus(prefix, labels))
+
+class exporter:
+    def __init__(self, registry, interval=10, jsonFile=None, promFile=None, labels=None):
+        """
+        Background thread writing registry's snapshot every interval
+        seconds to jsonFile and/or promFile (Prometheus text format).
+        stop() writes a final snapshot.
+        """
+        self.registry = registry
+        self.interval = interval
+        self.jsonFile = jsonFile
+        self.promFile = promFile
+        self.labels = labels
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__loop)
+        self.thread.daemon = True
+
+    def export(self):
+        try:
+            if self.jsonFile:
+                self.registry.writeJSON(self.jsonFile)
+            if self.promFile:
+                self.registry.writePrometheus(self.promFile, labels=self.labels)
+        except (IOError, OSError) as e:
+            print("WARNING: could not write metrics: {0}".format(e))
+
+    def __loop(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.export()
+
+# Shared by every database instance in this process.
+registry = metrics()
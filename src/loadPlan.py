@@ -0,0 +1,331 @@
+#  Multi-table load plans for populateHanaDB.
+#
+#  populateHanaDB loads one table per run, described by its module globals
+#  (tableName, createStmt, totalBytes, loadMode, ...).  A load plan lists
+#  many tables, each with the populateHanaDB settings that differ from the
+#  plan's defaults plus a priority, so a whole multi-table test database is
+#  built in one run:
+#
+#       {
+#        "maxConnections": 32,
+#        "maxCPU": 8,
+#        "defaults": {"address": "hana01", "port": 30015, "user": "SYSTEM",
+#                     "passwd": "...", "loadMode": "many"},
+#        "tables": [
+#          {"tableName": "ORDERS", "totalBytes": 10737418240, "priority": 10,
+#           "createStmt": "CREATE COLUMN TABLE {0} (ID INTEGER, NOTE VARCHAR(200))",
+#           "numCols": 2, "columnBytes": 200,
+#           "loadMode": "partition", "partitionSessions": 8,
+#           "partitionSpec": {"type": "HASH", "columns": ["ID"], "partitions": 8}},
+#          {"tableName": "CUSTOMERS", "totalBytes": 1073741824, "columnBytes": 200,
+#           "loadMode": "csv"}
+#        ]
+#       }
+#
+#  The same in TOML: the plan's keys at the top, a [defaults] table and one
+#  [[tables]] entry per table (needs python 3.11's tomllib or the toml
+#  module).  "{0}" in a createStmt is replaced with the table name; tables
+#  without one get populateHanaDB's (8 columns, so keep numCols at 8).
+#
+#  The scheduler starts the tables by priority (highest first, then in plan
+#  order), each in its own process with its own log file, as long as the
+#  running tables stay within maxConnections HANA sessions and maxCPU
+#  client CPUs.  Files a load writes (CSV files, reports) are prefixed with
+#  its table name.  A table that does not fit waits for running ones to
+#  finish; tables after it do not overtake it.  A table needing more than
+#  a cap on its own is scaled down to it.
+#
+#  To Run
+#
+#       python loadPlan.py plan.json [report.json]
+#
+import json
+import multiprocessing
+import sys
+import time
+import traceback
+try:
+        import tomllib
+except ImportError:
+        tomllib = None
+try:
+        import toml
+except ImportError:
+        toml = None
+if sys.version_info[0] < 3:
+        import Queue as queue
+else:
+        import queue
+
+# Plan keys that are not populateHanaDB settings.
+TABLEKEYS = ('priority', 'sessions', 'cpus', 'log')
+
+# Files a load writes.  Unless the plan names them they get the table name
+# as prefix, so concurrent loads do not overwrite each other's.
+OUTPUTS = ('csvFn', 'probeCSV', 'probeJSON', 'rateReport', 'workloadReport')
+
+# Setting holding the number of concurrent sessions of a load mode (None:
+# one session).
+SESSIONSETTING = {'csv': None, 'many': None, 'probe': None, 'one': 'workers', 'async': 'workers',
+                  'parallelcsv': 'csvShards', 'pipeline': 'pipelineSessions', 'process': 'loadProcesses',
+                  'rate': 'rateWorkers', 'workload': 'workloadWorkers', 'partition': 'partitionSessions',
+                  'autotune': 'tuneSessions'}
+
+def readPlan(fileName):
+    """
+    Read a JSON or (*.toml) TOML load plan.
+    """
+    if fileName.endswith('.toml'):
+        if tomllib is not None:
+            with open(fileName, 'rb') as f:
+                return tomllib.load(f)
+        if toml is not None:
+            with open(fileName) as f:
+                return toml.load(f)
+        raise ValueError("Reading TOML plans needs python 3.11 or the toml module.")
+    with open(fileName) as f:
+        return json.load(f)
+
+class tableLoad:
+    def __init__(self, n, entry, defaults, loader):
+        """
+        One table of a plan: its populateHanaDB settings (defaults updated
+        with entry), priority and the sessions & client CPUs its load uses.
+
+        Parameter:
+              n - Position in the plan (breaks priority ties).
+          entry - The plan's table entry.  'sessions' & 'cpus' override the
+                  estimates, 'log' the log file.
+         loader - populateHanaDB module, to check the setting names and
+                  fill in the settings the plan leaves at their default.
+        """
+        settings = dict(defaults)
+        settings.update(entry)
+        for key in settings:
+            if key not in TABLEKEYS and not hasattr(loader, key):
+                raise ValueError("Unknown setting \"{0}\" for table {1}.".format(key, entry.get('tableName', n)))
+        if not settings.get('tableName'):
+            raise ValueError("Table {0} of the plan has no tableName.".format(n))
+
+        self.n = n
+        self.name = settings['tableName']
+        self.priority = settings.pop('priority', 0)
+        self.log = settings.pop('log', '{0}.log'.format(self.name))
+        sessions = settings.pop('sessions', None)
+        cpus = settings.pop('cpus', None)
+        for key in OUTPUTS:
+            if key not in settings:
+                settings[key] = '{0}.{1}'.format(self.name, getattr(loader, key))
+        for key in ('hosts', 'rateSchedule', 'workloadSchedule'):
+            # JSON/TOML have no tuples.
+            if settings.get(key):
+                settings[key] = [tuple(v) for v in settings[key]]
+        self.settings = settings
+
+        mode = self.get('loadMode', loader)
+        if mode not in SESSIONSETTING:
+            raise ValueError("Unknown loadMode \"{0}\" for table {1}.".format(mode, self.name))
+        self.sessionSetting = SESSIONSETTING[mode]
+        if sessions is None:
+            sessions = 1 + (self.get(self.sessionSetting, loader) if self.sessionSetting else 1)
+            if self.get('probeInterval', loader) > 0:
+                sessions = sessions + 1
+        if cpus is None:
+            if mode == 'process':
+                cpus = self.get('loadProcesses', loader)
+            elif mode == 'csv':
+                cpus = self.get('csvProcesses', loader)
+            else:
+                cpus = 1
+        self.sessions = max(1, sessions)
+        self.cpus = max(1, cpus)
+
+    def get(self, key, loader):
+        """
+        The load's value of setting key, deriving the loader's DERIVED
+        settings left at None like populateHanaDB.deriveDefaults() does.
+        """
+        value = self.settings.get(key, getattr(loader, key))
+        if value is None:
+            for name, derive in loader.DERIVED:
+                if name == key:
+                    return derive(lambda k: self.get(k, loader))
+        return value
+
+    def cap(self, maxConnections, maxCPU, loader):
+        """
+        Scale the load's concurrency down so it fits the caps on its own.
+        """
+        if self.sessions > maxConnections and self.sessionSetting is not None:
+            value = max(1, self.get(self.sessionSetting, loader) - (self.sessions - maxConnections))
+            print("{0}: capping {1} at {2} to stay within {3} connections".format(
+                  self.name, self.sessionSetting, value, maxConnections))
+            self.settings[self.sessionSetting] = value
+        if self.cpus > maxCPU:
+            if self.get('loadMode', loader) == 'process':
+                self.settings['loadProcesses'] = min(self.settings.get('loadProcesses', maxCPU), maxCPU)
+            elif self.get('loadMode', loader) == 'csv':
+                self.settings['csvProcesses'] = maxCPU
+            print("{0}: capping at {1} client CPUs".format(self.name, maxCPU))
+        self.sessions = min(self.sessions, maxConnections)
+        self.cpus = min(self.cpus, maxCPU)
+
+def loadTable(name, settings, log, results):
+    """
+    Worker process: apply settings to populateHanaDB and run the load,
+    writing its output to log.  Puts (name, summary or None, error or None)
+    on results.  A load that added no rows, or whose operations failed, has
+    an error even though runLoad() returned.
+    """
+    out = open(log, 'w')
+    sys.stdout = out
+    sys.stderr = out
+    try:
+        import populateHanaDB as loader
+        for key, value in settings.items():
+            setattr(loader, key, value)
+        summary = loader.runLoad()
+        summary['metrics'] = {'operations': summary['metrics']['operations'], 'errors': summary['metrics']['errors']}
+        # Failed probes measure an outage, they are not load errors.
+        errors = dict([(op, codes) for op, codes in summary['metrics']['errors'].items() if op != 'probe'])
+        error = None
+        if summary['rows'] == 0 and loader.totalBytes > 0 and loader.loadMode not in ('probe', 'workload'):
+            error = "no rows loaded"
+        elif errors:
+            error = "operations failed: {0}".format(errors)
+        results.put((name, summary, error))
+    except BaseException as e:
+        print("ERROR: loading {0}: {1}\n{2}".format(name, e, traceback.format_exc()))
+        results.put((name, None, str(e) or type(e).__name__))
+    finally:
+        out.flush()
+
+class scheduler:
+    def __init__(self, plan, maxConnections=None, maxCPU=None):
+        """
+        Parameter:
+                      plan - Load plan dictionary (see readPlan()).
+            maxConnections - Cap on the HANA sessions of all running loads.
+                             Defaults to the plan's, else 16.
+                    maxCPU - Cap on the client CPUs (processes) of all
+                             running loads.  Defaults to the plan's, else
+                             the number of CPUs.
+        """
+        import populateHanaDB as loader
+
+        if not plan.get('tables'):
+            raise ValueError("The load plan has no tables.")
+
+        self.maxConnections = maxConnections or plan.get('maxConnections', 16)
+        self.maxCPU = maxCPU or plan.get('maxCPU', multiprocessing.cpu_count())
+        self.tables = [tableLoad(n, entry, plan.get('defaults', {}), loader) for n, entry in enumerate(plan['tables'])]
+        names = [t.name.upper() for t in self.tables]
+        if len(set(names)) != len(names):
+            raise ValueError("Every table can only be in the plan once.")
+        for t in self.tables:
+            t.cap(self.maxConnections, self.maxCPU, loader)
+        # name -> report entry
+        self.results = {}
+        self.elapsed = 0.0
+
+    def __start(self, table, results):
+        p = multiprocessing.Process(target=loadTable, args=(table.name, table.settings, table.log, results))
+        p.start()
+        self.results[table.name] = {'table': table.name, 'priority': table.priority, 'sessions': table.sessions,
+                                   'cpus': table.cpus, 'loadMode': table.settings.get('loadMode'),
+                                   'log': table.log, 'start': time.time(), 'end': None, 'seconds': None,
+                                   'ok': False, 'error': None, 'summary': None}
+        print("Started {0} ({1} sessions, {2} CPUs, priority {3}), log in {4}".format(
+              table.name, table.sessions, table.cpus, table.priority, table.log))
+        return p
+
+    def __collect(self, results):
+        while True:
+            try:
+                name, summary, error = results.get_nowait()
+            except queue.Empty:
+                return
+            entry = self.results[name]
+            entry['summary'] = summary
+            entry['error'] = error
+            entry['ok'] = summary is not None and error is None
+
+    def run(self, poll=0.5):
+        """
+        Load every table of the plan.  Returns report().
+        """
+        pending = sorted(self.tables, key=lambda t: (-t.priority, t.n))
+        running = {}
+        results = multiprocessing.Queue()
+        connections = 0
+        cpus = 0
+        t0 = time.time()
+        try:
+            while pending or running:
+                while pending and connections + pending[0].sessions <= self.maxConnections \
+                      and cpus + pending[0].cpus <= self.maxCPU:
+                    table = pending.pop(0)
+                    running[table.name] = (self.__start(table, results), table)
+                    connections = connections + table.sessions
+                    cpus = cpus + table.cpus
+
+                time.sleep(poll)
+                self.__collect(results)
+                for name, (p, table) in list(running.items()):
+                    if p.is_alive():
+                        continue
+                    p.join()
+                    self.__finish(name, p.exitcode, results)
+                    del running[name]
+                    connections = connections - table.sessions
+                    cpus = cpus - table.cpus
+        except KeyboardInterrupt:
+            # Ctrl-C reached the loads too, let them wind down.
+            print("\nStopping the load plan, waiting for the running tables...")
+            for name, (p, table) in running.items():
+                p.join()
+                self.__finish(name, p.exitcode, results)
+        self.elapsed = time.time() - t0
+        return self.report()
+
+    def __finish(self, name, exitcode, results):
+        self.__collect(results)
+        entry = self.results[name]
+        entry['end'] = time.time()
+        entry['seconds'] = round(entry['end'] - entry['start'], 3)
+        if exitcode != 0:
+            entry['ok'] = False
+        if not entry['ok'] and entry['error'] is None:
+            entry['error'] = "exit code {0}".format(exitcode)
+        print("Finished {0} in {1:.2f} sec{2}".format(name, entry['seconds'],
+              '' if entry['ok'] else ', FAILED: {0}'.format(entry['error'])))
+
+    def report(self):
+        """
+        Return the caps, total elapsed seconds and per table (in start
+        order) the sessions & CPUs it was given, start/end time, seconds,
+        success and its load summary (see populateHanaDB.runLoad()).
+        """
+        tables = sorted(self.results.values(), key=lambda e: e['start'])
+        return {'maxConnections': self.maxConnections, 'maxCPU': self.maxCPU,
+                'elapsed': round(self.elapsed, 3), 'failed': len([e for e in tables if not e['ok']]),
+                'tables': tables}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: {0} plan.json|plan.toml [report.json]".format(sys.argv[0]))
+        sys.exit(-1)
+
+    plan = readPlan(sys.argv[1])
+    reportFile = sys.argv[2] if len(sys.argv) > 2 else plan.get('report', 'loadPlanReport.json')
+    report = scheduler(plan).run()
+    print("")
+    for e in report['tables']:
+        summary = e['summary'] or {}
+        print("{0:>20}: {1:>8} {2:>10.2f} sec {3:>12} rows".format(
+              e['table'], 'ok' if e['ok'] else 'FAILED', e['seconds'] or 0.0, summary.get('rows', 0)))
+    print("Plan loaded {0} tables in {1:.2f} sec, {2} failed".format(len(report['tables']), report['elapsed'], report['failed']))
+    with open(reportFile, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print("Report written to {0}".format(reportFile))
+    sys.exit(1 if report['failed'] else 0)
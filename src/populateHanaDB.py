@@ -24,6 +24,15 @@
 #  Author: tuttipazzo
 # 
 from hanaDatabase import *
+import csvWriter
+import dataGenerator
+import hanaMetrics
+import haProbe
+import rateDriver
+import workload
+import autoTune
+import json
+import re
 import traceback
 import string
 import random
@@ -31,6 +40,13 @@ import sys
 import time
 import multiprocessing
 import os
+import itertools
+import math
+import threading
+if sys.version_info[0] < 3:
+        import Queue as queue
+else:
+        import queue
 
 # SAP/HANA ships its own python version and sets PYTHONPATH for
 # sap admin account.  If we want to use python modules not available
@@ -38,13 +54,13 @@ import os
 # PYTHONPATH path
 #
 try:
-	import concurrent.futures 
+        import concurrent.futures 
 except ImportError:
-	print("Python module \'concurrent.futures\' is not in path.")
-	print("Please add system python path to PYTHONPATH  like so:")
-	print("\nexport PYTHONPATH=%{$PYTHONPATH}:/usr/lib/python2.7/site-packages")
-	print("\nand try again.")
-	sys.exit(-1)
+        print("Python module \'concurrent.futures\' is not in path.")
+        print("Please add system python path to PYTHONPATH  like so:")
+        print("\nexport PYTHONPATH=%{$PYTHONPATH}:/usr/lib/python2.7/site-packages")
+        print("\nand try again.")
+        sys.exit(-1)
 
 workers=multiprocessing.cpu_count()
 #workers=1
@@ -57,14 +73,192 @@ db = None
 add1 = []
 numCols=8
 columnBytes=4096
-csvNumRec=columnBytes
+# Records per CSV import, None for columnBytes.
+csvNumRec=None
+# CSV generation: number of writer processes (each writes its own byte range
+# of the file), write through mmap, and preallocate the file's disk blocks.
+csvProcesses=1
+csvMmap=False
+csvPreallocate=False
+# Generate rows from the table's column types (see dataGenerator.py) instead
+# of repeating one random record.  dataSpec sets the per column cardinality,
+# value lengths & NULL rate; its '*' entry applies to all columns.  None
+# gives every column values of columnBytes / 2 to columnBytes characters.
+synthData=False
+dataSpec=None
+gen = None
+# Rows per executemany() call and rows per commit for the 'many' load mode.
+batchSize=1000
+commitEvery=10000
+# When row level writes are committed (see hanaDatabase.commitPolicy):
+# 'auto' (every operation, or every commitEvery rows for 'many'), 'rows'
+# (every commitRows rows per session), 'time' (group commit of all sessions
+# every commitInterval ms) or 'explicit' (only at the end of the load).
+commitMode='auto'
+commitRows=10000
+commitInterval=100
+# Number of CSV shards imported concurrently by the 'parallelcsv' mode
+# plus HANA's own IMPORT THREADS/BATCH options (0 = server default).
+# Session & shard counts left at None below default to workers.
+csvShards=None
+importThreads=0
+importBatch=0
+# How the 'csv' & 'parallelcsv' modes stage the CSV data for IMPORT FROM
+# CSV FILE: 'file' writes regular files first, 'fifo' streams the generated
+# records through named pipes (one per shard) that the import reads from,
+# so no scratch space is needed and the data is not written & read back
+# from disk.  The loader has to run on the HANA host either way.  When no
+# FIFO can be created, or the first FIFO import fails (the server would not
+# read it), the load falls back to files, with importThreads again.  The
+# staging throughput of both paths (MB/s per file or FIFO stream) is
+# printed at the end, run with each to compare them.
+csvStaging='file'
+# The 'pipeline' mode recycles a ring of pipelineFiles CSV files (2 = double
+# buffered) of pipelineShardRecs (None: csvNumRec) records each, so disk
+# usage stays bounded.
+pipelineFiles=2
+pipelineShardRecs=None
+# Further attempts to import a shard whose import failed before its
+# records are counted as lost.
+pipelineRetries=2
+pipelineSessions=1
+# The 'process' mode runs loadProcesses worker processes, each with its own
+# connection, generating & loading its own slice of the rows with either
+# batched inserts ('many') or CSV imports ('csv', requires SYSTEM user).
+loadProcesses=None
+processMode='many'
+# The 'async' mode (python 3 only) keeps up to asyncInFlight batched inserts
+# of batchSize rows in flight, started asyncInterval seconds apart.
+asyncInFlight=256
+asyncInterval=0.0
+# Optional JSON file caching the table's metadata so worker processes and
+# later runs skip the catalog queries (e.g. 'hanaSchemaCache.json').
+schemaCacheFile=None
+# Operation latency histograms, row/byte & error counters (hanaMetrics.py)
+# written every metricsInterval seconds while loading, as JSON and/or in
+# Prometheus text format (e.g. into node_exporter's textfile directory).
+metricsJSON=None
+metricsProm=None
+metricsInterval=10
+# Failover: further (address, port) candidates tried when a connection
+# breaks (e.g. [('hana02', 30015)] for the system replication secondary),
+# how many rounds over all hosts to try and the first backoff in seconds.
+# Only network errors after the first successful connect are retried; a
+# wrong password or an unreachable host at start fails right away.
+hosts=[]
+reconnectRetries=10
+reconnectBackoff=1.0
+# Resumable loads ('csv', 'many' & 'process' modes): every commitEvery batch
+# gets the id "<loadId>:<batch number>" and is recorded in checkpointFile
+# once committed, so rerunning an interrupted load skips the batches already
+# loaded.  Inserted batches are also recorded in the database (see
+# database.addBatch()) so a batch whose commit reply was lost is not loaded
+# twice.  Use a new loadId (or remove the file) to start a fresh load.
+# loadId defaults to the table name.
+checkpointFile=None
+loadId=None
+# Takeover latency probe (haProbe.py): a write & read heartbeat every
+# probeInterval seconds over its own session while loading (0 = off).  The
+# 'probe' load mode only probes, for probeDuration seconds (or until
+# Ctrl-C).  The per probe timeline & outage windows go to probeCSV and
+# probeJSON.
+probeInterval=0
+probeDuration=300
+probeCSV='haProbe.csv'
+probeJSON='haProbe.json'
+# The 'rate' mode (rateDriver.py) applies sustained, controlled pressure
+# instead of loading totalBytes flat out.  rateSchedule is a list of phases
+# run one after the other: (seconds, rate) steps and (seconds, fromRate,
+# toRate) linear ramps, in rateUnit ('ops', 'rows' or 'bytes') per second.
+# The load ends with the last phase.  E.g. 20 MB/s for 2 hours:
+#	rateSchedule=[(7200, 20 * 1048576)]; rateUnit='bytes'
+# rateOp picks the path every operation takes: 'one' (add() of one row),
+# 'many' (addMany() of batchSize rows) or 'csv' (import of csvNumRec records,
+# requires SYSTEM user).  rateWorkers threads issue the operations and
+# rateBurst units may go ahead of schedule.  The per second target vs.
+# achieved timeline and latency go to rateReport.
+rateSchedule=[(60, 0, 500), (3600, 500)]
+rateUnit='ops'
+rateOp='one'
+rateWorkers=None
+rateBurst=0
+rateReport='rateReport.json'
+# The 'workload' mode (workload.py) runs mixed OLTP traffic instead of only
+# inserting: workloadMix ratios of insert/read/update/delete/scan over
+# workloadWorkers sessions for workloadDuration seconds, picking keys of the
+# rows it wrote 'uniform', 'zipfian' or 'latest'.  workloadPreload rows are
+# inserted first.  The table's first column holds the key; make it the
+# PRIMARY KEY for key based updates & deletes.  workloadSchedule (a
+# rateSchedule in ops/s, see above) paces the operations instead of running
+# flat out.  Per operation latency & throughput go to workloadReport.
+workloadMix={'insert': 60, 'read': 20, 'update': 15, 'delete': 5}
+workloadDistribution='zipfian'
+workloadDuration=300
+workloadWorkers=None
+workloadPreload=10000
+workloadSchedule=None
+workloadReport='workloadReport.json'
+# Bulk load session (see database.bulkLoad()): with deferMerge automerge of
+# the table is disabled during the load and one MERGE DELTA OF runs at the
+# end, so the load does not compete with the mergedog.  noDeltaLog also
+# disables the table's delta log while loading (rows are only durable after
+# the final merge, not allowed everywhere).  The original settings are
+# restored afterwards and the load vs. merge time is printed.
+deferMerge=False
+noDeltaLog=False
+# Partitioning the table is created with (see hanaDatabase.partitionClause()),
+# e.g. 8 hash partitions on email, or ranges of a numeric id column:
+#	partitionSpec={'type': 'HASH', 'columns': ['email'], 'partitions': 8}
+#	partitionSpec={'type': 'RANGE', 'columns': ['id'], 'ranges': [(0, 10**9), (10**9, 2 * 10**9)], 'others': True}
+# HASH with 'partitions': 0 creates one partition per indexserver.  A load
+# that would put more than HANA's 2 billion rows into one partition gets
+# more hash partitions (or, without partitionSpec, the table gets hash
+# partitioned on its first column).  The 'partition' mode gives every row a
+# unique key in the partitioning columns, routes the rows to their
+# partitions and loads partitionSessions partitions concurrently, with
+# batched inserts or, with partitionCSV, one CSV shard per partition
+# (requires SYSTEM user).
+partitionSpec=None
+partitionSessions=None
+partitionCSV=False
+# The 'autotune' mode (autoTune.py) finds batchSize, the number of sessions
+# and commitEvery for batched inserts while loading: calibration phases of
+# tuneSeconds each hill-climb over the three (at most tunePhases phases, up
+# to tuneSessions sessions) on the measured rows/s, then the rest of the
+# rows are loaded with the best settings.  With tuneMaxP99 a setting only
+# wins if the p99 latency of inserting & committing commitEvery rows stays
+# under that many seconds.  Calibration starts from batchSize, commitEvery
+# and half of tuneSessions.  commitEvery is only tuned with commitMode 'auto'.  The chosen profile is printed and saved per
+# host in tuneProfileFile; later runs start calibrating from it.
+tuneSeconds=5
+tunePhases=12
+tuneSessions=None
+tuneMaxP99=None
+tuneProfileFile='hanaTuning.json'
+# Load mode:
+#	'csv'  - IMPORT FROM CSV (requires SYSTEM user)
+#	'parallelcsv' - Concurrent IMPORT FROM CSV of csvShards files over
+#	         separate sessions (requires SYSTEM user)
+#	'pipeline' - Generate unique CSV shards while earlier shards are
+#	         being imported (requires SYSTEM user)
+#	'one'  - Insert 1 record at a time
+#	'many' - Batched parameterized inserts (no SYSTEM user required)
+#	'process' - Multiple processes, one connection & row slice each
+#	'async' - asyncio driven batched inserts over pooled sessions
+#	'probe' - No load, only the takeover latency probe (see above)
+#	'rate' - Rate controlled load following rateSchedule (see above)
+#	'workload' - Mixed insert/read/update/delete traffic (see above)
+#	'partition' - Partition-parallel load (see partitionSpec above)
+#	'autotune' - Batched inserts with auto-tuned settings (see above)
+loadMode='csv'
 tableName = "Contacts"
 address = "localhost"
 port=30015
 user='system'
 passwd='<Enter a password here>'
 
-# SAP/HANA DB limit in VARCHAR column data size is 5000.
+# SAP/HANA DB limit in VARCHAR column data size is 5000.  {0} is replaced
+# with tableName when the table is created.
 createStmt = """CREATE TABLE {0} (
                             fName   VARCHAR(5000),
                             mName   VARCHAR(5000),
@@ -73,16 +267,189 @@ createStmt = """CREATE TABLE {0} (
                             address VARCHAR(5000),
                             city    VARCHAR(5000),
                             state   VARCHAR(5000),
-                            zipCode VARCHAR(5000));""".format(tableName)
+                            zipCode VARCHAR(5000));"""
 
-def genCSVData(fileName, record, numRec):
+# Settings derived from others when the load starts (see deriveDefaults()),
+# if left at None, in the order they are derived.
+DERIVED = [('csvNumRec', lambda get: get('columnBytes')),
+           ('pipelineShardRecs', lambda get: get('csvNumRec')),
+           ('dataSpec', lambda get: {'*': {'cardinality': 0, 'minLen': get('columnBytes') // 2,
+                                           'maxLen': get('columnBytes')}}),
+           ('csvShards', lambda get: get('workers')),
+           ('loadProcesses', lambda get: get('workers')),
+           ('rateWorkers', lambda get: get('workers')),
+           ('workloadWorkers', lambda get: get('workers')),
+           ('partitionSessions', lambda get: get('workers')),
+           ('tuneSessions', lambda get: get('workers'))]
+# Setting -> the value deriveDefaults() gave it.
+derived = {}
+
+def deriveDefaults():
+    """
+    Fill in the DERIVED settings left at None (or still at the value an
+    earlier run derived), so they follow columnBytes & workers as set
+    after import, e.g. by a load plan.
+    """
+    settings = globals()
+    for name, derive in DERIVED:
+        if settings[name] is None or (name in derived and settings[name] == derived[name]):
+            settings[name] = derive(lambda key: settings[key])
+            derived[name] = settings[name]
+
+def tableCreateStmt():
+    """
+    createStmt for tableName.
+    """
+    return createStmt.replace('{0}', tableName)
+
+def showProgress(recs, nbytes):
+    """
+    Rewrite the progress line with the records & bytes added so far.
+    """
+    sys.stdout.write('Added %d/%d records (%.2f/%.2f MB)\r' % (recs, totalRecs, nbytes / 1048576.0, totalBytes / 1048576.0))
+    sys.stdout.flush()
+
+def loadBatch(wdb, ckpt, batchId, rows, batch_size, commit_every):
+    """
+    Insert one commitEvery batch.  rows() returns the batch's rows.
+    Without a checkpoint log this is a plain addMany().  With one the
+    batch is skipped if it was checkpointed before, otherwise it is
+    loaded exactly once with addBatch() and checkpointed.
+
+    Returns (rows added, True if the batch was skipped).
+    """
+    if ckpt is None:
+        return wdb.addMany(rows(), batch_size=batch_size, commit_every=commit_every), False
+
+    done = ckpt.rows(batchId)
+    if done is not None:
+        return done, True
+    added = wdb.addBatch(batchId, rows(), batch_size=batch_size)
+    if added is None:
+        return 0, False
+    ckpt.record(batchId, added)
+    return added, False
+
+def genCSVData(fileName, record, numRec, verbose=True, first=None):
     """
     Generate record data in CSV format.  Note the column data only.
     No header is needed.
+
+    The file is written by csvWriter in large binary blocks (optionally
+    by csvProcesses processes, through mmap or preallocated, see above).
+    With synthData the rows come from the data generator instead of record.
+    With first the records are numbered from first so they are unique (see
+    csvWriter.numberedCSVChunks()).
+    Returns the number of bytes written.
+    """
+    global csvProcesses, csvMmap, csvPreallocate, synthData, gen, batchSize
+
+    if synthData:
+        size, secs = csvWriter.writeCSVChunks(fileName, gen.iterCSV(numRec, batchSize))
+    elif first is not None:
+        size, secs = csvWriter.writeCSVChunks(fileName, csvWriter.numberedCSVChunks(record, numRec, first))
+    else:
+        size, secs = csvWriter.writeCSV(fileName, record, int(numRec), processes=csvProcesses,
+                                        useMmap=csvMmap, preallocate=csvPreallocate)
+    fileStats['bytes'] = fileStats['bytes'] + size
+    fileStats['seconds'] = fileStats['seconds'] + secs
+    if verbose:
+        print("Generated {0} ({1:.2f} MB) in {2:.2f} sec ({3:.2f} MB/s)".format(
+              fileName, size / 1048576.0, secs, size / 1048576.0 / secs if secs > 0 else 0.0))
+    return size
+
+# Bytes & seconds written into CSV files.
+fileStats = {'bytes': 0, 'seconds': 0.0}
+# Bytes & seconds written into FIFOs, whether a FIFO import has worked.
+fifoStats = {'bytes': 0, 'seconds': 0.0, 'imports': 0}
+
+def csvChunks(numRec):
+    """
+    The CSV data of numRec generated records, in chunks.
+    """
+    if synthData:
+        return gen.iterCSV(numRec, batchSize)
+    return csvWriter.csvChunks(add1, int(numRec))
+
+def fifoImport(fileNames, numRec, importer):
+    """
+    Create a FIFO per file name, stream numRec generated records into each
+    from its own thread and run importer(fileNames), which imports them
+    (and returns the list of imported ones).  A FIFO whose stream failed
+    does not count as imported.
     """
-    with open(fileName, mode='w+') as f:
-    	for i in range(numRec):
-    		f.write(','.join(record) + '\n')
+    cancel = threading.Event()
+    lock = threading.Lock()
+    errors = {}
+    def writer(fileName):
+        try:
+            size, secs = csvWriter.streamCSV(fileName, csvChunks(numRec), cancel)
+            with lock:
+                fifoStats['bytes'] = fifoStats['bytes'] + size
+                fifoStats['seconds'] = fifoStats['seconds'] + secs
+        except (IOError, OSError) as e:
+            errors[fileName] = e
+
+    writers = [threading.Thread(target=writer, args=(f,)) for f in fileNames]
+    for t in writers:
+        t.daemon = True
+        t.start()
+    try:
+        imported = importer(fileNames)
+    finally:
+        # Writers still waiting for a reader belong to failed imports.
+        cancel.set()
+        for t in writers:
+            t.join()
+        for f in fileNames:
+            if os.path.exists(f):
+                os.remove(f)
+    for f, e in errors.items():
+        print("ERROR: streaming CSV data into FIFO \"{0}\": {1}".format(f, e))
+    imported = [f for f in imported if f not in errors]
+    fifoStats['imports'] = fifoStats['imports'] + len(imported)
+    return imported
+
+def stagedImport(fileNames, numRec, importer):
+    """
+    Import numRec generated records into each of fileNames with
+    importer(fileNames) (returning the imported files), staged as set by
+    csvStaging.  'file' expects the files to exist already.  'fifo' streams
+    them and falls back to generating the files if FIFOs cannot be created
+    or the first FIFO import fails.
+    """
+    global csvStaging
+
+    if csvStaging == 'fifo':
+        if all([csvWriter.makeFifo(f) for f in fileNames]):
+            imported = fifoImport(fileNames, numRec, importer)
+            if imported or fifoStats['imports'] > 0:
+                return imported
+            print("WARNING: importing from FIFOs failed, falling back to CSV files")
+        else:
+            print("WARNING: FIFOs are not supported here, falling back to CSV files")
+        csvStaging = 'file'
+        for f in fileNames:
+            if os.path.lexists(f):
+                os.remove(f)
+            genCSVData(f, add1, numRec)
+    return importer(fileNames)
+
+def printStaging():
+    """
+    Print the staging throughput of CSV files and FIFOs side by side, in
+    MB/s per file or stream.  A path the load did not use says so.
+    """
+    paths = []
+    for name, stats, used in (('CSV files', fileStats, fileStats['bytes'] > 0),
+                              ('FIFOs', fifoStats, fifoStats['imports'] > 0)):
+        if used:
+            mb = stats['bytes'] / 1048576.0
+            paths.append("{0} {1:.2f} MB at {2:.2f} MB/s".format(
+                         name, mb, mb / stats['seconds'] if stats['seconds'] > 0 else 0.0))
+        else:
+            paths.append("{0} not used".format(name))
+    print("\nStaging throughput: {0}".format(', '.join(paths)))
 
 def doCSVImport():
     """
@@ -102,75 +469,777 @@ def doCSVImport():
 
     Note2: Be careful when changing either the delimiter or that the column
            data does not contain the delimiter.
+
+    With csvStaging 'fifo' every import reads freshly generated records
+    from a FIFO instead of the same file over and over.
     """
-    global recBytes, totalRecs, workers, totalBytes, csvFn, csvNumRec
+    global recBytes, totalRecs, workers, totalBytes, csvFn, csvNumRec, checkpointFile, loadId, reconnectRetries
 
-    print("Using {0} threads...".format(workers))
+    print("Importing {0} records per CSV import...".format(csvNumRec))
     recs=0
-    totalBytesAdded=0.0
+    added=0
+    failures=0
+    n=0
+    ckpt = checkpointLog(checkpointFile) if checkpointFile else None
 
     # IMPORT statement requires absolute path to file.
     fileName = os.getcwd() + '/' + csvFn
 
     while recs < totalRecs:
-	db.importFromCSV(fileName)
-    	totalBytesAdded = totalBytesAdded + (recBytes * workers * csvNumRec)
-	recs = recs + (workers * csvNumRec)
-	progress = 'Added %d'%recs + '/%d'%totalRecs + ' records (%d'%totalBytesAdded + \
-	           ' bytes/%d'%totalBytes + ' GB)\r'
-	sys.stdout.write(progress)
-	sys.stdout.flush()
+        # The import is not recorded in the database, so an import whose
+        # commit reply was lost in a takeover is loaded again on resume.
+        batchId = '{0}:csv{1}'.format(loadId or tableName, n)
+        if ckpt is not None and ckpt.rows(batchId) is not None:
+            added = added + ckpt.rows(batchId)
+        elif stagedImport([fileName], csvNumRec, lambda files: [f for f in files if db.importFromCSV(f)]):
+            added = added + csvNumRec
+            failures = 0
+            if ckpt is not None:
+                ckpt.record(batchId, csvNumRec)
+        else:
+            # Retry the same import (the connection has been reopened)
+            # instead of counting progress that never happened.
+            failures = failures + 1
+            if failures > reconnectRetries:
+                print("\nERROR: CSV import keeps failing, giving up.")
+                break
+            continue
+        n = n + 1
+        recs = recs + csvNumRec
+        showProgress(added, added * recBytes)
+    printStaging()
+
+def doParallelCSVImport():
+    """
+    Split the load into csvShards CSV files and import them concurrently,
+    each shard with its own IMPORT FROM CSV statement over its own session
+    (see database.importManyFromCSV()).  Same SYSTEM user requirement as
+    doCSVImport().  With csvStaging 'fifo' every shard is a FIFO fed by its
+    own writer thread.
+
+    importThreads & importBatch set HANA's IMPORT THREADS/BATCH options so
+    each statement is also parallelized on the server side.
+    """
+    global recBytes, totalRecs, add1, totalBytes, csvFn, csvShards, importThreads, importBatch, csvStaging
+
+    recsPerShard = int(math.ceil(totalRecs / csvShards))
+
+    # IMPORT statement requires absolute path to file.
+    base, ext = os.path.splitext(csvFn)
+    shards = [os.getcwd() + '/' + '{0}.{1}{2}'.format(base, i, ext) for i in range(csvShards)]
+    if csvStaging == 'fifo':
+        print("Streaming {0} CSV shards of {1} records through FIFOs...".format(csvShards, recsPerShard))
+    else:
+        print("Generating {0} CSV shards of {1} records...".format(csvShards, recsPerShard))
+        for fileName in shards:
+            genCSVData(fileName, add1, recsPerShard)
+
+    def importer(files):
+        # A FIFO can only be read front to back, by one thread.  Checked
+        # when importing, stagedImport() may have fallen back to files.
+        threads = 0 if csvStaging == 'fifo' else importThreads
+        return db.importManyFromCSV(files, sessions=csvShards, threads=threads, batch=importBatch)
+
+    print("Importing {0} shards over {1} sessions...".format(len(shards), csvShards))
+    imported = stagedImport(shards, recsPerShard, importer)
+
+    recs = len(imported) * recsPerShard
+    print('Added %d/%d records (%.2f/%.2f MB) from %d/%d shards' % (recs, totalRecs, recs * recBytes / 1048576.0,
+          totalBytes / 1048576.0, len(imported), len(shards)))
+    printStaging()
+
+def doPipelineImport():
+    """
+    Generate-while-import loader.  A generator thread writes unique CSV
+    shard N+1 while shard N is being imported, so the total time gets close
+    to max(generate, import) instead of their sum.  Every record of the
+    load is unique (numbered, or from the data generator with synthData).
+    A shard whose import fails is imported again up to pipelineRetries
+    times, after that its records are counted as failed.  If the import
+    sessions die (an unexpected exception) the generator stops and the
+    shards they did not finish are counted as failed.
+
+    The shards are written to a ring of pipelineFiles files which are
+    reused once their import is done, so disk usage is bounded to
+    pipelineFiles * pipelineShardRecs records no matter how big the load.
+    pipelineSessions shards are imported concurrently (keep pipelineFiles
+    larger than pipelineSessions or the generator has nothing to fill).
+    """
+    global recBytes, totalRecs, totalBytes, add1, csvFn, pipelineFiles, pipelineShardRecs, pipelineSessions, \
+           pipelineRetries
+
+    numShards = int(math.ceil(totalRecs / pipelineShardRecs))
+    print("Pipelining {0} shards of {1} records through {2} files, {3} import session(s)...".format(
+          numShards, pipelineShardRecs, pipelineFiles, pipelineSessions))
+
+    # IMPORT statement requires absolute path to file.
+    base, ext = os.path.splitext(csvFn)
+    ring = [os.getcwd() + '/' + '{0}.ring{1}{2}'.format(base, i, ext) for i in range(pipelineFiles)]
+    free = queue.Queue()
+    for fileName in ring:
+        free.put(fileName)
+    ready = queue.Queue()
+    # Cleared once the import sessions are gone, done or dead.
+    importing = threading.Event()
+    importing.set()
+
+    lock = threading.Lock()
+    stats = {'gen': 0.0, 'genWait': 0.0, 'genBytes': 0, 'import': 0.0, 'recs': 0, 'failed': 0, 'retries': 0}
+
+    def freeFile():
+        # A session that died keeps its file, so do not wait for files
+        # once no session is left to hand them back.
+        while True:
+            try:
+                return free.get(timeout=1.0)
+            except queue.Empty:
+                if not importing.is_set():
+                    return None
+
+    def generator():
+        try:
+            for n in range(numShards):
+                t0 = time.time()
+                fileName = freeFile()
+                if fileName is None:
+                    print("\nERROR: the import sessions stopped, not generating the remaining shards.")
+                    break
+                t1 = time.time()
+                stats['genBytes'] += genCSVData(fileName, add1, pipelineShardRecs, verbose=False,
+                                                first=n * pipelineShardRecs)
+                stats['genWait'] += t1 - t0
+                stats['gen'] += time.time() - t1
+                ready.put(fileName)
+        finally:
+            for i in range(pipelineSessions):
+                ready.put(None)
+
+    def imported(fileName, ok, seconds):
+        # Runs on the importing session's thread, so retry right there.
+        try:
+            retries = 0
+            while not ok and retries < pipelineRetries:
+                retries = retries + 1
+                print("\nWARNING: import of {0} failed, retrying ({1}/{2})".format(fileName, retries, pipelineRetries))
+                t0 = time.time()
+                ok = db.importFromCSV(fileName, threads=importThreads, batch=importBatch)
+                seconds = seconds + time.time() - t0
+            with lock:
+                stats['import'] += seconds
+                stats['retries'] += retries
+                if ok:
+                    stats['recs'] += pipelineShardRecs
+                else:
+                    stats['failed'] += pipelineShardRecs
+                showProgress(stats['recs'], stats['recs'] * recBytes)
+        finally:
+            # Hand the file back to the generator.
+            free.put(fileName)
+
+    t0 = time.time()
+    producer = threading.Thread(target=generator)
+    producer.start()
+    try:
+        db.importManyFromCSV(ready, sessions=pipelineSessions, threads=importThreads, batch=importBatch,
+                             onImport=imported)
+    finally:
+        importing.clear()
+    producer.join()
+    wall = time.time() - t0
+
+    # Shards a session died on, and shards never generated.
+    lost = numShards * pipelineShardRecs - stats['recs'] - stats['failed']
+    if lost > 0:
+        print("\nERROR: import sessions failed, {0} of {1} shards were not imported.".format(
+              lost // pipelineShardRecs, numShards))
+        stats['failed'] += lost
+
+    # Also the files of sessions that died.
+    for fileName in ring:
+        if os.path.exists(fileName):
+            os.remove(fileName)
+
+    mb = stats['recs'] * recBytes / 1048576.0
+    print("")
+    genMB = stats['genBytes'] / 1048576.0
+    print("Generate: {0:.2f} sec, {1:.2f} MB/s ({2:.2f} sec waiting for a free file)".format(
+          stats['gen'], genMB / stats['gen'] if stats['gen'] > 0 else 0.0, stats['genWait']))
+    print("  Import: {0:.2f} sec (summed over sessions)".format(stats['import']))
+    print("    Wall: {0:.2f} sec, {1:.2f} MB/s".format(wall, mb / wall if wall > 0 else 0.0))
+    if stats['retries'] > 0:
+        print(" Retries: {0} shard imports".format(stats['retries']))
+    if stats['failed'] > 0:
+        print("ERROR: {0} records in shards whose import kept failing were not loaded.".format(stats['failed']))
 
 def doOne():
     """
     Insert 1 record at a time.  This is threaded to correspond to
-    to the node's number of cores.
+    to the node's number of cores.  Each thread uses its own pooled
+    connection (see poolSize in doDB()) so the inserts run in parallel
+    HANA sessions instead of queuing up on one.
     """
-    global recBytes, totalRecs, add1, workers, totalBytes
+    global recBytes, totalRecs, add1, workers, totalBytes, reconnectRetries
     recList=[]
 
     # The executor map in the while loop below requires each thread
     # to have it's copy of the record, otherwise you will get threads
     # stomping on each other's memory space.  Weird things happen.
     for i in range(workers):
-	recList.append(add1)
+        recList.append(add1)
 
     print("Using {0} threads...".format(workers))
     recs=0
+    failures=0
+    base = db.metrics.counters('add')
+
+    # Keep the same threads (and their checked out connections) for the
+    # whole load instead of building a new executor every iteration.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        while recs < totalRecs:
+            results = list(executor.map(db.add, recList)) # wait for all complete
+
+            # Only count the adds that succeeded.
+            added = sum(results)
+            if added == 0:
+                failures = failures + 1
+                if failures > reconnectRetries:
+                    print("\nERROR: Inserts keep failing, giving up.")
+                    break
+                continue
+            failures = 0
+            recs = recs + added
+            calls, rows, nbytes = db.metrics.counters('add')
+            showProgress(rows - base[1], nbytes - base[2])
+
+def doMany():
+    """
+    Insert records in batches using parameterized executemany() calls.
+    This avoids the per row round trip & commit of doOne() and does not 
+    require SYSTEM user access like doCSVImport() does.
+
+    batchSize   - Rows sent to the server per executemany() call.
+    commitEvery - Rows inserted per commit.
+
+    With a checkpointFile every commitEvery batch is loaded exactly once
+    and batches checkpointed by an earlier (interrupted) run are skipped.
+    """
+    global recBytes, totalRecs, add1, totalBytes, batchSize, commitEvery, synthData, gen, checkpointFile, loadId
+
+    print("Using batches of {0} records, commit every {1} records...".format(batchSize, commitEvery))
+    recs=0
     totalBytesAdded=0
+    skipped=0
+    n=0
+    ckpt = checkpointLog(checkpointFile) if checkpointFile else None
     while recs < totalRecs:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            results = executor.map(db.add, recList)  
-            executor.shutdown(wait=True) # wait for all complete
+        numRecs = min(commitEvery, int(math.ceil(totalRecs - recs)))
+        if synthData:
+            rows = lambda: gen.rows(numRecs) if ckpt is not None else gen.iterRows(numRecs, batchSize)
+        else:
+            rows = lambda: [add1] * numRecs if ckpt is not None else itertools.repeat(add1, numRecs)
+        added, done = loadBatch(db, ckpt, '{0}:{1}'.format(loadId or tableName, n), rows, batchSize, commitEvery)
+        if added == 0:
+                print("\nERROR: No records added, giving up.")
+                break
+
+        n = n + 1
+        if done:
+            skipped = skipped + 1
+        totalBytesAdded = totalBytesAdded + (recBytes * added)
+        recs = recs + added
+        showProgress(recs, totalBytesAdded)
+
+    if skipped > 0:
+        print("\nResumed: skipped {0} batches loaded by an earlier run".format(skipped))
+
+def doAsync():
+    """
+    Drive batched inserts from an asyncio event loop (see hanaAsync.py).
+    The operations run on one long lived thread pool with a pooled session
+    per thread, and at most asyncInFlight of them are in flight at a time.
+    Requires python 3.
+    """
+    global recBytes, totalRecs, add1, totalBytes, batchSize, asyncInFlight, asyncInterval, synthData, gen
+
+    try:
+        import hanaAsync
+    except (ImportError, SyntaxError):
+        print("ERROR: The 'async' load mode requires python 3.7 or later.")
+        return
+
+    def batches():
+        recs = 0
+        while recs < totalRecs:
+            n = min(batchSize, int(math.ceil(totalRecs - recs)))
+            if synthData:
+                yield gen.rows(n)
+            else:
+                yield [add1] * n
+            recs = recs + n
+
+    counts = {'recs': 0}
+    def added(n):
+        counts['recs'] = counts['recs'] + n
+        showProgress(counts['recs'], counts['recs'] * recBytes)
+
+    print("Using {0} threads, up to {1} batches of {2} records in flight...".format(workers, asyncInFlight, batchSize))
+    completed, failed = hanaAsync.insertRows(db, batches(), maxInFlight=asyncInFlight, workers=workers,
+                                             interval=asyncInterval, onDone=added)
+    print("")
+    print("{0} batches completed, {1} failed".format(completed, failed))
+
+def doProbe():
+    """
+    Probe only: keep the heartbeat running for probeDuration seconds so a
+    takeover can be timed without any load on the system.
+    """
+    global probeDuration
+
+    print("Probing for {0} seconds (Ctrl-C to stop)...".format(probeDuration))
+    try:
+        time.sleep(probeDuration)
+    except KeyboardInterrupt:
+        pass
+
+def doRate():
+    """
+    Rate controlled load: one rateOp operation per slot of rateSchedule,
+    issued by rateWorkers threads (see rateDriver.py).  Prints the target
+    vs. achieved rate every second and writes rateReport at the end.
+
+    Latency in the report counts from every operation's intended start, so
+    time spent queued behind a stalled server (e.g. during a takeover) is
+    included; serviceTime is the operations' own duration.
+    """
+    global recBytes, add1, batchSize, csvFn, csvNumRec, rateSchedule, rateUnit, rateOp, rateWorkers, rateBurst, rateReport
+
+    if rateOp == 'one':
+        rowsPerOp = 1
+        call = lambda: 1 if db.add(add1) else 0
+    elif rateOp == 'many':
+        rowsPerOp = batchSize
+        batch = [add1] * batchSize
+        call = lambda: db.addMany(batch, batch_size=batchSize)
+    elif rateOp == 'csv':
+        rowsPerOp = csvNumRec
+        genCSVData(csvFn, add1, csvNumRec)
+        # IMPORT statement requires absolute path to file.
+        fileName = os.getcwd() + '/' + csvFn
+        call = lambda: csvNumRec if db.importFromCSV(fileName) else 0
+    else:
+        print("ERROR: unknown rateOp '{0}'".format(rateOp))
+        return
+
+    # Operations report rows, the schedule counts rateUnit.
+    if rateUnit == 'rows':
+        unitsPerOp = rowsPerOp
+        op = call
+    elif rateUnit == 'bytes':
+        unitsPerOp = rowsPerOp * recBytes
+        op = lambda: call() * recBytes
+    elif rateUnit == 'ops':
+        unitsPerOp = 1
+        op = lambda: 1 if call() > 0 else 0
+    else:
+        print("ERROR: unknown rateUnit '{0}'".format(rateUnit))
+        return
+
+    schedule = rateDriver.rateSchedule(rateSchedule)
+    print("Rate driven '{0}' load, {1} {2} over {3:.0f} sec, {4} threads...".format(
+          rateOp, schedule.total, rateUnit, schedule.duration, rateWorkers))
 
-    	totalBytesAdded = totalBytesAdded + (recBytes * workers)
-	recs = recs + workers
-	progress = 'Added %d'%recs + '/%d'%totalRecs + ' records (%d'%totalBytesAdded + \
-	           ' bytes/%d'%totalBytes + ' GB)\r'
-	sys.stdout.write(progress)
-	sys.stdout.flush()
+    def tick(progress):
+        elapsed, target, achieved, rate = progress
+        sys.stdout.write('%6.0f sec: target %.1f %s/s, achieved %.1f%% of %.0f %s   \r' % (
+                         elapsed, rate, rateUnit, 100.0 * achieved / target if target > 0 else 100.0, target, rateUnit))
+        sys.stdout.flush()
+
+    driver = rateDriver.rateDriver(schedule, workers=rateWorkers, burst=rateBurst)
+    report = driver.run(op, unitsPerOp, onTick=tick)
+    report.update({'unit': rateUnit, 'op': rateOp, 'schedule': rateSchedule, 'workers': rateWorkers})
+
+    print("")
+    print("Target {0} {1}/s, achieved {2} {1}/s ({3}%), {4} ops, {5} failed, max lag {6} sec".format(
+          report['targetRate'], rateUnit, report['achievedRate'], report['achievedPct'],
+          report['ops'], report['failed'], report['maxLag']))
+    print("Latency from intended start p50 {0:.4f} p99 {1:.4f} sec, service time p50 {2:.4f} p99 {3:.4f} sec".format(
+          report['latency']['p50'], report['latency']['p99'], report['serviceTime']['p50'], report['serviceTime']['p99']))
+    with open(rateReport, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print("Rate report written to {0}".format(rateReport))
+
+def doWorkload():
+    """
+    Mixed OLTP traffic over workloadWorkers concurrent sessions, reusing
+    the database class's add/getRows/update/delete/getAllRows (see
+    workload.py).  Prints per operation throughput & latency.
+    """
+    global add1, batchSize, workloadMix, workloadDistribution, workloadDuration, workloadWorkers
+    global workloadPreload, workloadSchedule, workloadReport
+
+    w = workload.workload(db, add1, mix=workloadMix, distribution=workloadDistribution)
+    if workloadPreload > 0:
+        print("Preloading {0} rows...".format(workloadPreload))
+        w.preload(workloadPreload, batch_size=batchSize)
+
+    def tick(report):
+        calls = sum([m['calls'] for m in report['operations'].values()])
+        sys.stdout.write('%6.0f sec: %d operations, %d live keys   \r' % (report['elapsed'], calls, report['liveKeys']))
+        sys.stdout.flush()
+
+    schedule = rateDriver.rateSchedule(workloadSchedule) if workloadSchedule else None
+    print("Running {0} ({1} keys) on {2} sessions for {3:.0f} sec...".format(
+          workloadMix, workloadDistribution, workloadWorkers, schedule.duration if schedule else workloadDuration))
+    report = w.run(duration=workloadDuration, workers=workloadWorkers, schedule=schedule,
+                   onTick=(lambda p: tick(w.report())) if schedule else tick)
+
+    print("")
+    for op, m in sorted(report['operations'].items()):
+        print("{0:>8}: {1} ops, {2}/s, latency p50 {3:.4f} p99 {4:.4f} max {5:.4f} sec".format(
+              op, m['calls'], report['opsPerSec'][op], m['p50'], m['p99'], m['max']))
+    for op, codes in sorted(report['errors'].items()):
+        print("{0:>8}: errors {1}".format(op, codes))
+    report.update({'mix': workloadMix, 'distribution': workloadDistribution, 'workers': workloadWorkers})
+    with open(workloadReport, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print("Workload report written to {0}".format(workloadReport))
+
+def doAutoTune():
+    """
+    Batched inserts whose batchSize, sessions & commitEvery are tuned by
+    short calibration phases at the start of the load (see autoTune.py).
+    The chosen profile is printed and saved in tuneProfileFile.
+    """
+    global recBytes, totalRecs, add1, batchSize, commitEvery, synthData, gen, tuneSeconds, tunePhases, \
+           tuneSessions, tuneMaxP99, tuneProfileFile
+
+    genLock = threading.Lock()
+    def rows(n):
+        if synthData:
+            with genLock:
+                return gen.rows(n)
+        return itertools.repeat(add1, n)
+
+    def phaseDone(r):
+        print("Tune phase {0}: batch {1}, {2} sessions, commit every {3}: {4:.1f} rows/s, p99 {5:.4f} sec{6}".format(
+              len(t.phases), r['batchSize'], r['sessions'], r['commitEvery'], r['rowsPerSec'], r['p99'],
+              ', {0} failed'.format(r['failed']) if r['failed'] else ''))
+
+    # Start half way so the sessions can be tuned both ways.
+    t = autoTune.tuner(db, rows, batchSize=batchSize, sessions=max(1, tuneSessions // 2), commitEvery=commitEvery,
+                       maxSessions=tuneSessions, phaseSeconds=tuneSeconds, maxPhases=tunePhases,
+                       maxP99=tuneMaxP99, profileFile=tuneProfileFile)
+    print("Auto-tuning from batch {0}, {1} sessions, commit every {2}{3}...".format(
+          t.start['batchSize'], t.start['sessions'], t.start['commitEvery'],
+          ' (saved profile of {0})'.format(t.host) if t.saved else ''))
+    report = t.run(int(math.ceil(totalRecs)), onPhase=phaseDone,
+                   onTick=lambda recs: showProgress(recs, recs * recBytes))
+    profile = report['profile']
+    if profile is None:
+        print("ERROR: No records added, giving up.")
+        return
+    print("Tuned profile for {0}: batch {1}, {2} sessions, commit every {3} ({4:.1f} rows/s, p99 {5:.4f} sec)".format(
+          report['host'], profile['batchSize'], profile['sessions'], profile['commitEvery'],
+          profile['rowsPerSec'], profile['p99']))
+    if tuneProfileFile:
+        print("Profile saved to {0}".format(tuneProfileFile))
+    if report['main'] is not None:
+        showProgress(report['rows'], report['rows'] * recBytes)
+        print("\nLoaded the remaining rows at {0:.1f} rows/s".format(report['main']['rowsPerSec']))
+
+def planPartitions():
+    """
+    Make sure the load fits HANA's limit of 2 billion rows per partition:
+    raise the number of hash partitions of partitionSpec, or hash
+    partition an unpartitioned table on its first column.  The row count
+    is estimated from totalBytes before the record exists.
+    """
+    global partitionSpec
+
+    if synthData:
+        spec = dataSpec.get('*', {})
+        rowBytes = numCols * (spec.get('minLen', columnBytes) + spec.get('maxLen', columnBytes)) / 2.0
+    else:
+        rowBytes = numCols * columnBytes
+    needed = partitionsNeeded(totalBytes / max(1.0, rowBytes))
+    if needed < 2:
+        return
+
+    if partitionSpec is None:
+        m = re.search(r'\(\s*"?(\w+)', createStmt)
+        if m is None:
+            print("WARNING: the load needs {0} partitions, set partitionSpec".format(needed))
+            return
+        partitionSpec = {'type': 'HASH', 'columns': [m.group(1)], 'partitions': needed}
+        print("Load exceeds 2 billion rows, hash partitioning on {0} into {1} partitions".format(m.group(1), needed))
+    elif partitionSpec.get('type', 'HASH').upper() == 'HASH' and 0 < partitionSpec.get('partitions', 0) < needed:
+        print("Load exceeds 2 billion rows per partition, using {0} hash partitions".format(needed))
+        partitionSpec = dict(partitionSpec, partitions=needed)
+    if loadMode != 'partition' and not synthData:
+        print("WARNING: repeated records all hash to one partition, use the 'partition' load mode")
+
+def partitionKeys(partitions):
+    """
+    Return (key columns, key(n)) for the partition mode.  key columns are
+    (position, True if text) pairs and key(n) is the n-th unique key.  For
+    numeric RANGE partitions consecutive keys are dealt out over the
+    ranges (the n-th key is in range n % number of ranges), so every round
+    feeds all partitions; otherwise the key is n.
+    """
+    info = db.getColumnInfo()
+    names = [c[0] for c in info]
+    types = dict([(c[0], c[1]) for c in info])
+    if partitions:
+        columns = [c for c in partitions[0]['columns'] if c in names]
+    else:
+        columns = [names[0]]
+    keyColumns = [(names.index(c), types[c] in TEXTTYPES) for c in columns]
+
+    lows = []
+    if partitions and partitions[0]['type'] == 'RANGE' and types[columns[0]] in INTTYPES + DECTYPES + FLOATTYPES:
+        lows = [int(float(p['low'])) for p in partitions if p['low'] is not None]
+    if lows:
+        return keyColumns, lambda n: lows[n % len(lows)] + n // len(lows)
+    return keyColumns, lambda n: n
+
+def keyedRecord(n, keyColumns, key):
+    """
+    add1 with the key columns set to key(n): the number itself for
+    numeric columns, otherwise written over the start of the record's text
+    (same length, so recBytes stays right).
+    """
+    row = list(add1)
+    k = key(n)
+    for i, isText in keyColumns:
+        if isText:
+            text = str(k)
+            row[i] = text + row[i][len(text):]
+        else:
+            row[i] = k
+    return row
+
+def importPartitioned(rows):
+    """
+    Write rows into one CSV shard per partition and import the shards
+    concurrently.  Returns the number of rows imported.
+    """
+    base, ext = os.path.splitext(csvFn)
+    shards = {}
+    for part, partRows in db.splitByPartition(rows).items():
+        # IMPORT statement requires absolute path to file.
+        fileName = os.getcwd() + '/' + '{0}.p{1}{2}'.format(base, part, ext)
+        csvWriter.writeCSVChunks(fileName, [db.toCSV(partRows)])
+        shards[fileName] = len(partRows)
+    imported = db.importManyFromCSV(sorted(shards.keys()), sessions=partitionSessions,
+                                    threads=importThreads, batch=importBatch)
+    return sum([shards[f] for f in imported])
+
+def doPartitioned():
+    """
+    Partition-parallel load: rows get unique keys in the partitioning
+    columns, are routed to their partitions (database.splitByPartition())
+    and the partitions are loaded concurrently over partitionSessions
+    sessions, commitEvery rows per partition per round.  With partitionCSV
+    every round writes one CSV shard per partition and imports the shards
+    concurrently instead.
+
+    HASH partitions are picked by the server, so rows are bucketed by a
+    client side hash instead (see database.partitionOf()).
+    """
+    global recBytes, totalRecs, batchSize, commitEvery, partitionSessions, partitionCSV
+
+    partitions = db.getPartitions()
+    numParts = max(1, len(partitions))
+    print("Loading {0} partitions ({1}) over {2} sessions...".format(
+          numParts, partitions[0]['type'] if partitions else 'unpartitioned', partitionSessions))
+    if totalRecs / numParts > MAX_PARTITION_ROWS:
+        print("WARNING: about {0:.0f} rows per partition exceed HANA's limit of {1}".format(
+              totalRecs / numParts, MAX_PARTITION_ROWS))
+
+    keyColumns, key = partitionKeys(partitions)
+    recs = 0
+    added = 0
+    while recs < totalRecs:
+        numRecs = min(commitEvery * numParts, int(math.ceil(totalRecs - recs)))
+        rows = [keyedRecord(n, keyColumns, key) for n in range(recs, recs + numRecs)]
+        if partitionCSV:
+            n = importPartitioned(rows)
+        else:
+            n = db.addManyPartitioned(rows, batch_size=batchSize, commit_every=commitEvery, sessions=partitionSessions)
+        if n == 0:
+            print("\nERROR: No records added, giving up.")
+            break
+        recs = recs + numRecs
+        added = added + n
+        showProgress(added, added * recBytes)
+
+    partitions = db.getPartitions(refresh=True)
+    if partitions and partitions[0]['rows'] is not None:
+        print("\nRows per partition: {0}".format(', '.join(['{0}:{1}'.format(p['partId'], p['rows']) for p in partitions])))
+
+def percentile(values, pct):
+    """
+    Return the pct (0-100) percentile of a list of values.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+def loadSlice(num, numRecs, conf, results):
+    """
+    Worker process for doProcesses().  Opens its own database connection,
+    generates numRecs rows and loads them commitEvery rows at a time.
+    After every batch (rows, bytes, seconds) is put on the results queue.
+
+    conf holds the parent's settings so this also works when the process
+    is spawned instead of forked.
+    """
+    wdb = database(conf['address'], conf['port'], conf['tableName'], conf['createStmt'],
+                   conf['user'], conf['passwd'], saccess=True, debug=False,
+                   commitMode=conf['commitMode'], commitRows=conf['commitRows'],
+                   commitInterval=conf['commitInterval'], schemaCacheFile=conf['schemaCacheFile'],
+                   hosts=conf['hosts'], reconnectRetries=conf['reconnectRetries'],
+                   reconnectBackoff=conf['reconnectBackoff'])
+    ckpt = checkpointLog(conf['checkpointFile']) if conf['checkpointFile'] else None
+    g = None
+    if conf['synthData']:
+        g = dataGenerator.dataGenerator(wdb.getColumnInfo(), conf['dataSpec'], seed=conf['seed'] + num)
+
+    base, ext = os.path.splitext(conf['csvFn'])
+    fileName = os.getcwd() + '/' + '{0}.p{1}{2}'.format(base, num, ext)
+    loaded = 0
+    k = 0
+    while loaded < numRecs:
+        n = min(conf['commitEvery'], numRecs - loaded)
+        batchId = '{0}:p{1}:{2}'.format(conf['loadId'], num, k)
+        k = k + 1
+        if ckpt is not None and ckpt.rows(batchId) is not None:
+            loaded = loaded + ckpt.rows(batchId)
+            continue
+        if conf['processMode'] == 'csv':
+            if g is not None:
+                size, secs = csvWriter.writeCSVChunks(fileName, g.iterCSV(n, conf['batchSize']))
+            else:
+                size, secs = csvWriter.writeCSV(fileName, conf['record'], n)
+            t0 = time.time()
+            added = n if wdb.importFromCSV(fileName) else 0
+            secs = time.time() - t0
+            size = size * added // n
+            if added > 0 and ckpt is not None:
+                ckpt.record(batchId, added)
+        else:
+            if g is not None:
+                rows = lambda: g.rows(n) if ckpt is not None else g.iterRows(n, conf['batchSize'])
+            else:
+                rows = lambda: [conf['record']] * n if ckpt is not None else itertools.repeat(conf['record'], n)
+            t0 = time.time()
+            added, done = loadBatch(wdb, ckpt, batchId, rows, conf['batchSize'], conf['commitEvery'])
+            secs = time.time() - t0
+            size = added * conf['recBytes']
+
+        results.put((added, size, secs))
+        if added == 0:
+            break
+        loaded = loaded + added
+
+    if os.path.exists(fileName):
+        os.remove(fileName)
+    wdb.close()
+    return loaded
+
+def processConf():
+    """
+    The settings loadSlice() worker processes need, as a dictionary.
+    """
+    return {'address': address, 'port': port, 'tableName': tableName, 'createStmt': tableCreateStmt(),
+            'user': user, 'passwd': passwd, 'processMode': processMode, 'batchSize': batchSize,
+            'commitEvery': commitEvery, 'synthData': synthData, 'dataSpec': dataSpec,
+            'seed': int(time.time()), 'record': add1, 'recBytes': recBytes, 'csvFn': csvFn,
+            'commitMode': commitMode, 'commitRows': commitRows, 'commitInterval': commitInterval,
+            'schemaCacheFile': schemaCacheFile, 'hosts': hosts, 'reconnectRetries': reconnectRetries,
+            'reconnectBackoff': reconnectBackoff, 'checkpointFile': checkpointFile, 'loadId': loadId or tableName}
+
+def doProcesses():
+    """
+    Load with loadProcesses worker processes instead of threads so data
+    generation & statement building are not all stuck behind one GIL.
+    Each process has its own connection and loads its own slice of the
+    rows (see loadSlice()).  This process only aggregates the rows, bytes
+    and per batch latency the workers report.
+    """
+    global recBytes, totalRecs, totalBytes, add1, loadProcesses, processMode
+
+    conf = processConf()
+
+    perProcess = int(math.ceil(totalRecs / loadProcesses))
+    print("Using {0} processes, {1} records each ({2})...".format(loadProcesses, perProcess, processMode))
+
+    manager = multiprocessing.Manager()
+    results = manager.Queue()
+    recs = 0
+    totalBytesAdded = 0
+    latencies = []
+    t0 = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=loadProcesses) as executor:
+        futures = [executor.submit(loadSlice, i, perProcess, conf, results) for i in range(loadProcesses)]
+        while True:
+            running = not all([f.done() for f in futures])
+            while not results.empty():
+                added, size, secs = results.get()
+                recs = recs + added
+                totalBytesAdded = totalBytesAdded + size
+                latencies.append(secs)
+            showProgress(recs, totalBytesAdded)
+            if not running:
+                break
+            time.sleep(0.5)
+
+        for f in futures:
+            try:
+                f.result()
+            except Exception as e:
+                print("\nERROR: load process failed: {0}\n{1}".format(e, traceback.format_exc()))
+
+    secs = time.time() - t0
+    print("")
+    print("{0:.0f} records/s, {1:.2f} MB/s, batch latency p50 {2:.3f} sec, p99 {3:.3f} sec".format(
+          recs / secs, totalBytesAdded / 1048576.0 / secs, percentile(latencies, 50), percentile(latencies, 99)))
+
+def makeRecord():
+    """
+    Return a new record (numCols columns of columnBytes random letters).
+    """
+    global numCols, columnBytes
+
+    colStr = ''.join(random.choice(string.ascii_letters) for _ in range(columnBytes))
+    return [colStr] * numCols
 
 def createRecord():
     """
     This function creates dummy fill data for each column & sets up variables
     needed for the rest of the script.
 
+    With synthData it sets up the data generator from the table's columns
+    and the record size is the generator's estimated average row size.
     """
-    global recBytes, totalRecs, add1, doImport, numCols, columnBytes
+    global recBytes, totalRecs, add1, doImport, numCols, columnBytes, synthData, dataSpec, gen
 
-    colStr = ''.join(random.choice(string.ascii_letters) for _ in range(columnBytes))
-    recBytes = len(colStr) * numCols
-    print('Record size: {0} bytes'.format(recBytes))
+    add1.extend(makeRecord())
+    recBytes = sum([len(c) for c in add1])
+    if synthData:
+        gen = dataGenerator.dataGenerator(db.getColumnInfo(), dataSpec)
+        recBytes = gen.rowBytes()
+        print('Record size: {0} bytes (estimated average)'.format(recBytes))
+    else:
+        print('Record size: {0} bytes'.format(recBytes))
     totalRecs = float(totalBytes) / float(recBytes)
 
     if doImport:
-    	totalRecs = totalRecs + csvNumRec
-	overflow = totalRecs % csvNumRec
+        totalRecs = totalRecs + csvNumRec
+        overflow = totalRecs % csvNumRec
         totalRecs = totalRecs - overflow
 
-    for i in range(numCols):
-	add1.append(colStr)
-
 def doDB():
     """
     Create the database handle.  User needs to supply the SQL statement as the 
@@ -179,8 +1248,8 @@ def doDB():
     (i.e., it's resuable). 
     
     Parameter:
-	address - right now only tested on the master node
-	   port - Figure out who the master is and use the port # 30015
+        address - right now only tested on the master node
+           port - Figure out who the master is and use the port # 30015
                   (see hanaDatase.py for info port # is calcuated.)
       tableName - Have to provide the table name.
      createStmt - The actual SQL statement to create the table.
@@ -191,32 +1260,132 @@ def doDB():
         saccess - If you use SYSTEM user set this to true.
           debug - Do not turn on debug unless you absolutely have to.  
                   It generates a lot fo info.
+       poolSize - One pooled connection per worker thread/CSV shard.
+     commitMode - See commitMode above.
+schemaCacheFile - See schemaCacheFile above.
+          hosts - Failover candidates, see hosts above.
+  partitionSpec - See partitionSpec above.
     """
     global db
 
     try:
-        db = database(address, port, tableName, createStmt, user, passwd, saccess=True, debug=False)
+        db = database(address, port, tableName, tableCreateStmt(), user, passwd, saccess=True, debug=False,
+                      poolSize=max(workers, csvShards, pipelineSessions, rateWorkers, workloadWorkers, partitionSessions,
+                               tuneSessions),
+                      commitMode=commitMode, commitRows=commitRows, commitInterval=commitInterval,
+                      schemaCacheFile=schemaCacheFile, hosts=hosts,
+                      reconnectRetries=reconnectRetries, reconnectBackoff=reconnectBackoff,
+                      partitionSpec=partitionSpec)
     except Exception as e:
         print("ERROR: {0}\\n{1}".format(e, traceback.format_exc()))
-	exit
+        exit
    
-if __name__ == "__main__":
-    doDB()
-    doImport = True
-    createRecord()
-    genCSVData(csvFn, add1, csvNumRec)
+def printMetrics():
+    """
+    Print every operation's call/row counts, throughput and latency.
+    """
+    snap = db.getMetrics()
+    for op, m in sorted(snap['operations'].items()):
+        print("{0:>10}: {1} calls, {2} rows, {3:.2f} MB/s, latency p50 {4:.4f} p99 {5:.4f} max {6:.4f} sec".format(
+              op, m['calls'], m['rows'], m['mbPerSec'], m['p50'], m['p99'], m['max']))
+    for op, codes in sorted(snap['errors'].items()):
+        print("{0:>10}: errors {1}".format(op, codes))
 
-    t0 = time.time()
+def doLoad():
+    """
+    Run the load of loadMode.
+    """
+    global workers
 
     # TODO: Right now CSV loading is the default as it is 8 times faster
     #       than adding a record at a time.  Need to add script cmdline 
     #       arguments. 
-    if doImport:
-	workers = 1
-	doCSVImport()
+    if loadMode == 'csv':
+        workers = 1
+        doCSVImport()
+    elif loadMode == 'parallelcsv':
+        doParallelCSVImport()
+    elif loadMode == 'pipeline':
+        doPipelineImport()
+    elif loadMode == 'many':
+        doMany()
+    elif loadMode == 'process':
+        doProcesses()
+    elif loadMode == 'async':
+        doAsync()
+    elif loadMode == 'probe':
+        doProbe()
+    elif loadMode == 'rate':
+        doRate()
+    elif loadMode == 'workload':
+        doWorkload()
+    elif loadMode == 'partition':
+        doPartitioned()
+    elif loadMode == 'autotune':
+        doAutoTune()
+    else:
+        doOne()
+
+def runLoad():
+    """
+    Run the load described by the settings above: create the table, load
+    it with loadMode and print the summary.  Returns the elapsed seconds,
+    the rows written, the bulk load timings (or None) and the metrics
+    snapshot as a dictionary.
+    """
+    global doImport
+
+    deriveDefaults()
+    planPartitions()
+    doDB()
+    doImport = (loadMode == 'csv')
+    createRecord()
+    if doImport and csvStaging != 'fifo':
+        genCSVData(csvFn, add1, csvNumRec)
+
+    exporter = None
+    if metricsJSON or metricsProm:
+        exporter = hanaMetrics.exporter(db.metrics, metricsInterval, metricsJSON, metricsProm,
+                                        labels={'table': tableName, 'mode': loadMode}).start()
+
+    probe = None
+    if probeInterval > 0 or loadMode == 'probe':
+        probe = haProbe.haProbe(db, interval=probeInterval or 0.2).start()
+
+    t0 = time.time()
+
+    bulk = None
+    if deferMerge:
+        with db.bulkLoad(noDeltaLog=noDeltaLog) as bulk:
+            doLoad()
     else:
-	doOne()
+        doLoad()
+
+    # Commit whatever the commit policy still has pending.
+    db.commit()
+    if probe is not None:
+        probe.stop()
 
     t1 = time.time() - t0
     print("")
     print("Elapsed time: {0:.2f} sec".format(t1))
+    if commitMode != 'auto':
+        print("Commits: {0}".format(db.getCommitStats()))
+    if bulk is not None:
+        print("Bulk load: load {0:.2f} sec, merge {1:.2f} sec{2}, total {3:.2f} sec".format(
+              bulk['load'], bulk['merge'], '' if bulk['merged'] else ' (not merged)', bulk['total']))
+    printMetrics()
+    if probe is not None:
+        probe.report()
+        probe.writeCSV(probeCSV)
+        probe.writeJSON(probeJSON)
+        print("Probe timeline written to {0} and {1}".format(probeCSV, probeJSON))
+    if exporter is not None:
+        exporter.stop()
+
+    snap = db.getMetrics()
+    written = sum([snap['operations'].get(op, {}).get('rows', 0) for op in ('add', 'addMany', 'import')])
+    return {'elapsed': round(t1, 3), 'rows': written, 'bulk': bulk, 'metrics': snap}
+
+if __name__ == "__main__":
+    runLoad()
@@ -0,0 +1,250 @@
+#  Rate controlled load driver.
+#
+#  The other load modes run flat out until totalBytes is loaded.  HA tests
+#  need sustained, controlled pressure instead ("20 MB/s of inserts for 2
+#  hours", "500 ops/s"), so this driver issues operations on a schedule:
+#
+#       rateSchedule - target rate over time: steps & linear ramps, in
+#                      ops, rows or bytes per second.  The load ends with
+#                      the last phase.
+#        tokenBucket - hands out the intended start time of every
+#                      operation (virtual scheduling, i.e. a leaky bucket),
+#                      optionally letting a burst go ahead of schedule.
+#         rateDriver - worker threads running one operation per bucket
+#                      slot, accounting achieved vs. target rate per second.
+#
+#  Latency is measured from an operation's intended start, not from when a
+#  worker got around to it.  When the server stalls the slots keep coming
+#  due, so the time operations spent queued behind the stall is counted
+#  (no coordinated omission); the service time is reported separately.
+#
+#       schedule = rateSchedule([(60, 0, 500), (7200, 500)])
+#       report = rateDriver(schedule, workers=8).run(lambda: 1 if db.add(row) else 0, 1)
+#
+import math
+import threading
+import time
+import traceback
+import hanaMetrics
+
+class rateSchedule:
+    def __init__(self, phases):
+        """
+        Parameter:
+            phases - List of (seconds, rate) steps and (seconds, fromRate,
+                     toRate) linear ramps, run one after the other.  Rates
+                     are units (ops, rows or bytes) per second.
+        """
+        if not phases:
+            raise ValueError("At least one phase must be provided.")
+
+        # [start, seconds, fromRate, toRate, units before the phase]
+        self.phases = []
+        start = 0.0
+        units = 0.0
+        for phase in phases:
+            if len(phase) == 2:
+                seconds, r0, r1 = phase[0], phase[1], phase[1]
+            else:
+                seconds, r0, r1 = phase
+            if seconds <= 0 or r0 < 0 or r1 < 0:
+                raise ValueError("Invalid phase {0}: seconds must be > 0, rates >= 0.".format(phase))
+            self.phases.append([start, float(seconds), float(r0), float(r1), units])
+            start = start + seconds
+            units = units + (r0 + r1) * seconds / 2.0
+        self.duration = start
+        self.total = units
+
+    def rate(self, t):
+        """
+        Target rate t seconds into the schedule.
+        """
+        for start, seconds, r0, r1, u0 in self.phases:
+            if t < start + seconds:
+                return r0 + (r1 - r0) * max(0.0, t - start) / seconds
+        return 0.0
+
+    def units(self, t):
+        """
+        Target units sent by t seconds into the schedule.
+        """
+        for start, seconds, r0, r1, u0 in self.phases:
+            if t < start + seconds:
+                dt = max(0.0, t - start)
+                return u0 + r0 * dt + (r1 - r0) * dt * dt / (2.0 * seconds)
+        return self.total
+
+    def timeFor(self, units):
+        """
+        When (seconds into the schedule) the target reaches units, or None
+        if it never does.
+        """
+        for start, seconds, r0, r1, u0 in self.phases:
+            phaseUnits = (r0 + r1) * seconds / 2.0
+            if units < u0 + phaseUnits:
+                # Solve r0*dt + a*dt^2/2 = units - u0 (a = ramp slope) in the
+                # form that stays exact for flat steps (a = 0).
+                du = max(0.0, units - u0)
+                a = (r1 - r0) / seconds
+                root = math.sqrt(max(0.0, r0 * r0 + 2.0 * a * du))
+                if r0 + root == 0:
+                    return start
+                return start + 2.0 * du / (r0 + root)
+        return None
+
+class tokenBucket:
+    def __init__(self, schedule, burst=0):
+        """
+        Thread safe scheduler of operations along a rateSchedule.
+
+        Parameter:
+          schedule - rateSchedule.
+             burst - Units an operation may start ahead of its intended
+                     time (e.g. to catch up batches in one go).  0 keeps
+                     strictly to the schedule.
+        """
+        self.schedule = schedule
+        self.burst = burst
+        self.reserved = 0.0
+        self.start = None
+        self.lock = threading.Lock()
+
+    def begin(self, start=None):
+        self.start = time.time() if start is None else start
+
+    def reserve(self, units):
+        """
+        Reserve the next units.  Returns (intended start, earliest start)
+        as absolute times, or None once the schedule is over.
+        """
+        with self.lock:
+            due = self.reserved
+            intended = self.schedule.timeFor(due)
+            if intended is None or time.time() >= self.start + self.schedule.duration:
+                return None
+            self.reserved = due + units
+        earliest = self.schedule.timeFor(max(0.0, due - self.burst))
+        return self.start + intended, self.start + earliest
+
+class rateDriver:
+    def __init__(self, schedule, workers=1, burst=0):
+        """
+        Parameter:
+          schedule - rateSchedule to follow.
+           workers - Threads issuing operations.  Give the database a pool
+                     of at least as many sessions.  Too few workers for the
+                     target shows up as lag & a missed target.
+             burst - See tokenBucket.
+        """
+        if workers < 1:
+            raise ValueError("workers must be greater than 0.")
+
+        self.schedule = schedule
+        self.workers = workers
+        self.bucket = tokenBucket(schedule, burst)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.latency = hanaMetrics.histogram()
+        self.service = hanaMetrics.histogram()
+        self.achieved = 0
+        self.ops = 0
+        self.failed = 0
+        self.maxLag = 0.0
+        # second -> [units, ops, failed]
+        self.seconds = {}
+        self.start = None
+        self.end = None
+
+    def __record(self, intended, t0, t1, done):
+        with self.lock:
+            self.latency.record(t1 - min(intended, t0))
+            self.service.record(t1 - t0)
+            self.maxLag = max(self.maxLag, t0 - intended)
+            entry = self.seconds.setdefault(int(t1 - self.start), [0, 0, 0])
+            if done:
+                self.achieved = self.achieved + done
+                self.ops = self.ops + 1
+                entry[0] = entry[0] + done
+                entry[1] = entry[1] + 1
+            else:
+                self.failed = self.failed + 1
+                entry[2] = entry[2] + 1
+
+    def __worker(self, op, unitsPerOp):
+        while not self.stopped.is_set():
+            slot = self.bucket.reserve(unitsPerOp)
+            if slot is None:
+                break
+            intended, earliest = slot
+            wait = earliest - time.time()
+            if wait > 0 and self.stopped.wait(wait):
+                break
+            t0 = time.time()
+            try:
+                done = op()
+            except Exception as e:
+                print("ERROR: rate driven operation failed: {0}\n{1}".format(e, traceback.format_exc()))
+                done = 0
+            self.__record(intended, t0, time.time(), done)
+
+    def run(self, op, unitsPerOp, onTick=None, tick=1.0):
+        """
+        Run op (a function returning the units it completed, 0 if it failed)
+        once per unitsPerOp units of schedule until the schedule ends or
+        stop() is called.  onTick(progress()) is called every tick seconds.
+
+        Returns summary().
+        """
+        self.start = time.time()
+        self.bucket.begin(self.start)
+        threads = [threading.Thread(target=self.__worker, args=(op, unitsPerOp)) for i in range(self.workers)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            while any([t.is_alive() for t in threads]):
+                time.sleep(tick)
+                if onTick is not None:
+                    onTick(self.progress())
+        except KeyboardInterrupt:
+            print("\nStopping the rate driven load...")
+            self.stop()
+        for t in threads:
+            t.join()
+        self.end = time.time()
+        return self.summary()
+
+    def stop(self):
+        self.stopped.set()
+
+    def progress(self):
+        """
+        Return (elapsed seconds, target units, achieved units, target rate
+        now) so far.
+        """
+        elapsed = min((self.end or time.time()) - self.start, self.schedule.duration)
+        with self.lock:
+            achieved = self.achieved
+        return elapsed, self.schedule.units(elapsed), achieved, self.schedule.rate(elapsed)
+
+    def summary(self):
+        """
+        Return target vs. achieved units & rate, operation counts, the
+        worst lag behind schedule, latency from intended start and service
+        time (see hanaMetrics.histogram), and the per second timeline.
+        """
+        elapsed, target, achieved, rate = self.progress()
+        with self.lock:
+            timeline = []
+            for s in range(int(math.ceil(elapsed))):
+                units, ops, failed = self.seconds.get(s, [0, 0, 0])
+                timeline.append({'second': s, 'target': round(self.schedule.units(s + 1) - self.schedule.units(s), 3),
+                                 'achieved': units, 'ops': ops, 'failed': failed})
+            return {'elapsed': round(elapsed, 3), 'duration': self.schedule.duration,
+                    'targetUnits': round(target, 3), 'achievedUnits': achieved,
+                    'targetRate': round(target / elapsed, 3) if elapsed > 0 else 0.0,
+                    'achievedRate': round(achieved / elapsed, 3) if elapsed > 0 else 0.0,
+                    'achievedPct': round(100.0 * achieved / target, 2) if target > 0 else 0.0,
+                    'ops': self.ops, 'failed': self.failed, 'maxLag': round(self.maxLag, 6),
+                    'latency': self.latency.snapshot(), 'serviceTime': self.service.snapshot(),
+                    'timeline': timeline}
@@ -0,0 +1,367 @@
+#  Mixed OLTP workload for the SAP/HANA DB database class.
+#
+#  The loaders only insert.  To reproduce customer issues this runs a mix
+#  of inserts, point reads, updates, deletes and full scans over many
+#  concurrent sessions, all through the database class's own operations
+#  (add, getRows, update, delete, getAllRows):
+#
+#       mix          - operation ratios, e.g. {'insert': 60, 'read': 20,
+#                      'update': 15, 'delete': 5}
+#       distribution - how the key of a read/update/delete is chosen among
+#                      the rows this workload wrote: 'uniform', 'zipfian'
+#                      (a few hot keys, the oldest the hottest) or 'latest'
+#                      (zipfian over the most recently inserted keys).
+#
+#  Every row carries its key in the key column (the table's first column
+#  by default).  Give that column a PRIMARY KEY so updates & deletes are
+#  key lookups instead of full row comparisons.  Per operation latency &
+#  throughput are kept in the workload's own hanaMetrics registry.
+#
+#       w = workload(db, row, mix={'insert': 60, 'read': 20, 'update': 15, 'delete': 5})
+#       w.preload(10000)
+#       w.run(duration=300, workers=16)
+#       print(w.report())
+#
+import random
+import threading
+import time
+import traceback
+import hanaMetrics
+import rateDriver
+
+OPERATIONS = ('insert', 'read', 'update', 'delete', 'scan')
+
+class zipfian:
+    def __init__(self, theta=0.99):
+        """
+        Zipfian distributed item numbers over a growing number of items
+        (Gray et al., "Quickly generating billion-record synthetic
+        databases").  Item 0 is the most popular.  zeta(n) is extended
+        incrementally as items are added instead of being recomputed.
+        """
+        if not 0 < theta < 1:
+            raise ValueError("theta must be between 0 and 1.")
+
+        self.theta = theta
+        self.alpha = 1.0 / (1.0 - theta)
+        self.zeta2 = 1.0 + 0.5 ** theta
+        self.n = 0
+        self.zetan = 0.0
+
+    def next(self, n, rng):
+        """
+        Return an item number in [0, n).
+        """
+        if n <= 1:
+            return 0
+        while self.n < n:
+            self.n = self.n + 1
+            self.zetan = self.zetan + 1.0 / self.n ** self.theta
+        u = rng.random()
+        uz = u * self.zetan
+        if uz < 1.0:
+            return 0
+        if uz < self.zeta2:
+            return 1
+        eta = (1.0 - (2.0 / n) ** (1.0 - self.theta)) / (1.0 - self.zeta2 / self.zetan)
+        return min(n - 1, int(n * (eta * u - eta + 1.0) ** self.alpha))
+
+class keySpace:
+    def __init__(self, distribution='uniform', theta=0.99, seed=None):
+        """
+        Keys written by the workload (0, 1, 2, ... in insert order), which
+        of them still exist, their row version, and which are in use by a
+        session right now so two sessions never update/delete the same
+        row at once.
+
+        Parameter:
+        distribution - 'uniform', 'zipfian' or 'latest'.
+               theta - Zipfian skew (0.99 is YCSB's default).
+                seed - Random seed for repeatable key sequences.
+        """
+        if distribution not in ('uniform', 'zipfian', 'latest'):
+            raise ValueError("Unknown distribution \"{0}\".".format(distribution))
+
+        self.distribution = distribution
+        self.zipf = zipfian(theta) if distribution != 'uniform' else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.next = 0
+        # key -> row version of the rows that exist
+        self.versions = {}
+        self.busy = set()
+
+    def newKey(self):
+        """
+        Allocate the key of a row about to be inserted.
+        """
+        with self.lock:
+            key = self.next
+            self.next = self.next + 1
+            self.busy.add(key)
+            return key
+
+    def claim(self, tries=16):
+        """
+        Pick an existing key that no other session is using, following the
+        distribution.  Returns (key, version) or None if none was found.
+        """
+        with self.lock:
+            n = self.next
+            if n == 0:
+                return None
+            for i in range(tries):
+                if self.distribution == 'uniform':
+                    key = self.random.randrange(n)
+                elif self.distribution == 'zipfian':
+                    key = self.zipf.next(n, self.random)
+                else:
+                    key = n - 1 - self.zipf.next(n, self.random)
+                if key in self.versions and key not in self.busy:
+                    self.busy.add(key)
+                    return key, self.versions[key]
+            return None
+
+    def release(self, key, version=None, exists=True):
+        """
+        Give a claimed (or new) key back.  version is the row version now
+        stored, exists False if the row is gone (deleted, or its insert
+        failed).
+        """
+        with self.lock:
+            self.busy.discard(key)
+            if not exists:
+                self.versions.pop(key, None)
+            elif version is not None:
+                self.versions[key] = version
+
+    def size(self):
+        with self.lock:
+            return len(self.versions)
+
+class workload:
+    def __init__(self, db, template, mix=None, distribution='zipfian', keyColumn=None, theta=0.99, seed=None,
+                 keyPrefix=None):
+        """
+        Parameter:
+                  db - database instance.  Give it a poolSize of at least
+                       the number of workers.
+            template - Row data the workload's rows are made from.  The key
+                       column gets the row's key, the next column the row
+                       version (so updates change the row).
+                 mix - Dictionary of operation -> ratio over 'insert',
+                       'read', 'update', 'delete' and 'scan' (getAllRows(),
+                       expensive on big tables).  Defaults to 60% insert,
+                       20% read, 15% update, 5% delete.
+        distribution - Key distribution, see keySpace.
+           keyColumn - Column holding the key.  Defaults to the table's
+                       first column.
+           keyPrefix - Prefix of text keys.  Defaults to one unique to this
+                       run, so runs against the same table do not collide.
+        """
+        if mix is None:
+            mix = {'insert': 60, 'read': 20, 'update': 15, 'delete': 5}
+        for op in mix:
+            if op not in OPERATIONS:
+                raise ValueError("Unknown operation \"{0}\".".format(op))
+        if sum(mix.values()) <= 0:
+            raise ValueError("mix ratios must add up to more than 0.")
+
+        self.db = db
+        self.template = list(template)
+        columns = db.getColumnNames()
+        self.keyColumn = (keyColumn or columns[0]).upper()
+        self.keyIndex = columns.index(self.keyColumn)
+        self.versionIndex = (self.keyIndex + 1) % len(columns)
+        if keyPrefix is None:
+            keyPrefix = 'W{0:x}-'.format(int(time.time() * 1000) % 0x100000000)
+        self.keyPrefix = keyPrefix
+        self.keys = keySpace(distribution, theta, seed)
+        self.random = random.Random(seed)
+        self.randomLock = threading.Lock()
+        # Cumulative weights for picking an operation.
+        self.mix = []
+        total = 0
+        for op in OPERATIONS:
+            if mix.get(op, 0) > 0:
+                total = total + mix[op]
+                self.mix.append((total, op))
+        self.metrics = hanaMetrics.metrics()
+        self.skipped = dict([(op, 0) for op in OPERATIONS])
+        self.stopped = threading.Event()
+
+    def makeRow(self, key, version=0):
+        """
+        The workload's row for key at version.  Text values get the key
+        (keyPrefix + key) or the version prefixed (keeping the template value's
+        length), other columns the number itself.
+        """
+        row = list(self.template)
+        if isinstance(row[self.keyIndex], hanaMetrics.textTypes):
+            row[self.keyIndex] = '{0}{1}'.format(self.keyPrefix, key)
+        else:
+            row[self.keyIndex] = key
+        if self.versionIndex != self.keyIndex:
+            value = row[self.versionIndex]
+            if isinstance(value, hanaMetrics.textTypes):
+                row[self.versionIndex] = ('{0}:{1}'.format(version, value))[:max(len(value), len(str(version)) + 1)]
+            else:
+                row[self.versionIndex] = version
+        return row
+
+    def __chooseOp(self):
+        with self.randomLock:
+            r = self.random.random() * self.mix[-1][0]
+        for weight, op in self.mix:
+            if r < weight:
+                return op
+        return self.mix[-1][1]
+
+    def __skip(self, op):
+        with self.randomLock:
+            self.skipped[op] = self.skipped[op] + 1
+        return False
+
+    def __timed(self, op, func, rows=1, nbytes=0):
+        t0 = time.time()
+        try:
+            ok = func()
+        except Exception as e:
+            self.metrics.error(op, e)
+            print("ERROR: workload {0} failed: {1}\n{2}".format(op, e, traceback.format_exc()))
+            return False
+        if ok:
+            self.metrics.observe(op, time.time() - t0, rows, nbytes)
+        else:
+            self.metrics.error(op, RuntimeError(op))
+        return ok
+
+    def insert(self):
+        key = self.keys.newKey()
+        row = self.makeRow(key)
+        ok = self.__timed('insert', lambda: self.db.add(row), 1, hanaMetrics.rowBytes(row))
+        self.keys.release(key, 0, exists=ok)
+        return ok
+
+    def read(self):
+        claimed = self.keys.claim()
+        if claimed is None:
+            return self.__skip('read')
+        key, version = claimed
+        where = '"{0}" = ?'.format(self.keyColumn)
+        try:
+            return self.__timed('read', lambda: self.db.getRows(where, [self.makeRow(key)[self.keyIndex]]) is not None)
+        finally:
+            self.keys.release(key)
+
+    def update(self):
+        claimed = self.keys.claim()
+        if claimed is None:
+            return self.__skip('update')
+        key, version = claimed
+        newRow = self.makeRow(key, version + 1)
+        ok = False
+        try:
+            ok = self.__timed('update', lambda: self.db.update(self.makeRow(key, version), newRow),
+                              1, hanaMetrics.rowBytes(newRow))
+        finally:
+            self.keys.release(key, version + 1 if ok else version)
+        return ok
+
+    def delete(self):
+        claimed = self.keys.claim()
+        if claimed is None:
+            return self.__skip('delete')
+        key, version = claimed
+        ok = False
+        try:
+            ok = self.__timed('delete', lambda: self.db.delete(self.makeRow(key, version)))
+        finally:
+            self.keys.release(key, exists=not ok)
+        return ok
+
+    def scan(self):
+        return self.__timed('scan', lambda: self.db.getAllRows() is not None)
+
+    def step(self):
+        """
+        Run one operation picked by the mix.  Reads, updates & deletes
+        before anything was inserted are counted as skipped.  Returns 1 if
+        it succeeded, else 0 (so it can be driven by rateDriver).
+        """
+        return 1 if getattr(self, self.__chooseOp())() else 0
+
+    def preload(self, numRows, batch_size=1000):
+        """
+        Insert numRows rows with addMany() so reads, updates & deletes have
+        rows to work on from the start.  Returns the number inserted.
+        """
+        keys = [self.keys.newKey() for i in range(numRows)]
+        added = self.db.addMany([self.makeRow(k) for k in keys], batch_size=batch_size)
+        for i, k in enumerate(keys):
+            self.keys.release(k, 0, exists=(i < added))
+        return added
+
+    def __worker(self, deadline, remaining):
+        try:
+            while not self.stopped.is_set() and time.time() < deadline:
+                if remaining is not None:
+                    with self.randomLock:
+                        if remaining[0] <= 0:
+                            break
+                        remaining[0] = remaining[0] - 1
+                self.step()
+        finally:
+            self.db.releaseConn()
+
+    def run(self, duration=60, operations=0, workers=1, schedule=None, onTick=None):
+        """
+        Run the mix on workers concurrent sessions for duration seconds
+        (or until operations operations ran, if > 0).
+
+        With a rateDriver.rateSchedule (in operations per second) the
+        operations follow its rate instead of running flat out and the
+        schedule sets the duration.
+
+        Returns report().
+        """
+        self.stopped.clear()
+        self.metrics.reset()
+        if schedule is not None:
+            driver = rateDriver.rateDriver(schedule, workers=workers)
+            driver.run(self.step, 1, onTick=onTick)
+            return self.report()
+
+        deadline = time.time() + duration
+        remaining = [operations] if operations > 0 else None
+        threads = [threading.Thread(target=self.__worker, args=(deadline, remaining)) for i in range(workers)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            while any([t.is_alive() for t in threads]):
+                time.sleep(1.0)
+                if onTick is not None:
+                    onTick(self.report())
+        except KeyboardInterrupt:
+            print("\nStopping the workload...")
+            self.stopped.set()
+        for t in threads:
+            t.join()
+        return self.report()
+
+    def stop(self):
+        self.stopped.set()
+
+    def report(self):
+        """
+        Return per operation counts, throughput & latency percentiles
+        (hanaMetrics snapshot), errors, skipped operations and the number
+        of live keys.
+        """
+        snap = self.metrics.snapshot()
+        snap['skipped'] = dict(self.skipped)
+        snap['liveKeys'] = self.keys.size()
+        snap['opsPerSec'] = dict([(op, round(m['calls'] / snap['elapsed'], 1) if snap['elapsed'] > 0 else 0.0)
+                                  for op, m in snap['operations'].items()])
+        return snap
@@ -0,0 +1,35 @@
+#  pytest setup: the tests run against fakeDbapi (SQLite) instead of a
+#  HANA server, so hdbcli is not needed.
+#
+#  To Run (from the top directory)
+#
+#       python -m pytest -q test
+#
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import fakeDbapi
+# Before anything imports hanaDatabase.
+fakeDbapi.install()
+
+# asyncio front end.
+if sys.version_info[0] < 3:
+    collect_ignore = ['test_hanaAsync.py']
+
+@pytest.fixture
+def fakeDb():
+    """
+    A fresh fake database (and an empty table metadata cache, which is
+    shared by every database instance in the process).
+    """
+    import hanaDatabase
+    fileName = fakeDbapi.install()
+    hanaDatabase.tableCache.entries.clear()
+    yield fileName
+    hanaDatabase.tableCache.entries.clear()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(fileName + suffix):
+            os.remove(fileName + suffix)
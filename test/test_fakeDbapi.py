@@ -0,0 +1,81 @@
+import pytest
+import fakeDbapi
+
+def count(conn, table):
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM {0}'.format(table))
+    n = cursor.fetchone()[0]
+    cursor.close()
+    return n
+
+def test_autocommit_and_transactions(fakeDb):
+    a = fakeDbapi.connect()
+    b = fakeDbapi.connect()
+    cursor = a.cursor()
+    cursor.execute('CREATE COLUMN TABLE T (ID INTEGER)')
+    cursor.executemany('INSERT INTO T VALUES (?)', [[1], [2]])
+    assert count(b, 'T') == 2
+
+    a.setautocommit(False)
+    cursor.execute('INSERT INTO T VALUES (?)', [3])
+    assert count(b, 'T') == 2
+    a.rollback()
+    cursor.execute('INSERT INTO T VALUES (?)', [4])
+    a.commit()
+    assert count(b, 'T') == 3
+    a.close()
+    b.close()
+
+def test_failed_statement_ends_autocommit_transaction(fakeDb):
+    conn = fakeDbapi.connect()
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE T (ID INTEGER PRIMARY KEY)')
+    cursor.execute('INSERT INTO T VALUES (?)', [1])
+    with pytest.raises(fakeDbapi.Error):
+        cursor.executemany('INSERT INTO T VALUES (?)', [[2], [1]])
+    assert not conn.inTransaction
+    assert count(conn, 'T') == 1
+    conn.close()
+
+def test_catalog_queries(fakeDb):
+    conn = fakeDbapi.connect()
+    cursor = conn.cursor()
+    cursor.execute('CREATE COLUMN TABLE Orders (ID INTEGER, PRICE DECIMAL(10,2), NOTE VARCHAR(20)) '
+                   'PARTITION BY RANGE (ID) (PARTITION 0 <= VALUES < 10, PARTITION OTHERS)')
+    cursor.execute('SELECT COUNT(*) FROM SYS.TABLES WHERE TABLE_NAME = ?', ['ORDERS'])
+    assert cursor.fetchone()[0] == 1
+    cursor.execute('SELECT COLUMN_NAME, DATA_TYPE_NAME, LENGTH, SCALE FROM SYS.COLUMNS WHERE TABLE_NAME = ?', ['ORDERS'])
+    assert cursor.fetchall() == [('ID', 'INTEGER', 10, None), ('PRICE', 'DECIMAL', 10, 2), ('NOTE', 'VARCHAR', 20, None)]
+    cursor.execute('SELECT PART_ID, LEVEL_1_TYPE, LEVEL_1_COUNT, LEVEL_1_EXPRESSION, LEVEL_1_RANGE_MIN_VALUE, '
+                   'LEVEL_1_RANGE_MAX_VALUE FROM SYS.TABLE_PARTITIONS WHERE TABLE_NAME = ?', ['ORDERS'])
+    assert cursor.fetchall() == [(1, 'RANGE', 2, 'ID', '0', '10'), (2, 'RANGE', 2, 'ID', '', '')]
+    conn.close()
+
+def test_import_from_csv(fakeDb, tmp_path):
+    fileName = str(tmp_path / 'rows.csv')
+    with open(fileName, 'w') as f:
+        f.write('1,"a,b"\n2,\n')
+    conn = fakeDbapi.connect()
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE T (ID INTEGER, NOTE VARCHAR(20))')
+    cursor.execute("IMPORT FROM CSV FILE '{0}' INTO T".format(fileName))
+    assert cursor.rowcount == 2
+    cursor.execute('SELECT ID, NOTE FROM T ORDER BY ID')
+    assert cursor.fetchall() == [(1, 'a,b'), (2, None)]
+    with pytest.raises(fakeDbapi.Error):
+        cursor.execute("IMPORT FROM CSV FILE '{0}.missing' INTO T".format(fileName))
+    conn.close()
+
+def test_round_trips_and_closed_session(fakeDb):
+    before = fakeDbapi.stats()
+    conn = fakeDbapi.connect()
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE T (ID INTEGER)')
+    conn.commit()
+    after = fakeDbapi.stats()
+    assert after['statements'] - before['statements'] == 2
+    assert after['commits'] - before['commits'] == 1
+    conn.close()
+    with pytest.raises(fakeDbapi.Error) as e:
+        conn.cursor()
+    assert e.value.errorcode == -10807
@@ -0,0 +1,22 @@
+import fakeDbapi
+import hanaAsync
+import hanaDatabase
+
+def test_short_batches_count_as_failed(fakeDb, monkeypatch):
+    db = hanaDatabase.database('localhost', 30015, 'TASYNC', 'CREATE TABLE TASYNC (NAME VARCHAR(20), N INTEGER)',
+                               'user', 'passwd', poolSize=2)
+    executemany = fakeDbapi.Cursor.executemany
+    def failing(self, sql, seq):
+        seq = list(seq)
+        if any([row[1] == 13 for row in seq]):
+            raise fakeDbapi.Error(-10807, "Connection down")
+        return executemany(self, sql, seq)
+    monkeypatch.setattr(fakeDbapi.Cursor, 'executemany', failing)
+
+    done = []
+    batches = [[['b', b * 10 + i] for i in range(10)] for b in range(4)]
+    completed, failed = hanaAsync.insertRows(db, batches, maxInFlight=2, workers=2, onDone=done.append)
+    assert (completed, failed) == (3, 1)
+    assert sum(done) == 30
+    assert len(db.getAllRows()) == 30
+    db.close()
@@ -0,0 +1,232 @@
+import datetime
+import decimal
+import threading
+import time
+import pytest
+import fakeDbapi
+import hanaDatabase
+import populateHanaDB
+
+def database(tableName, columns, **kw):
+    return hanaDatabase.database('localhost', 30015, tableName, 'CREATE TABLE {0} ({1})'.format(tableName, columns),
+                                 'user', 'passwd', **kw)
+
+def test_column_converters():
+    assert hanaDatabase.columnConverter('INTEGER')(' 42 ') == 42
+    assert hanaDatabase.columnConverter('BIGINT')('') is None
+    assert hanaDatabase.columnConverter('DECIMAL')(0.1) == decimal.Decimal('0.1')
+    assert hanaDatabase.columnConverter('DOUBLE')('1.5') == 1.5
+    assert hanaDatabase.columnConverter('BOOLEAN')('yes') is True
+    assert hanaDatabase.columnConverter('BOOLEAN')('0') is False
+    assert hanaDatabase.columnConverter('DATE')('2024-02-29') == datetime.date(2024, 2, 29)
+    assert hanaDatabase.columnConverter('TIMESTAMP')('2024-02-29T10:11:12') == datetime.datetime(2024, 2, 29, 10, 11, 12)
+    assert hanaDatabase.columnConverter('VARBINARY')('00ff') == b'\x00\xff'
+    assert hanaDatabase.columnConverter('VARCHAR')('') == ''
+    with pytest.raises(ValueError):
+        hanaDatabase.columnConverter('BOOLEAN')('maybe')
+    with pytest.raises(ValueError):
+        hanaDatabase.columnConverter('DATE')('29.02.2024')
+
+def test_csv_converters():
+    text = hanaDatabase.csvConverter('VARCHAR')
+    assert text('plain') == 'plain'
+    assert text('a,b') == '"a,b"'
+    assert text('say "hi"') == '"say ""hi"""'
+    assert text('') == '""'
+    assert text(None) == ''
+    assert hanaDatabase.csvConverter('VARCHAR', fieldDelimiter='|')('a,b') == 'a,b'
+    assert hanaDatabase.csvConverter('INTEGER')('7') == '7'
+    assert hanaDatabase.csvConverter('BOOLEAN')('n') == 'FALSE'
+    assert hanaDatabase.csvConverter('SECONDDATE')('2024-01-02') == '2024-01-02 00:00:00'
+    assert hanaDatabase.csvConverter('BLOB')(b'\x01\x02') == '0102'
+    assert hanaDatabase.csvConverter('DOUBLE')(None) == ''
+
+def test_partitionClause():
+    assert hanaDatabase.partitionClause({'type': 'HASH', 'columns': ['email'], 'partitions': 4}) == \
+           'PARTITION BY HASH ("EMAIL") PARTITIONS 4'
+    assert hanaDatabase.partitionClause({'columns': ['A', 'B']}) == \
+           'PARTITION BY HASH ("A", "B") PARTITIONS GET_NUM_SERVERS()'
+    assert hanaDatabase.partitionClause({'type': 'range', 'columns': ['ID'], 'ranges': [(0, 10), (10, 20)],
+                                         'others': True}) == \
+           'PARTITION BY RANGE ("ID") (PARTITION 0 <= VALUES < 10, PARTITION 10 <= VALUES < 20, PARTITION OTHERS)'
+    assert hanaDatabase.partitionClause({'type': 'RANGE', 'columns': ['D'], 'ranges': [("2024-01-01", "O'Neil")]}) == \
+           "PARTITION BY RANGE (\"D\") (PARTITION '2024-01-01' <= VALUES < 'O''Neil')"
+    with pytest.raises(ValueError):
+        hanaDatabase.partitionClause({'type': 'RANGE', 'columns': ['A', 'B'], 'ranges': [(0, 1)]})
+    with pytest.raises(ValueError):
+        hanaDatabase.partitionClause({'type': 'RANGE', 'columns': ['A'], 'ranges': []})
+    with pytest.raises(ValueError):
+        hanaDatabase.partitionClause({'type': 'ROUNDROBIN', 'columns': ['A']})
+
+def test_splitByPartition_range(fakeDb):
+    db = database('TRANGE', 'ID INTEGER, NOTE VARCHAR(20)',
+                  partitionSpec={'type': 'RANGE', 'columns': ['ID'], 'ranges': [(0, 10), (10, 20)], 'others': True})
+    assert len(db.getPartitions()) == 3
+    rows = [[i, 'n'] for i in range(-5, 25)]
+    groups = db.splitByPartition(rows)
+    assert [r[0] for r in groups[0]] == list(range(0, 10))
+    assert [r[0] for r in groups[1]] == list(range(10, 20))
+    assert [r[0] for r in groups[2]] == list(range(-5, 0)) + list(range(20, 25))
+    db.close()
+
+def test_splitByPartition_hash(fakeDb):
+    db = database('THASH', 'ID INTEGER, EMAIL VARCHAR(40)',
+                  partitionSpec={'type': 'HASH', 'columns': ['EMAIL'], 'partitions': 4})
+    rows = [[i, 'user{0}@example.com'.format(i % 50)] for i in range(200)]
+    groups = db.splitByPartition(rows)
+    assert sum([len(g) for g in groups.values()]) == 200
+    assert set(groups.keys()) <= set(range(4)) and len(groups) > 1
+    # Rows with the same key always land in the same group.
+    for g in groups.values():
+        for row in g:
+            assert db.partitionOf([0, row[1]]) == db.partitionOf(row)
+    assert db.addManyPartitioned(rows, batch_size=20) == 200
+    assert len(db.getAllRows()) == 200
+    db.close()
+
+def test_unpartitioned_table_has_one_group(fakeDb):
+    db = database('TPLAIN', 'ID INTEGER')
+    assert db.splitByPartition([[1], [2]]) == {0: [[1], [2]]}
+    db.close()
+
+def test_addBatch_is_idempotent(fakeDb):
+    db = database('TBATCH', 'ID INTEGER, NOTE VARCHAR(20)')
+    rows = [[i, 'n'] for i in range(50)]
+    assert db.addBatch('load:0', rows, batch_size=20) == 50
+    assert db.addBatch('load:0', rows, batch_size=20) == 50
+    assert db.addBatch('load:1', rows[:10]) == 10
+    assert len(db.getAllRows()) == 60
+    db.close()
+
+def test_checkpoint_resume(fakeDb, tmp_path):
+    fileName = str(tmp_path / 'load.ckpt')
+    db = database('TCKPT', 'ID INTEGER, NOTE VARCHAR(20)')
+    built = []
+    def rows(n):
+        def build():
+            built.append(n)
+            return [[n * 10 + i, 'n'] for i in range(10)]
+        return build
+
+    ckpt = hanaDatabase.checkpointLog(fileName)
+    for n in range(3):
+        assert populateHanaDB.loadBatch(db, ckpt, 'load:{0}'.format(n), rows(n), 5, 10) == (10, False)
+
+    # A new run (new log read from the file) skips the committed batches
+    # without building their rows.
+    del built[:]
+    ckpt = hanaDatabase.checkpointLog(fileName)
+    assert ckpt.stats() == {'batches': 3, 'rows': 30}
+    results = [populateHanaDB.loadBatch(db, ckpt, 'load:{0}'.format(n), rows(n), 5, 10) for n in range(5)]
+    assert results == [(10, True)] * 3 + [(10, False)] * 2
+    assert built == [3, 4]
+    assert len(db.getAllRows()) == 50
+    db.close()
+
+def test_checkpoint_ignores_torn_line(tmp_path):
+    fileName = str(tmp_path / 'load.ckpt')
+    ckpt = hanaDatabase.checkpointLog(fileName)
+    ckpt.record('a:0', 100)
+    with open(fileName, 'a') as f:
+        f.write('{"batch": "a:1", "ro')
+    ckpt = hanaDatabase.checkpointLog(fileName)
+    assert ckpt.rows('a:0') == 100
+    assert ckpt.rows('a:1') is None
+
+def test_statementCache_concurrent_sessions(fakeDb):
+    # Every thread has its own pooled session; a small statement cache is
+    # evicted constantly and must never close another thread's statement.
+    db = database('TCACHE', 'NAME VARCHAR(20), N INTEGER', poolSize=40, stmtCacheSize=2)
+    failed = []
+    def worker(i):
+        try:
+            for j in range(30):
+                if not db.add(['t{0}'.format(i), j]):
+                    failed.append((i, j))
+        finally:
+            db.releaseConn()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert failed == []
+    assert len(db.getAllRows()) == 40 * 30
+    db.close()
+
+def test_addMany_commit_every_rolls_back_open_transaction(fakeDb):
+    db = database('TCOMMIT', 'NAME VARCHAR(20), N INTEGER')
+    ends = []
+    end = fakeDbapi.Connection._Connection__end
+    def countEnd(self, stmt):
+        if self.inTransaction:
+            ends.append(stmt)
+        return end(self, stmt)
+    fakeDbapi.Connection._Connection__end = countEnd
+    try:
+        assert db.addMany([['a', i] for i in range(1000)], batch_size=100, commit_every=500) == 1000
+        assert ends == ['COMMIT', 'COMMIT']
+        del ends[:]
+        rows = [['b', i] for i in range(700)] + [['b', 'not a number']]
+        assert db.addMany(rows, batch_size=100, commit_every=500) == 500
+        assert ends == ['COMMIT', 'ROLLBACK']
+    finally:
+        fakeDbapi.Connection._Connection__end = end
+    assert len(db.getAllRows()) == 1500
+    db.close()
+
+def test_reconnector_fails_fast(fakeDb):
+    connect = fakeDbapi.connect
+    calls = []
+    def failing(code, failures):
+        def f(address='', port=0, **kw):
+            calls.append(address)
+            if len(calls) <= failures:
+                raise fakeDbapi.Error(code, 'failed')
+            return connect(address, port, **kw)
+        return f
+    r = hanaDatabase.reconnector([('h1', 1), ('h2', 2)], 'user', 'passwd', retries=3, backoff=0.01)
+    try:
+        # The first connect tries every host once.
+        fakeDbapi.connect = failing(-10709, 2)
+        with pytest.raises(fakeDbapi.Error):
+            r.connect()
+        assert calls == ['h1', 'h2']
+        fakeDbapi.connect = connect
+        r.connect()
+        # Reconnects retry connection errors...
+        del calls[:]
+        fakeDbapi.connect = failing(-10709, 3)
+        r.connect()
+        assert len(calls) == 4
+        # ...but not authentication failures.
+        del calls[:]
+        fakeDbapi.connect = failing(10, 100)
+        with pytest.raises(fakeDbapi.Error):
+            r.connect()
+        assert len(calls) == 1
+    finally:
+        fakeDbapi.connect = connect
+
+def test_group_commit_leaves_open_transactions_alone(fakeDb):
+    db = database('TGROUP', 'NAME VARCHAR(20), N INTEGER', poolSize=2, commitMode='time', commitInterval=10)
+    reader = fakeDbapi.connect()
+    def committed():
+        cursor = reader.cursor()
+        cursor.execute('SELECT COUNT(*) FROM TGROUP')
+        n = cursor.fetchone()[0]
+        cursor.close()
+        return n
+
+    with db.transaction():
+        db.addMany([['t', i] for i in range(10)])
+        time.sleep(0.1)
+        assert committed() == 0
+    assert committed() == 10
+
+    # Outside a transaction the flusher commits.
+    db.addMany([['a', i] for i in range(5)])
+    time.sleep(0.1)
+    assert committed() == 15
+    reader.close()
+    db.close()
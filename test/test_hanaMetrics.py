@@ -0,0 +1,33 @@
+import hanaMetrics
+
+def test_percentiles_within_bucket_precision():
+    h = hanaMetrics.histogram()
+    for ms in range(1, 1001):
+        h.record(ms / 1000.0)
+    assert h.count == 1000
+    assert h.min == 0.001 and h.max == 1.0
+    for pct, exact in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert exact <= h.percentile(pct) <= exact * 1.016
+    assert h.percentile(100) == 1.0
+
+def test_empty_and_merge():
+    a = hanaMetrics.histogram()
+    assert a.percentile(99) == 0.0
+    b = hanaMetrics.histogram()
+    for i in range(100):
+        a.record(0.001)
+        b.record(0.1)
+    a.merge(b)
+    assert a.count == 200
+    assert a.min == 0.001 and a.max == 0.1
+    assert a.percentile(50) < 0.0011
+    assert a.percentile(51) >= 0.1
+
+def test_registry_counts_operations_and_errors():
+    m = hanaMetrics.metrics()
+    with m.timed('insert', rows=10, nbytes=100):
+        pass
+    m.observe('insert', 0.01, rows=5)
+    m.error('insert', RuntimeError('x'))
+    assert m.counters('insert') == (2, 15, 100)
+    assert m.snapshot()['errors'] == {'insert': {'RuntimeError': 1}}
@@ -0,0 +1,61 @@
+import pytest
+import loadPlan
+import populateHanaDB
+
+def table(entry, defaults=None):
+    return loadPlan.tableLoad(0, entry, defaults or {}, populateHanaDB)
+
+def test_settings_and_outputs():
+    t = table({'tableName': 'ORDERS', 'priority': 5, 'hosts': [['h1', 1], ['h2', 2]]}, {'loadMode': 'many'})
+    assert t.name == 'ORDERS' and t.priority == 5 and t.log == 'ORDERS.log'
+    assert t.settings['loadMode'] == 'many'
+    assert t.settings['hosts'] == [('h1', 1), ('h2', 2)]
+    assert t.settings['csvFn'] == 'ORDERS.' + populateHanaDB.csvFn
+    assert 'priority' not in t.settings
+    # One loading session plus the one that creates the table.
+    assert t.sessions == 2 and t.cpus == 1
+
+def test_sessions_follow_derived_settings():
+    t = table({'tableName': 'T', 'loadMode': 'partition', 'workers': 6})
+    assert t.sessionSetting == 'partitionSessions'
+    assert t.get('partitionSessions', populateHanaDB) == 6
+    assert t.sessions == 7
+    t = table({'tableName': 'T', 'loadMode': 'process', 'workers': 3, 'probeInterval': 5})
+    assert t.sessions == 5 and t.cpus == 3
+    t = table({'tableName': 'T', 'loadMode': 'csv', 'columnBytes': 300})
+    assert t.get('csvNumRec', populateHanaDB) == 300
+    assert t.get('pipelineShardRecs', populateHanaDB) == 300
+
+def test_invalid_entries():
+    with pytest.raises(ValueError):
+        table({'tableName': 'T', 'noSuchSetting': 1})
+    with pytest.raises(ValueError):
+        table({'loadMode': 'many'})
+    with pytest.raises(ValueError):
+        table({'tableName': 'T', 'loadMode': 'bulk'})
+
+def test_cap_scales_sessions_and_cpus():
+    t = table({'tableName': 'T', 'loadMode': 'async', 'workers': 40})
+    assert t.sessions == 41
+    t.cap(16, 4, populateHanaDB)
+    assert t.settings['workers'] == 15
+    assert t.sessions == 16
+    t = table({'tableName': 'T', 'loadMode': 'process', 'workers': 8})
+    t.cap(64, 4, populateHanaDB)
+    assert t.settings['loadProcesses'] == 4 and t.cpus == 4
+    t = table({'tableName': 'T', 'loadMode': 'csv', 'csvProcesses': 8})
+    t.cap(64, 2, populateHanaDB)
+    assert t.settings['csvProcesses'] == 2 and t.cpus == 2
+
+def test_scheduler_caps_and_names():
+    plan = {'maxConnections': 8, 'maxCPU': 2,
+            'defaults': {'loadMode': 'async', 'workers': 4},
+            'tables': [{'tableName': 'A'}, {'tableName': 'B', 'workers': 20, 'priority': 1}]}
+    s = loadPlan.scheduler(plan)
+    assert [t.sessions for t in s.tables] == [5, 8]
+    assert s.tables[1].settings['workers'] == 7
+    plan['tables'].append({'tableName': 'a'})
+    with pytest.raises(ValueError):
+        loadPlan.scheduler(plan)
+    with pytest.raises(ValueError):
+        loadPlan.scheduler({'tables': []})
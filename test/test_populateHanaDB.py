@@ -0,0 +1,88 @@
+import os
+import threading
+import pytest
+import hanaDatabase
+import populateHanaDB
+
+def load(monkeypatch, tableName, totalRecs, workers=2):
+    db = hanaDatabase.database('localhost', 30015, tableName,
+                               'CREATE TABLE {0} (NAME VARCHAR(20), N INTEGER)'.format(tableName),
+                               'user', 'passwd', poolSize=workers)
+    monkeypatch.setattr(populateHanaDB, 'db', db)
+    monkeypatch.setattr(populateHanaDB, 'add1', ['name', 1])
+    monkeypatch.setattr(populateHanaDB, 'workers', workers)
+    monkeypatch.setattr(populateHanaDB, 'totalRecs', totalRecs)
+    monkeypatch.setattr(populateHanaDB, 'reconnectRetries', 2)
+    return db
+
+def test_doOne_counts_added_rows(fakeDb, monkeypatch):
+    db = load(monkeypatch, 'TONE', 10)
+    populateHanaDB.doOne()
+    assert len(db.getAllRows()) == 10
+    db.close()
+
+def test_doOne_gives_up_when_every_add_fails(fakeDb, monkeypatch, capsys):
+    db = load(monkeypatch, 'TDOWN', 10)
+    calls = []
+    def add(row):
+        calls.append(row)
+        return False
+    monkeypatch.setattr(db, 'add', add)
+    populateHanaDB.doOne()
+    # Three rounds of two workers: the first one plus reconnectRetries.
+    assert len(calls) == 6
+    out = capsys.readouterr().out
+    assert 'giving up' in out and 'Added' not in out
+    db.close()
+
+def test_parallelcsv_fifo_fallback_keeps_import_threads(fakeDb, monkeypatch, tmp_path, capsys):
+    db = load(monkeypatch, 'TSHARDS', 20)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(populateHanaDB, 'csvShards', 2)
+    monkeypatch.setattr(populateHanaDB, 'importThreads', 4)
+    monkeypatch.setattr(populateHanaDB, 'csvStaging', 'fifo')
+    monkeypatch.setattr(populateHanaDB.csvWriter, 'makeFifo', lambda fileName: False)
+    calls = []
+    def importManyFromCSV(files, sessions=0, threads=0, batch=0):
+        calls.append(threads)
+        return files
+    monkeypatch.setattr(db, 'importManyFromCSV', importManyFromCSV)
+    populateHanaDB.doParallelCSVImport()
+    assert calls == [4]
+    out = capsys.readouterr().out
+    assert 'Added 20/20 records' in out
+    assert 'Staging throughput: CSV files' in out and 'FIFOs not used' in out
+    db.close()
+
+def pipeline(monkeypatch, tmp_path, tableName):
+    db = load(monkeypatch, tableName, 50)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(populateHanaDB, 'pipelineShardRecs', 10)
+    monkeypatch.setattr(populateHanaDB, 'pipelineFiles', 2)
+    monkeypatch.setattr(populateHanaDB, 'pipelineSessions', 1)
+    return db
+
+def test_pipeline_loads_unique_shards(fakeDb, monkeypatch, tmp_path):
+    db = pipeline(monkeypatch, tmp_path, 'TPIPE')
+    populateHanaDB.doPipelineImport()
+    rows = db.getAllRows()
+    assert len(rows) == 50 and len(set([tuple(r) for r in rows])) == 50
+    assert os.listdir(str(tmp_path)) == []
+    db.close()
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_pipeline_fails_when_the_import_session_dies(fakeDb, monkeypatch, tmp_path, capsys):
+    db = pipeline(monkeypatch, tmp_path, 'TPIPEDIES')
+    def crash(*args):
+        raise RuntimeError('importer crashed')
+    monkeypatch.setattr(db, '_database__importFromCSV', crash)
+    loader = threading.Thread(target=populateHanaDB.doPipelineImport)
+    loader.daemon = True
+    loader.start()
+    loader.join(30)
+    assert not loader.is_alive()
+    out = capsys.readouterr().out
+    assert '5 of 5 shards were not imported' in out
+    assert '50 records in shards' in out
+    assert os.listdir(str(tmp_path)) == []
+    db.close()
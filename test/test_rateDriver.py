@@ -0,0 +1,55 @@
+import time
+import pytest
+import rateDriver
+
+def test_schedule_units_and_rate():
+    s = rateDriver.rateSchedule([(10, 100), (10, 100, 300)])
+    assert s.duration == 20
+    assert s.total == 1000 + 2000
+    assert s.rate(5) == 100
+    assert s.rate(15) == 200
+    assert s.rate(20) == 0.0
+    assert s.units(10) == 1000
+    assert s.units(20) == 3000
+
+def test_timeFor_inverts_units():
+    s = rateDriver.rateSchedule([(10, 100), (10, 100, 300), (5, 0), (5, 50)])
+    for t in (0.0, 2.5, 10.0, 12.0, 17.5, 19.9, 25.0, 27.0):
+        assert s.timeFor(s.units(t)) == pytest.approx(t)
+    assert s.timeFor(s.total) is None
+
+def test_timeFor_skips_idle_phases():
+    s = rateDriver.rateSchedule([(5, 10), (5, 0), (5, 10)])
+    # The 51st unit is only due once the second step starts.
+    assert s.timeFor(50) == pytest.approx(10.0)
+
+def test_invalid_phases():
+    with pytest.raises(ValueError):
+        rateDriver.rateSchedule([])
+    with pytest.raises(ValueError):
+        rateDriver.rateSchedule([(0, 10)])
+    with pytest.raises(ValueError):
+        rateDriver.rateSchedule([(10, -1)])
+
+def test_tokenBucket_reserves_along_schedule():
+    s = rateDriver.rateSchedule([(10, 100)])
+    b = rateDriver.tokenBucket(s)
+    start = time.time()
+    b.begin(start)
+    assert b.reserve(10) == (start, start)
+    intended, earliest = b.reserve(10)
+    assert intended - start == pytest.approx(0.1)
+    assert earliest == intended
+
+def test_tokenBucket_burst_and_end():
+    s = rateDriver.rateSchedule([(10, 100)])
+    b = rateDriver.tokenBucket(s, burst=50)
+    start = time.time()
+    b.begin(start)
+    b.reserve(100)
+    intended, earliest = b.reserve(10)
+    assert intended - start == pytest.approx(1.0)
+    assert earliest - start == pytest.approx(0.5)
+    # Started long ago: the schedule is over.
+    b.begin(start - 60)
+    assert b.reserve(10) is None
@@ -0,0 +1,66 @@
+import random
+import pytest
+import workload
+
+def test_zipfian_range_and_skew():
+    z = workload.zipfian(0.99)
+    rng = random.Random(1)
+    counts = [0] * 1000
+    for i in range(20000):
+        counts[z.next(1000, rng)] += 1
+    assert sum(counts) == 20000
+    assert counts[0] == max(counts)
+    assert counts[0] > counts[1] > counts[10]
+    # The top 10% of the items get most of the picks.
+    assert sum(counts[:100]) > 0.6 * 20000
+    assert z.next(1, rng) == 0
+
+def test_zipfian_grows_incrementally():
+    rng = random.Random(2)
+    a = workload.zipfian(0.9)
+    for n in range(1, 500):
+        assert 0 <= a.next(n, rng) < max(n, 1)
+    b = workload.zipfian(0.9)
+    b.next(499, rng)
+    assert a.zetan == pytest.approx(b.zetan)
+
+def test_zipfian_theta():
+    for theta in (0, 1, 1.5):
+        with pytest.raises(ValueError):
+            workload.zipfian(theta)
+
+def test_keySpace_claims_existing_free_keys():
+    ks = workload.keySpace('uniform', seed=3)
+    assert ks.claim() is None
+    keys = [ks.newKey() for i in range(10)]
+    assert keys == list(range(10))
+    # Inserted keys are busy until released.
+    assert ks.claim() is None
+    for key in keys:
+        ks.release(key, version=0, exists=key % 2 == 0)
+    assert ks.size() == 5
+    claimed = set()
+    for i in range(5):
+        key, version = ks.claim(tries=1000)
+        assert key % 2 == 0 and version == 0
+        claimed.add(key)
+    assert claimed == set([0, 2, 4, 6, 8])
+    assert ks.claim() is None
+    ks.release(4, version=1)
+    assert ks.claim(tries=1000) == (4, 1)
+
+def test_keySpace_latest_favours_new_keys():
+    ks = workload.keySpace('latest', seed=4)
+    for i in range(1000):
+        ks.release(ks.newKey(), version=0)
+    recent = 0
+    for i in range(2000):
+        key, version = ks.claim()
+        ks.release(key)
+        if key >= 900:
+            recent += 1
+    assert recent > 0.6 * 2000
+
+def test_keySpace_distribution():
+    with pytest.raises(ValueError):
+        workload.keySpace('normal')
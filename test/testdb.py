@@ -21,7 +21,7 @@ if __name__ == "__main__":
         db = database(address, port, tableName, createStmt, user, passwd, saccess=True, debug=True)
     except Exception as e:
         print("ERROR: {0}\\n{1}".format(e, traceback.format_exc()))
-	exit
+        exit
 
     print("********************\nADDING records\n**********************")
     add1 = ["Joanna", "Strange", "1234 main st.", "Stockton", "CA", 92880]
@@ -31,8 +31,15 @@ if __name__ == "__main__":
     db.add(add2)
     db.add(add3)
 
-    recs = db.getAllRows()
-    for i in recs:
+    for i in db.iterRows():
+        print(i)
+
+    print("\n********************\nADDING many records\n**********************")
+    add4 = ["Jim", "Jones", "1234 main st.", "Riverside", "CA", 92501]
+    add5 = ["Jill", "Jones", "1234 main st.", "Riverside", "CA", 92501]
+    db.addMany([add4, add5], batch_size=2)
+
+    for i in db.iterRows():
         print(i)
 
     print("\n********************\nUpdating records\n**********************")
@@ -40,13 +47,25 @@ if __name__ == "__main__":
     newadd1 = ["Patty", "Smith", "1234 main st.", "Eastvale", "CA", 92880]
     db.update(add1, newadd1)
 
-    recs = db.getAllRows()
-    for i in recs:
+    for i in db.iterRows():
         print(i)
 
     print("\n********************\nDelete record\n**********************")
     db.delete(add2)
-    recs = db.getAllRows()
-    for i in recs:
+    for i in db.iterRows():
         print(i)
 
+
+    print("\n********************\nUpdating & deleting many records\n**********************")
+    db.updateMany([(add4, ["Jim", "Jones", "99 oak st.", "Riverside", "CA", 92501]),
+                   (add5, ["Jill", "Jones", "99 oak st.", "Riverside", "CA", 92501])])
+    db.deleteMany([["Jill", "Jones", "99 oak st.", "Riverside", "CA", 92501]])
+    for i in db.iterRows():
+        print(i)
+
+    print("\n********************\nStreaming records\n**********************")
+    for batch in db.iterRows(columns=["FNAME", "ZIPCODE"], where='"STATE" = ?', params=["CA"], arraysize=2, columnar=True):
+        print(batch)
+
+    print("\n********************\nStatement cache\n**********************")
+    print(db.getStatementCacheStats())